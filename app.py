@@ -1,27 +1,39 @@
 import streamlit as st
 from src.auth import login_required, has_permission
 from src.models import User
+from src.passwords import PasswordServiceBusy
+from src.ratelimit import LoginThrottled
+from src.activity import get_activity_tracker
+from src.instrumentation import profile_summary, timed
+from src.reporting import reporting_status
+from src.bulk import detect_format, import_users, iter_records
+from src.sessions import issue_session, revoke_session, revoke_user_sessions, verify_session
+from src.audit import (get_audit_logger, get_events_page, iter_events_csv,
+                       log_event)
+from src.bootstrap import bootstrap
+from src.caching import (cached_dashboard_summary, cached_distinct_actions,
+                         cached_user_count, cached_user_search)
 from ui.styles import load_css
+from ui.components import client_key, fragment, full_render, session_ended
+from config import Config
+import io
 import logging
-from datetime import datetime
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Page config
-st.set_page_config(
-    page_title="User Management System",
-    page_icon="👥",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Load custom CSS
-st.markdown(load_css(), unsafe_allow_html=True)
+def setup_page():
+    """Page config and custom CSS; must come before any other output in a run"""
+    st.set_page_config(
+        page_title="User Management System",
+        page_icon="👥",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(load_css(), unsafe_allow_html=True)
 
 def show_login_sidebar():
     """Display sidebar for non-authenticated users"""
@@ -39,7 +51,7 @@ def show_authenticated_sidebar():
     """Display sidebar for authenticated users"""
     with st.sidebar:
         st.title("Navigation")
-        user = User.get_by_id(st.session_state.user_id)
+        user = User.get_by_id(st.session_state.user_id, "sidebar")
         st.write(f"Welcome, {user.username}")
         st.write(f"Role: {user.role}")
         
@@ -60,9 +72,19 @@ def show_authenticated_sidebar():
         st.session_state.page = menu_options[selected]
         
         if st.button("Logout"):
-            st.session_state.clear()
+            log_event(user.id, "LOGOUT")
+            if 'session_token' in st.session_state:
+                revoke_session(st.session_state.session_token)
+            end_session()
             st.rerun()
 
+def end_session():
+    """Forget the signed-in user and everything this session kept"""
+    discard_audit_export()
+    st.query_params.clear()
+    st.session_state.clear()
+    st.session_state.page = 'login'
+
 def show_login_page():
     """Display the login page"""
     st.title("Login")
@@ -74,13 +96,25 @@ def show_login_page():
         
         if submitted:
             try:
-                success, user_id = User.authenticate(username, password)
+                success, user_id = User.authenticate(username, password, client=client_key())
                 if success:
+                    log_event(user_id, "LOGIN")
+                    token = issue_session(user_id)
+                    st.session_state.session_token = token
+                    if Config.SESSION_IN_URL:
+                        # Lets the session survive a browser refresh; see Config.SESSION_IN_URL
+                        st.query_params["session"] = token
                     st.session_state.user_id = user_id
                     st.session_state.page = 'dashboard'
                     st.rerun()
                 else:
+                    log_event(None, "LOGIN_FAILED", {"username": username})
                     st.error("Invalid username or password")
+            except LoginThrottled as e:
+                log_event(None, "LOGIN_THROTTLED", {"username": username})
+                st.error(str(e))
+            except PasswordServiceBusy:
+                st.warning("The server is busy, please try again in a moment")
             except Exception as e:
                 logger.error(f"Login error: {str(e)}")
                 st.error("An error occurred during login")
@@ -105,6 +139,7 @@ def show_register_page():
             try:
                 success, message = User.create(username, email, password, "User")
                 if success:
+                    log_event(None, "REGISTER", {"username": username})
                     st.success("Registration successful! Please login.")
                     st.session_state.page = 'login'
                     st.rerun()
@@ -114,45 +149,81 @@ def show_register_page():
                 logger.error(f"Registration error: {str(e)}")
                 st.error("An error occurred during registration")
 
+def format_trend(change, period):
+    """Render a percent change from the metrics rollups for a stat card"""
+    if change is None:
+        return f"no data for {period}"
+    return f"{change:+.0f}% from {period}"
+
+def format_freshness(as_of):
+    """Caption saying how current reporting data is"""
+    age = max(0, int(time.time() - as_of))
+    text = f"Data as of {datetime.utcfromtimestamp(as_of):%H:%M:%S} UTC ({age}s ago)"
+    status = reporting_status()
+    if status["mode"] == "snapshot":
+        text += f" from the reporting snapshot, refreshed every {status['refresh_interval']:.0f}s"
+    return text
+
+@timed("page.dashboard")
 @login_required
 def show_dashboard():
     """Display the dashboard"""
     st.title("Dashboard")
-    
-    # Create three columns for metrics
-    col1, col2, col3 = st.columns(3)
+    show_dashboard_cards()
+    show_recent_activity()
+
+@fragment("dashboard_cards", run_every=Config.DASHBOARD_REFRESH_SECONDS or None)
+def show_dashboard_cards():
+    """Metric cards; refresh on their own when DASHBOARD_REFRESH_SECONDS is set"""
+    summary = cached_dashboard_summary()
+    online = get_activity_tracker().active_count(Config.ACTIVE_WINDOW_MINUTES)
+
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         with st.container():
-            st.markdown("""
+            st.markdown(f"""
                 <div class="stat-card">
                     <h3>Active Users</h3>
-                    <p>150</p>
-                    <small>+10% from last week</small>
+                    <p>{summary['active_users']:,}</p>
+                    <small>{format_trend(summary['active_users_change'], 'same day last week')}</small>
                 </div>
             """, unsafe_allow_html=True)
     
     with col2:
         with st.container():
-            st.markdown("""
+            st.markdown(f"""
                 <div class="stat-card">
                     <h3>New Users</h3>
-                    <p>15</p>
-                    <small>Today</small>
+                    <p>{summary['new_users']:,}</p>
+                    <small>Today, {format_trend(summary['new_users_change'], 'yesterday')}</small>
                 </div>
             """, unsafe_allow_html=True)
     
     with col3:
         with st.container():
-            st.markdown("""
+            st.markdown(f"""
                 <div class="stat-card">
                     <h3>Total Sessions</h3>
-                    <p>1,234</p>
-                    <small>This week</small>
+                    <p>{summary['sessions']:,}</p>
+                    <small>This week, {format_trend(summary['sessions_change'], 'last week')}</small>
                 </div>
             """, unsafe_allow_html=True)
+
+    with col4:
+        with st.container():
+            st.markdown(f"""
+                <div class="stat-card">
+                    <h3>Online Now</h3>
+                    <p>{online:,}</p>
+                    <small>Active in the last {Config.ACTIVE_WINDOW_MINUTES} minutes</small>
+                </div>
+            """, unsafe_allow_html=True)
+    st.caption(format_freshness(summary["as_of"]))
     
-    # Recent Activity
+@fragment("recent_activity")
+def show_recent_activity():
+    """Recent activity feed"""
     st.subheader("Recent Activity")
     activity_data = [
         {"time": "2 minutes ago", "action": "New user registration"},
@@ -168,6 +239,7 @@ def show_dashboard():
             </div>
         """, unsafe_allow_html=True)
 
+@timed("page.profile")
 @login_required
 def show_profile_page():
     """Display the user profile page"""
@@ -205,22 +277,42 @@ def show_profile_page():
                             st.error("Current password is incorrect")
                             return
                         user.update_password(new_password)
+                        log_event(user.id, "UPDATE_PASSWORD")
                     
                     if new_email != user.email:
-                        user.update_email(new_email)
+                        old_email = user.email
+                        success, message = user.update_email(new_email)
+                        if not success:
+                            st.error(message)
+                            return
+                        log_event(user.id, "UPDATE_EMAIL", {"old": old_email, "new": new_email})
                     
                     st.success("Profile updated successfully")
                 except Exception as e:
                     logger.error(f"Profile update error: {str(e)}")
                     st.error("An error occurred while updating your profile")
 
+@timed("page.users")
 @login_required
 @has_permission("VIEW_USERS")
 def show_users_page():
     """Display the users management page"""
     st.title("User Management")
-    
-    # Add new user section
+    show_add_user_section()
+
+    # Bulk import from CSV/JSONL
+    if User.get_by_id(st.session_state.user_id, "sidebar").has_permission("ADD_USER"):
+        with st.expander("Bulk Import"):
+            show_bulk_import()
+
+    show_users_list()
+
+def toggle_add_user():
+    st.session_state.show_add_user = not st.session_state.get('show_add_user', False)
+
+@fragment("add_user")
+def show_add_user_section():
+    """Add-user toggle and form"""
     if st.session_state.get('show_add_user', False):
         with st.form("add_user_form"):
             st.subheader("Add New User")
@@ -233,8 +325,11 @@ def show_users_page():
                 try:
                     success, message = User.create(new_username, new_email, new_password, new_role)
                     if success:
+                        log_event(st.session_state.user_id, "ADD_USER",
+                                  {"username": new_username, "role": new_role})
                         st.success(message)
                         st.session_state.show_add_user = False
+                        # The new user must show up in the list, so refresh the whole page
                         st.rerun()
                     else:
                         st.error(message)
@@ -243,44 +338,405 @@ def show_users_page():
                     st.error("An error occurred while adding the user")
     
     # Toggle add user form
-    if st.button("Add New User" if not st.session_state.get('show_add_user', False) else "Cancel"):
-        st.session_state.show_add_user = not st.session_state.get('show_add_user', False)
+    st.button("Add New User" if not st.session_state.get('show_add_user', False) else "Cancel",
+              on_click=toggle_add_user)
+
+@fragment("bulk_import")
+def show_bulk_import():
+    """Bulk import form"""
+    st.caption("CSV or JSONL with username, email, password and optional role columns")
+    with st.form("bulk_import_form", clear_on_submit=True):
+        upload = st.file_uploader("Users file", type=["csv", "jsonl"])
+        default_role = st.selectbox("Default role", ["User", "Manager", "Admin"])
+        if st.form_submit_button("Import") and upload is not None:
+            try:
+                fmt = detect_format(upload.name)
+                stream = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+                actor = User.get_by_id(st.session_state.user_id, "sidebar")
+                report = import_users(iter_records(stream, fmt), default_role, actor=actor)
+                log_event(st.session_state.user_id, "BULK_IMPORT",
+                          {"file": upload.name, "created": report.created,
+                           "conflicts": report.conflict_count, "errors": report.error_count})
+                st.success(f"Imported {report.created} users")
+                if report.conflict_count or report.error_count:
+                    st.warning(f"{report.conflict_count} conflicts, "
+                               f"{report.error_count} invalid rows")
+                    st.json(report.as_dict())
+            except Exception as e:
+                logger.error(f"Bulk import error: {str(e)}")
+                st.error("An error occurred during the import")
+
+def start_editing(user_id):
+    st.session_state.editing_user = user_id
+
+BULK_ACTIONS = ["Edit", "Change role", "Activate", "Deactivate", "Delete"]
+
+def show_user_grid(users, key):
+    """Selectable table of users with bulk actions on the selected rows"""
+    # pandas takes about half a second to import; only this page needs it
+    import pandas as pd
+
+    frame = pd.DataFrame({
+        "Select": [False] * len(users),
+        "ID": [user.id for user in users],
+        "Username": [user.username for user in users],
+        "Email": [user.email for user in users],
+        "Role": [user.role for user in users],
+        "Status": ["Active" if user.is_active else "Inactive" for user in users],
+        "Last Login": [user.last_login for user in users],
+    })
+    # The key follows the rows shown, so a new page starts with nothing selected
+    edited = st.data_editor(
+        frame,
+        key=f"{key}_{hash(tuple(frame['ID']))}",
+        hide_index=True,
+        use_container_width=True,
+        disabled=[column for column in frame.columns if column != "Select"],
+        column_config={
+            "Select": st.column_config.CheckboxColumn("Select", width="small"),
+            "Last Login": st.column_config.DatetimeColumn("Last Login", format="YYYY-MM-DD HH:mm"),
+        },
+    )
+    show_bulk_actions(edited.loc[edited["Select"], "ID"].tolist())
+
+def show_bulk_actions(user_ids):
+    """Apply one action to every selected user in a single transaction"""
+    actor = User.get_by_id(st.session_state.user_id, "sidebar")
+    roles = [role for role in Config.ROLES_HIERARCHY if actor.can_grant_role(role)]
+    action_col, role_col, confirm_col, apply_col = st.columns([2, 2, 2, 2])
+    action = action_col.selectbox("Bulk action", BULK_ACTIONS)
+    new_role = role_col.selectbox("New role", roles, disabled=action != "Change role")
+    confirmed = confirm_col.checkbox("Confirm delete", disabled=action != "Delete")
+    apply_col.write("")
+    if not apply_col.button(f"Apply to {len(user_ids)} selected", disabled=not user_ids):
+        return
+
+    if action == "Edit":
+        if len(user_ids) != 1:
+            st.warning("Select exactly one user to edit")
+            return
+        start_editing(user_ids[0])
         st.rerun()
-    
-    # Users list
+    if action == "Delete" and not confirmed:
+        st.warning("Tick 'Confirm delete' to delete the selected users")
+        return
+
+    try:
+        if action == "Delete":
+            # Revoke first: on PostgreSQL deleting a user also deletes its session rows
+            revoke_user_sessions(actor.bulk_targets(user_ids, "DELETE_USER"))
+            success, result = actor.bulk_delete(user_ids)
+        else:
+            fields = {"Change role": {"role": new_role},
+                      "Activate": {"is_active": True},
+                      "Deactivate": {"is_active": False}}[action]
+            success, result = actor.bulk_update(user_ids, **fields)
+        if not success:
+            st.error(result)
+            return
+        if result and action == "Deactivate":
+            revoke_user_sessions(result)
+        log_event(actor.id, "BULK_" + action.upper().replace(" ", "_"),
+                  {"user_ids": result, "requested": len(user_ids),
+                   **({"role": new_role} if action == "Change role" else {})})
+        st.session_state.bulk_result = (
+            f"{action}: {len(result)} of {len(user_ids)} selected users updated"
+            + ("" if len(result) == len(user_ids) else " (Root accounts and your own are skipped)")
+        )
+        # Refresh the whole page so counts and the list show the change
+        st.rerun()
+    except Exception as e:
+        logger.error(f"Bulk {action} error: {str(e)}")
+        st.error("An error occurred while applying the bulk action")
+
+def show_bulk_result():
+    message = st.session_state.pop('bulk_result', None)
+    if message:
+        st.success(message)
+
+def show_user_search():
+    """Ranked full-text search; returns True when it replaced the list"""
+    # A text input only reruns on Enter or blur, not per keystroke; short
+    # entries are ignored and repeated searches are served from the cache
+    text = " ".join(st.text_input("Search users", placeholder="Username, email or role",
+                                  key="user_search").lower().split())
+    if not text:
+        return False
+    if len(text) < Config.USER_SEARCH_MIN_CHARS:
+        st.caption(f"Type at least {Config.USER_SEARCH_MIN_CHARS} characters to search")
+        return False
+
+    if st.session_state.get('editing_user'):
+        show_user_edit_panel()
+    users, ranked = cached_user_search(text, Config.USER_SEARCH_LIMIT)
+    show_bulk_result()
+    if not users:
+        st.caption(f"No users match “{text}”")
+    elif ranked:
+        st.caption(f"{len(users)} best matches for “{text}”")
+    else:
+        st.caption(f"More than {Config.USER_SEARCH_RANK_LIMIT} users match “{text}”; "
+                   f"showing {len(users)} alphabetically, keep typing to narrow it down")
+    show_user_grid(users, "search_grid")
+    return True
+
+@fragment("users_list")
+def show_users_list():
+    """Searchable, filterable, paginated users list"""
     st.subheader("Users List")
-    users = User.get_all()
-    
-    for user in users:
-        with st.container():
-            col1, col2, col3 = st.columns([3, 2, 1])
-            
-            with col1:
-                st.markdown(f"""
-                    <div class="user-card">
-                        <h4>{user.username}</h4>
-                        <p>{user.email}</p>
-                        <small>Role: {user.role}</small>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                st.write(f"Last Login: {user.last_login or 'Never'}")
-                st.write(f"Status: {'Active' if user.is_active else 'Inactive'}")
-            
-            with col3:
-                if st.button("Edit", key=f"edit_{user.id}"):
-                    st.session_state.editing_user = user.id
-                    st.rerun()
+    if show_user_search():
+        return
+
+    filter_col1, filter_col2, filter_col3, filter_col4, filter_col5 = st.columns([3, 2, 2, 2, 1])
+    with filter_col1:
+        prefix = st.text_input("Username or email starts with").strip() or None
+    with filter_col2:
+        role_filter = st.selectbox("Role filter", ["All"] + list(Config.ROLES_HIERARCHY.keys()))
+    with filter_col3:
+        status_filter = st.selectbox("Status", ["All", "Active", "Inactive"])
+    with filter_col4:
+        sort_label = st.selectbox("Sort by", ["Username", "Email", "Newest", "Oldest"])
+    with filter_col5:
+        page_size = st.selectbox("Per page", [25, 50, 100, 500], index=0)
+
+    filters = {
+        "role": None if role_filter == "All" else role_filter,
+        "is_active": None if status_filter == "All" else status_filter == "Active",
+        "prefix": prefix,
+    }
+    sort_by, descending = {
+        "Username": ("username", False),
+        "Email": ("email", False),
+        "Newest": ("created_at", True),
+        "Oldest": ("created_at", False),
+    }[sort_label]
+
+    # Cursor stack for the keyset pagination; reset whenever the query changes
+    query_key = (tuple(filters.items()), sort_by, descending, page_size)
+    if st.session_state.get('users_query') != query_key:
+        st.session_state.users_query = query_key
+        st.session_state.users_cursors = [None]
+
+    if st.session_state.get('editing_user'):
+        show_user_edit_panel()
+
+    cursors = st.session_state.users_cursors
+    users, next_cursor = User.get_page(
+        sort_by=sort_by, descending=descending, after=cursors[-1], limit=page_size, **filters
+    )
+    total = cached_user_count(**filters)
+    first = (len(cursors) - 1) * page_size
+    st.caption(f"Showing {first + 1 if users else 0}-{first + len(users)} of {total} users")
+    show_bulk_result()
+    show_user_grid(users, "users_grid")
+
+    # Callbacks run before the next script run, so paging needs no extra rerun
+    prev_col, _, next_col = st.columns([1, 4, 1])
+    with prev_col:
+        st.button("Previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+    with next_col:
+        st.button("Next", disabled=next_cursor is None,
+                  on_click=cursors.append, args=(next_cursor,))
+
+def stop_editing():
+    st.session_state.pop('editing_user', None)
+
+@fragment("user_edit_panel")
+def show_user_edit_panel():
+    """Edit role and status of the user selected in the list"""
+    # Cancel only reruns this fragment, which then renders nothing
+    user_id = st.session_state.get('editing_user')
+    user = User.get_by_id(user_id, "row") if user_id else None
+    if user is None:
+        stop_editing()
+        return
+    actor = User.get_by_id(st.session_state.user_id, "sidebar")
+
+    with st.container(border=True):
+        st.subheader(f"Edit {user.username}")
+        allowed, message = user.editable_by(actor)
+        if not allowed:
+            st.warning(message)
+            st.button("Close", on_click=stop_editing)
+            return
+
+        roles = [role for role in Config.ROLES_HIERARCHY if actor.can_grant_role(role)]
+        # A role the actor can't grant (or one no longer configured) is shown
+        # as the placeholder and kept unless another role is picked
+        current = roles.index(user.role) if user.role in roles else None
+        with st.form("edit_user_form"):
+            new_role = st.selectbox("Role", roles, index=current,
+                                    placeholder=f"{user.role} (unchanged)")
+            new_active = st.checkbox("Active", value=user.is_active)
+            save_col, cancel_col = st.columns(2)
+            saved = save_col.form_submit_button("Save")
+            cancel_col.form_submit_button("Cancel", on_click=stop_editing)
+
+        if saved:
+            try:
+                changes = {}
+                if new_role is not None and new_role != user.role:
+                    success, message = user.update_role(new_role, actor)
+                    if not success:
+                        st.error(message)
+                        return
+                    changes["role"] = [user.role, new_role]
+                if new_active != user.is_active:
+                    success, message = user.update_active(new_active, actor)
+                    if not success:
+                        st.error(message)
+                        return
+                    changes["is_active"] = [user.is_active, new_active]
+                    if not new_active:
+                        revoke_user_sessions([user.id])
+                if changes:
+                    log_event(actor.id, "EDIT_USER", {"user_id": user.id, **changes})
+                stop_editing()
+                # Refresh the list so it shows the saved values
+                st.rerun()
+            except Exception as e:
+                logger.error(f"Edit user error: {str(e)}")
+                st.error("An error occurred while updating the user")
+
+@timed("page.audit")
+@login_required
+@has_permission("VIEW_LOGS")
+def show_audit_page():
+    """Display the audit log"""
+    st.title("Audit Log")
+
+    # Make sure events queued by this and other sessions are visible
+    get_audit_logger().flush(timeout=1.0)
+    status = reporting_status()
+    if status["mode"] == "snapshot":
+        st.caption(format_freshness(status["refreshed_at"]))
+
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns([3, 2, 2, 1])
+    with filter_col1:
+        today = datetime.utcnow().date()
+        date_range = st.date_input("Date range (UTC)", value=(today - timedelta(days=7), today))
+    with filter_col2:
+        actor = st.text_input("Actor username").strip()
+    with filter_col3:
+        action = st.selectbox("Action", ["All"] + cached_distinct_actions())
+    with filter_col4:
+        page_size = st.selectbox("Per page", [50, 100, 200], index=0)
+
+    filters = {
+        "start": None,
+        "end": None,
+        "user_id": None,
+        "action": None if action == "All" else action,
+    }
+    if len(date_range) == 2:
+        filters["start"] = f"{date_range[0]} 00:00:00"
+        filters["end"] = f"{date_range[1] + timedelta(days=1)} 00:00:00"
+    if actor:
+        actor_user = User.get_by_username(actor)
+        if actor_user is None:
+            st.warning(f"No user named {actor}")
+            return
+        filters["user_id"] = actor_user.id
+
+    # Cursor stack for the keyset pagination; reset whenever the query changes
+    query_key = (tuple(filters.items()), page_size)
+    if st.session_state.get('audit_query') != query_key:
+        st.session_state.audit_query = query_key
+        st.session_state.audit_cursors = [None]
+        discard_audit_export()
+
+    cursors = st.session_state.audit_cursors
+    events, next_cursor = get_events_page(before=cursors[-1], limit=page_size, **filters)
+    if not events:
+        st.info("No audit events match these filters")
+    else:
+        st.dataframe(events, use_container_width=True, hide_index=True)
+
+    prev_col, _, next_col = st.columns([1, 4, 1])
+    with prev_col:
+        st.button("Newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+    with next_col:
+        st.button("Older", disabled=next_cursor is None,
+                  on_click=cursors.append, args=(next_cursor,))
+
+    # The export is streamed to a temporary file page by page, never held as
+    # one result set. st.download_button still reads the finished file into
+    # memory to serve it, so only the query side runs in constant memory.
+    if st.button("Prepare CSV export"):
+        discard_audit_export()
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="",
+                                         encoding="utf-8") as f:
+            for chunk in iter_events_csv(**filters):
+                f.write(chunk)
+        st.session_state.audit_export_path = f.name
+    export_path = st.session_state.get('audit_export_path')
+    if export_path and os.path.exists(export_path):
+        with open(export_path, "rb") as f:
+            st.download_button("Download CSV", f, file_name="audit_log.csv", mime="text/csv")
+
+def discard_audit_export():
+    """Forget the prepared export and delete its temporary file"""
+    export_path = st.session_state.pop('audit_export_path', None)
+    if export_path:
+        try:
+            os.unlink(export_path)
+        except FileNotFoundError:
+            pass
+
+def show_debug_panel():
+    """Timing breakdown of the current script run, for admins"""
+    user = User.get_by_id(st.session_state.user_id, "sidebar")
+    if not user or not user.has_permission("VIEW_DEBUG"):
+        return
+    profile = profile_summary()
+    with st.expander("Debug: rerun profile"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Run so far", f"{profile['elapsed_ms']:.1f} ms")
+        col2.metric("Queries", profile["query_count"])
+        col3.metric("Query time", f"{profile['query_ms']:.1f} ms")
+        if profile["timers_ms"]:
+            st.write("Timed sections")
+            st.table([{"section": name, "ms": round(ms, 2)}
+                      for name, ms in profile["timers_ms"].items()])
+        if profile["queries"]:
+            st.write("Queries, slowest first")
+            st.dataframe(
+                [{**q, "ms": round(q["ms"], 3)} for q in profile["queries"]],
+                use_container_width=True, hide_index=True,
+            )
 
 def main():
     """Main application entry point"""
+    setup_page()
+    # Logging, instrumentation, schema and pool are set up once per process
+    bootstrap()
+
+    # Each rerun gets its own identity map so a user row is loaded at most once
+    User.begin_request()
+
     # Initialize session state
     if 'page' not in st.session_state:
         st.session_state.page = 'login'
 
+    # Restore a session from its token after a browser refresh
+    if 'user_id' not in st.session_state and 'session' in st.query_params:
+        token = st.query_params["session"]
+        user_id = verify_session(token) if Config.SESSION_IN_URL else None
+        if user_id is not None:
+            st.session_state.user_id = user_id
+            st.session_state.session_token = token
+        else:
+            del st.query_params["session"]
+
+    # Revoking a session, or deleting or deactivating its user, ends it in open tabs too
+    if session_ended():
+        end_session()
+        st.warning("Your session has ended, please log in again")
+
     # Sidebar navigation
     if 'user_id' in st.session_state:
+        # In memory only; last_seen is written in batches
+        get_activity_tracker().seen(st.session_state.user_id)
         show_authenticated_sidebar()
     else:
         show_login_sidebar()
@@ -296,10 +752,17 @@ def main():
         show_users_page()
     elif st.session_state.page == 'profile':
         show_profile_page()
+    elif st.session_state.page == 'audit':
+        show_audit_page()
+
+    # Rendered last so the profile covers everything else in this run
+    if Config.DEBUG_PANEL and 'user_id' in st.session_state:
+        show_debug_panel()
 
 if __name__ == "__main__":
     try:
-        main()
+        with full_render():
+            main()
     except Exception as e:
         logger.error(f"Application error: {str(e)}")
         st.error("An unexpected error occurred. Please try again later.")
\ No newline at end of file
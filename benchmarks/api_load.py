@@ -0,0 +1,221 @@
+"""Load test for the headless auth API (``src.api``).
+
+Starts the API in a separate process on a seeded scratch database (or
+targets a running one with ``--host``/``--port``), logs in a pool of
+operator accounts, then keeps ``--connections`` keep-alive connections
+busy for ``--duration`` seconds with a weighted mix of requests. The
+report gives requests/sec overall and p50/p95/p99 latency per endpoint as
+JSON. Logins pay the real bcrypt cost, so give them a small weight unless
+that is what is being measured.
+
+Usage:
+    python -m benchmarks.api_load [--connections 32] [--duration 10] [--users 10000]
+                                  [--mix introspect=5,permissions=3,lookup=2,login=0]
+                                  [--batch 20] [--bcrypt-rounds 12] [--output result.json]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+from config import Config
+from benchmarks.harness import SEED_PASSWORD, seed, summarize, use_scratch_database
+
+PERMISSIONS = ("VIEW_USERS", "EDIT_USER", "VIEW_LOGS", "VIEW_PROFILE", "DELETE_USER")
+
+class Client:
+    """One keep-alive HTTP/1.1 connection speaking JSON"""
+
+    def __init__(self, host, port, api_key=""):
+        self.host = host
+        self.port = port
+        self.api_key = api_key
+        self.reader = self.writer = None
+
+    async def request(self, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        method = "POST" if payload is not None else "GET"
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n")
+        if self.api_key:
+            head += f"X-Api-Key: {self.api_key}\r\n"
+        self.writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+def _serve(db_path, port, workers, bcrypt_rounds, ready):
+    from src.api import AuthAPI
+    from src.bootstrap import bootstrap
+
+    Config.DB_PATH = db_path
+    Config.BCRYPT_ROUNDS = bcrypt_rounds
+
+    async def run():
+        bootstrap()
+        api = AuthAPI("127.0.0.1", port, workers)
+        await api.start()
+        ready.set()
+        await api.server.serve_forever()
+
+    asyncio.run(run())
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"introspect", "permissions", "lookup", "login"}
+    if unknown:
+        raise SystemExit(f"Unknown request kinds in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+async def run(host, port, connections, duration, mix, batch, operators, user_ids, api_key=""):
+    setup = Client(host, port, api_key)
+    tokens = []
+    for name in operators:
+        status, body = await setup.request("/v1/login", {"username": name, "password": SEED_PASSWORD})
+        if status != 200:
+            raise SystemExit(f"Could not log in {name}: {status} {body}")
+        tokens.append(body["token"])
+    setup.close()
+
+    def make_request(rng, kind):
+        if kind == "introspect":
+            return "/v1/introspect", {"token": rng.choice(tokens)}
+        if kind == "permissions":
+            return "/v1/permissions/check", {"checks": [
+                {"user_id": rng.choice(user_ids), "permission": rng.choice(PERMISSIONS)}
+                for _ in range(batch)
+            ]}
+        if kind == "lookup":
+            return "/v1/users/lookup", {"ids": rng.sample(user_ids, min(batch, len(user_ids)))}
+        return "/v1/login", {"username": rng.choice(operators), "password": SEED_PASSWORD}
+
+    kinds = [kind for kind, weight in mix.items() if weight > 0]
+    weights = [mix[kind] for kind in kinds]
+    samples = {kind: [] for kind in kinds}
+    statuses = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        rng = random.Random(index)
+        client = Client(host, port, api_key)
+        try:
+            while time.perf_counter() < deadline:
+                kind = rng.choices(kinds, weights)[0]
+                path, payload = make_request(rng, kind)
+                started = time.perf_counter()
+                status, _ = await client.request(path, payload)
+                samples[kind].append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(connections)))
+    elapsed = time.perf_counter() - started
+    overall = [latency for latencies in samples.values() for latency in latencies]
+    return {
+        "wall_time_s": elapsed,
+        "requests_per_sec": len(overall) / elapsed,
+        "overall": summarize(overall, elapsed),
+        "endpoints": {kind: summarize(latencies, elapsed) for kind, latencies in samples.items()},
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the headless auth API")
+    parser.add_argument("--host", help="Target a running API instead of starting one")
+    parser.add_argument("--port", type=int, default=Config.API_PORT)
+    parser.add_argument("--api-key", default=Config.API_KEY)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--mix", default="introspect=5,permissions=3,lookup=2,login=0")
+    parser.add_argument("--batch", type=int, default=20, help="Checks or ids per batch request")
+    parser.add_argument("--operators", type=int, default=8, help="Accounts logged in for tokens")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=Config.API_WORKERS)
+    parser.add_argument("--bcrypt-rounds", type=int, default=Config.BCRYPT_ROUNDS)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    server = None
+    if args.host:
+        host, port = args.host, args.port
+        operators = [f"operator{i:03d}" for i in range(args.operators)]
+        # A running server's ids are unknown; ids past the end just come back missing
+        user_ids = list(range(1, args.users + 1))
+    else:
+        from src.models import User
+
+        Config.BCRYPT_ROUNDS = args.bcrypt_rounds
+        use_scratch_database()
+        first_id = seed(args.users)
+        operators = [f"operator{i:03d}" for i in range(args.operators)]
+        for name in operators:
+            User.create(name, f"{name}@example.com", SEED_PASSWORD, "Admin")
+        user_ids = list(range(first_id, first_id + args.users))
+
+        host, port = "127.0.0.1", _free_port()
+        context = multiprocessing.get_context("spawn")
+        ready = context.Event()
+        server = context.Process(target=_serve, daemon=True,
+                                 args=(Config.DB_PATH, port, args.workers, args.bcrypt_rounds, ready))
+        server.start()
+        if not ready.wait(60):
+            raise SystemExit("API server did not start")
+
+    try:
+        result = asyncio.run(run(host, port, args.connections, args.duration, mix,
+                                 args.batch, operators, user_ids, args.api_key))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    report = {
+        "benchmark": "api_load",
+        "connections": args.connections,
+        "duration_s": args.duration,
+        "mix": mix,
+        "batch": args.batch,
+        "users": args.users,
+        "workers": args.workers,
+        "bcrypt_rounds": args.bcrypt_rounds,
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
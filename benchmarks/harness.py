@@ -0,0 +1,84 @@
+"""Shared pieces of the benchmark scripts: a seeded scratch database and latency summaries"""
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from config import Config
+
+SEED_PASSWORD = "bench-password"
+AUDIT_ACTIONS = ("LOGIN", "LOGOUT", "LOGIN_FAILED", "EDIT_USER", "CHANGE_PASSWORD", "CHANGE_EMAIL")
+ROLES = ("User", "User", "User", "Viewer", "Manager", "Admin")
+
+def use_scratch_database(name="bench.db") -> str:
+    """Point ``Config.DB_PATH`` at a new empty database and bootstrap the process on it"""
+    from src.bootstrap import bootstrap
+
+    Config.DB_PATH = str(Path(tempfile.mkdtemp()) / name)
+    bootstrap()
+    return Config.DB_PATH
+
+def seed(user_count, audit_rows=0, batch_size=5000, rng=None):
+    """Insert ``user_count`` users (password ``SEED_PASSWORD``) and ``audit_rows`` events.
+
+    Every user shares one bcrypt hash made at ``Config.BCRYPT_ROUNDS``, so
+    seeding is dominated by inserts rather than hashing while logins still
+    pay the real verification cost.
+    """
+    from database.db_operations import get_db_connection
+    from src.passwords import hash_password
+
+    rng = rng or random.Random(42)
+    hashed = hash_password(SEED_PASSWORD)
+    with get_db_connection() as conn:
+        for start in range(0, user_count, batch_size):
+            conn.executemany(
+                "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
+                [(f"user{i:07d}", f"user{i:07d}@example.com", hashed, rng.choice(ROLES))
+                 for i in range(start, min(start + batch_size, user_count))],
+            )
+            conn.commit()
+
+        first_id = conn.execute("SELECT MIN(id) FROM users WHERE username LIKE 'user%'").fetchone()[0]
+        now = datetime.utcnow()
+        for start in range(0, audit_rows, batch_size):
+            conn.executemany(
+                "INSERT INTO audit_log (user_id, action, timestamp, details) VALUES (?, ?, ?, ?)",
+                [(first_id + rng.randrange(user_count) if user_count else None,
+                  rng.choice(AUDIT_ACTIONS),
+                  (now - timedelta(seconds=rng.randrange(90 * 86400))).strftime("%Y-%m-%d %H:%M:%S"),
+                  None)
+                 for _ in range(start, min(start + batch_size, audit_rows))],
+            )
+            conn.commit()
+    return first_id
+
+def summarize(latencies, elapsed=None) -> dict:
+    """p50/p95/p99 and mean in milliseconds plus throughput for a list of seconds"""
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1e3
+
+    elapsed = sum(latencies) if elapsed is None else elapsed
+    return {
+        "count": len(ordered),
+        "ops_per_sec": len(ordered) / elapsed if elapsed > 0 else None,
+        "mean_ms": statistics.fmean(ordered) * 1e3,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1e3,
+    }
+
+def timed_calls(func, iterations):
+    """Call ``func(i)`` ``iterations`` times; returns the per-call latencies"""
+    latencies = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - started)
+    return latencies
@@ -0,0 +1,119 @@
+"""Latency and throughput of the auth and user-management hot paths.
+
+Seeds a scratch SQLite database with ``--users`` users and ``--audit-rows``
+audit events, then times each operation in-process and prints p50/p95/p99
+latency and ops/sec as JSON, so two runs can be diffed to spot regressions.
+``User.get_all`` no longer exists; the Users page reads through
+``User.get_page``, which is measured on the first page and on a deep page.
+Pass ``--users 1000000`` to check full-text search against its 10 ms target.
+
+Usage:
+    python -m benchmarks.hot_paths [--users 10000] [--audit-rows 100000]
+                                   [--iterations 2000] [--bcrypt-iterations 20]
+                                   [--bcrypt-rounds 12] [--output result.json]
+"""
+import argparse
+import json
+import platform
+import random
+from config import Config
+from benchmarks.harness import SEED_PASSWORD, seed, summarize, timed_calls, use_scratch_database
+
+def run(args) -> dict:
+    from src.auth import create_jwt_token, verify_jwt_token
+    from src.models import User, _user_cache
+
+    first_id = seed(args.users, args.audit_rows)
+    rng = random.Random(7)
+    user_ids = [first_id + rng.randrange(args.users) for _ in range(args.iterations)]
+    usernames = [f"user{rng.randrange(args.users):07d}" for _ in range(args.bcrypt_iterations)]
+    permissions = sorted({p for perms in Config.ROLES_HIERARCHY.values() for p in perms if p != "ALL"})
+    results = {}
+
+    results["User.create"] = summarize(timed_calls(
+        lambda i: User.create(f"bench{i:07d}", f"bench{i:07d}@example.com", SEED_PASSWORD, "User"),
+        args.bcrypt_iterations,
+    ))
+    results["User.authenticate"] = summarize(timed_calls(
+        lambda i: User.authenticate(usernames[i], SEED_PASSWORD), args.bcrypt_iterations,
+    ))
+
+    def get_uncached(i):
+        User.begin_request()
+        _user_cache.clear()
+        User.get_by_id(user_ids[i])
+
+    def get_cross_session(i):
+        User.begin_request()
+        User.get_by_id(user_ids[i])
+
+    results["User.get_by_id (database)"] = summarize(timed_calls(get_uncached, args.iterations))
+    # Warm the cross-session cache first so the second pass measures hits
+    for user_id in set(user_ids):
+        User.get_by_id(user_id)
+    results["User.get_by_id (cached)"] = summarize(timed_calls(get_cross_session, args.iterations))
+
+    pages = max(1, args.iterations // 20)
+    results["User.get_page (first page)"] = summarize(timed_calls(
+        lambda i: User.get_page(limit=50), pages,
+    ))
+    deep_cursor = (f"user{args.users // 2:07d}", 0)
+    results["User.get_page (deep page)"] = summarize(timed_calls(
+        lambda i: User.get_page(after=deep_cursor, limit=50), pages,
+    ))
+    results["User.get_page (role filter)"] = summarize(timed_calls(
+        lambda i: User.get_page(role="Manager", limit=50), pages,
+    ))
+
+    # Ranked prefix searches of increasing selectivity, plus one broad enough
+    # to fall back to an unranked listing at the default rank limit
+    for query in ("user01234", "user0123", "user012 manager", "ad", "us"):
+        results[f"User.search ({query!r})"] = summarize(timed_calls(
+            lambda i: User.search(query), pages,
+        ))
+
+    users = [User.get_by_id(user_id) for user_id in user_ids[:256]]
+    checks = [(users[i % len(users)], permissions[i % len(permissions)])
+              for i in range(args.iterations * 10)]
+    results["User.has_permission"] = summarize(timed_calls(
+        lambda i: checks[i][0].has_permission(checks[i][1]), len(checks),
+    ))
+
+    tokens = [create_jwt_token(user_id) for user_id in user_ids]
+    results["create_jwt_token"] = summarize(timed_calls(
+        lambda i: create_jwt_token(user_ids[i]), args.iterations,
+    ))
+    results["verify_jwt_token"] = summarize(timed_calls(
+        lambda i: verify_jwt_token(tokens[i]), args.iterations,
+    ))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the auth and user-management hot paths")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--audit-rows", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--bcrypt-iterations", type=int, default=20,
+                        help="Iterations for create/authenticate, which pay for bcrypt")
+    parser.add_argument("--bcrypt-rounds", type=int, default=Config.BCRYPT_ROUNDS)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    Config.BCRYPT_ROUNDS = args.bcrypt_rounds
+    use_scratch_database()
+    report = {
+        "benchmark": "hot_paths",
+        "python": platform.python_version(),
+        "users": args.users,
+        "audit_rows": args.audit_rows,
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "results": run(args),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
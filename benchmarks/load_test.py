@@ -0,0 +1,155 @@
+"""Concurrent simulated sessions driven through ``app.py`` with Streamlit's AppTest.
+
+Each worker plays whole sessions: open the app, log in through the
+form, resume the session from its token, then visit the Dashboard, Users
+(including the next page), Audit Log and Profile pages before logging
+out. Every interaction is one script run, timed end to end, and the
+report gives p50/p95/p99 latency and ops/sec per step and overall as
+JSON. AppTest runs the script in-process, so this measures the app and
+storage code under concurrency, not the websocket layer or browser
+rendering.
+
+AppTest drives a process-wide Streamlit runtime that one test tears down
+while another is still running, so each worker is a separate process. The
+workers share the seeded SQLite file, so write contention is real, but each
+has its own caches and connection pool, as separate app replicas would.
+
+Usage:
+    python -m benchmarks.load_test [--sessions 8] [--rounds 5] [--users 10000]
+                                   [--audit-rows 100000] [--bcrypt-rounds 12]
+                                   [--output result.json]
+"""
+import argparse
+import json
+import multiprocessing
+import time
+from pathlib import Path
+from config import Config
+from benchmarks.harness import SEED_PASSWORD, seed, summarize, use_scratch_database
+
+APP_PATH = str(Path(__file__).resolve().parent.parent / "app.py")
+
+def create_operators(count):
+    """One Admin account per worker so every session can reach every page"""
+    from src.models import User
+
+    for i in range(count):
+        User.create(f"operator{i:03d}", f"operator{i:03d}@example.com", SEED_PASSWORD, "Admin")
+
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+def play_session(worker, samples, errors):
+    from streamlit.testing.v1 import AppTest
+
+    def step(name, action):
+        started = time.perf_counter()
+        action()
+        samples.setdefault(name, []).append(time.perf_counter() - started)
+        if at.exception:
+            errors.append(f"{name}: {at.exception[0].value}")
+
+    def login():
+        at.text_input[0].input(f"operator{worker:03d}")
+        at.text_input[1].input(SEED_PASSWORD)
+        at.button[0].click().run()
+
+    def navigate(label):
+        return lambda: at.sidebar.radio[0].set_value(label).run()
+
+    def resume():
+        # AppTest keeps the login form's widgets around after the st.rerun that
+        # follows a login, so the session continues in a fresh AppTest restored
+        # from its token, exactly like a browser refresh
+        nonlocal at
+        token = at.session_state["session_token"]
+        at = AppTest.from_file(APP_PATH, default_timeout=120)
+        at.query_params["session"] = token
+        at.run()
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    step("open", at.run)
+    step("login", login)
+    if not any(t.value == "Dashboard" for t in at.title):
+        errors.append(f"worker {worker}: login failed")
+        return
+    step("resume_session", resume)
+    step("dashboard", navigate("Dashboard"))
+    step("users", navigate("Users"))
+    step("users_next_page", lambda: _button(at, "Next").click().run())
+    step("audit_log", navigate("Audit Log"))
+    step("profile", navigate("Profile"))
+    step("logout", lambda: at.sidebar.button[0].click().run())
+
+def _worker(index, rounds, db_path, bcrypt_rounds):
+    Config.DB_PATH = db_path
+    Config.BCRYPT_ROUNDS = bcrypt_rounds
+    # The resume step restores the session from its URL token
+    Config.SESSION_IN_URL = True
+    # Pay for the Streamlit and app imports before the clock starts
+    from streamlit.testing.v1 import AppTest  # noqa: F401
+    import src.models  # noqa: F401
+
+    samples, errors = {}, []
+    started = time.time()
+    for _ in range(rounds):
+        try:
+            play_session(index, samples, errors)
+        except Exception as e:
+            errors.append(f"worker {index}: {e!r}")
+    return samples, errors, started, time.time()
+
+def run(sessions, rounds):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(sessions) as pool:
+        results = pool.starmap(
+            _worker, [(i, rounds, Config.DB_PATH, Config.BCRYPT_ROUNDS) for i in range(sessions)]
+        )
+    elapsed = max(r[3] for r in results) - min(r[2] for r in results)
+
+    by_step, errors = {}, []
+    for samples, worker_errors, _, _ in results:
+        errors.extend(worker_errors)
+        for name, latencies in samples.items():
+            by_step.setdefault(name, []).extend(latencies)
+    overall = [latency for latencies in by_step.values() for latency in latencies]
+    return {
+        "wall_time_s": elapsed,
+        "overall": summarize(overall, elapsed),
+        "steps": {name: summarize(latencies, elapsed) for name, latencies in by_step.items()},
+        "errors": errors[:20],
+        "error_count": len(errors),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent AppTest sessions against app.py")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent simulated sessions (processes)")
+    parser.add_argument("--rounds", type=int, default=5, help="Sessions played by each worker")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--audit-rows", type=int, default=100000)
+    parser.add_argument("--bcrypt-rounds", type=int, default=Config.BCRYPT_ROUNDS)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    Config.BCRYPT_ROUNDS = args.bcrypt_rounds
+    use_scratch_database()
+    seed(args.users, args.audit_rows)
+    create_operators(args.sessions)
+
+    report = {
+        "benchmark": "load_test",
+        "sessions": args.sessions,
+        "rounds": args.rounds,
+        "users": args.users,
+        "audit_rows": args.audit_rows,
+        "bcrypt_rounds": args.bcrypt_rounds,
+        **run(args.sessions, args.rounds),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Memory and bytes read per user when listing large user sets.
+
+Seeds ``--users`` users and loads every one of them in each of these
+shapes, measuring with ``tracemalloc`` what stays allocated once the rows
+are released:
+
+* ``select_star_dicts`` - ``SELECT *`` rows as dicts, password hash included;
+* ``dict_model`` - the previous ``User`` layout, a ``__dict__`` per instance
+  with every field set and its own overrides dict, from the list columns;
+* ``record.<projection>`` - slotted ``User`` records for each entry of
+  ``USER_PROJECTIONS``, loaded through ``UserRepository.get_many``.
+
+Each shape also reports the payload bytes read per row and the load time.
+A second section compares ``User.get_many`` with a ``get_by_id`` loop for
+``--batch`` cold ids.
+
+Usage:
+    python -m benchmarks.memory_bench [--users 100000] [--batch 1000] [--output result.json]
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from benchmarks.harness import seed, use_scratch_database
+from src.models import _parse_timestamp
+
+CHUNK = 10000
+
+class DictUser:
+    """The layout ``User`` had before it became a slotted record"""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.username = row["username"]
+        self.email = row["email"]
+        self.role = row["role"]
+        self.is_active = bool(row["is_active"])
+        self.created_at = _parse_timestamp(row["created_at"])
+        self.last_login = _parse_timestamp(row["last_login"])
+        self.permission_overrides = dict(row.get("permission_overrides") or {})
+        self._permission_mask = None
+
+def payload_bytes(row) -> int:
+    total = 0
+    for value in row.values():
+        if isinstance(value, str):
+            total += len(value.encode())
+        elif isinstance(value, bytes):
+            total += len(value)
+        elif isinstance(value, dict):
+            total += len(json.dumps(value))
+        elif value is not None:
+            total += 8
+    return total
+
+def measure(load) -> dict:
+    """Retained and peak memory of ``load()``'s result, plus payload bytes per row"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    objects, sample = load()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(objects)
+    del objects
+    return {
+        "objects": count,
+        "load_s": elapsed,
+        "retained_mb": retained / 1e6,
+        "peak_mb": peak / 1e6,
+        "bytes_per_object": retained / count if count else None,
+        "payload_bytes_per_row": sum(map(payload_bytes, sample)) / len(sample) if sample else None,
+    }
+
+def run(user_count, batch) -> dict:
+    from database.db_operations import get_db_connection
+    from database.repositories import USER_PROJECTIONS, get_storage
+    from src.models import User, _user_cache
+
+    first_id = seed(user_count)
+    ids = list(range(first_id, first_id + user_count))
+    users = get_storage().users
+
+    def select_star():
+        with get_db_connection() as conn:
+            rows = [dict(row) for row in conn.execute("SELECT * FROM users")]
+        return rows, rows[:1000]
+
+    def projected_rows(projection):
+        for start in range(0, len(ids), CHUNK):
+            yield from users.get_many(ids[start:start + CHUNK], projection)
+
+    def dict_model():
+        sample, objects = [], []
+        for row in projected_rows("row"):
+            if len(sample) < 1000:
+                sample.append(row)
+            objects.append(DictUser(row))
+        return objects, sample
+
+    def records(projection):
+        def load():
+            sample, objects = [], []
+            for row in projected_rows(projection):
+                if len(sample) < 1000:
+                    sample.append(row)
+                objects.append(User._from_row(row))
+            return objects, sample
+        return load
+
+    shapes = {"select_star_dicts": measure(select_star), "dict_model": measure(dict_model)}
+    for projection in USER_PROJECTIONS:
+        shapes[f"record.{projection}"] = measure(records(projection))
+
+    cold = ids[-batch:]
+
+    def cold_start():
+        User.begin_request()
+        _user_cache.clear()
+
+    cold_start()
+    started = time.perf_counter()
+    loaded = User.get_many(cold, "row")
+    many_s = time.perf_counter() - started
+    cold_start()
+    started = time.perf_counter()
+    for user_id in cold:
+        User.get_by_id(user_id, "row")
+    loop_s = time.perf_counter() - started
+    cold_start()
+
+    return {
+        "shapes": shapes,
+        "batch_load": {
+            "ids": len(cold),
+            "found": len(loaded),
+            "get_many_ms": many_s * 1e3,
+            "get_by_id_loop_ms": loop_s * 1e3,
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-user memory and bytes read when listing users")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=1000, help="Ids for the get_many comparison")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    use_scratch_database()
+    report = {"benchmark": "memory", "users": args.users, **run(args.users, args.batch)}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
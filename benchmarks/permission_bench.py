@@ -0,0 +1,69 @@
+"""Micro-benchmark: list-membership role checks vs compiled permission bitmasks.
+
+Usage:
+    python -m benchmarks.permission_bench [--synthetic-roles 300] [--iterations 200000]
+"""
+import argparse
+import json
+import random
+import timeit
+from config import Config
+from src.permissions import PermissionRegistry
+
+def legacy_check(roles_hierarchy, role, permission):
+    """The pre-bitmask User.has_permission logic"""
+    return (permission in roles_hierarchy[role] or
+            "ALL" in roles_hierarchy[role])
+
+def synthetic_hierarchy(role_count, permission_count=60, per_role=25, seed=7):
+    rng = random.Random(seed)
+    permissions = [f"PERM_{i}" for i in range(permission_count)]
+    return {f"Role{i}": rng.sample(permissions, per_role) for i in range(role_count)}, permissions
+
+def bench(roles_hierarchy, permissions, iterations):
+    registry = PermissionRegistry(roles_hierarchy)
+    rng = random.Random(1)
+    cases = [(rng.choice(list(roles_hierarchy)), rng.choice(permissions)) for _ in range(1024)]
+    masks = [(registry.role_mask(role), permission) for role, permission in cases]
+
+    def run_legacy():
+        for role, permission in cases:
+            legacy_check(roles_hierarchy, role, permission)
+
+    def run_bitmask():
+        for mask, permission in masks:
+            registry.check(mask, permission)
+
+    # Sanity check: both implementations must agree
+    for (role, permission), (mask, _) in zip(cases, masks):
+        assert legacy_check(roles_hierarchy, role, permission) == registry.check(mask, permission)
+
+    loops = max(1, iterations // len(cases))
+    legacy = min(timeit.repeat(run_legacy, number=loops, repeat=5)) / (loops * len(cases))
+    bitmask = min(timeit.repeat(run_bitmask, number=loops, repeat=5)) / (loops * len(cases))
+    compile_time = min(timeit.repeat(lambda: PermissionRegistry(roles_hierarchy), number=1, repeat=5))
+    return {
+        "roles": len(roles_hierarchy),
+        "legacy_ns_per_check": legacy * 1e9,
+        "bitmask_ns_per_check": bitmask * 1e9,
+        "speedup": legacy / bitmask if bitmask else None,
+        "compile_ms": compile_time * 1e3,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--synthetic-roles", type=int, default=300)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    existing_permissions = sorted({p for perms in Config.ROLES_HIERARCHY.values() for p in perms
+                                   if p != "ALL"})
+    synthetic_roles, synthetic_permissions = synthetic_hierarchy(args.synthetic_roles)
+    report = {
+        "existing_roles": bench(Config.ROLES_HIERARCHY, existing_permissions, args.iterations),
+        "synthetic_roles": bench(synthetic_roles, synthetic_permissions, args.iterations),
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
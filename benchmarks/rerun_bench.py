@@ -0,0 +1,96 @@
+"""Script execution time per UI interaction, before and after fragments.
+
+Drives ``app.py`` through Streamlit's AppTest harness against a scratch
+database and reads the timings the app records in
+``st.session_state.render_timings``. AppTest always re-executes the whole
+script, so for each interaction the report gives:
+
+* ``full_rerun_ms`` - the complete script run, i.e. what every click cost
+  before fragments;
+* ``fragment_ms`` - the fragment that owns the widget, i.e. what a live
+  server re-executes now that the interaction is fragment-scoped.
+
+Usage:
+    python -m benchmarks.rerun_bench [--users 2000] [--repeat 5]
+"""
+import argparse
+import json
+import statistics
+import tempfile
+from pathlib import Path
+from config import Config
+
+APP_PATH = str(Path(__file__).resolve().parent.parent / "app.py")
+
+def seed(user_count):
+    from database.db_operations import get_db_connection, init_database
+
+    init_database()
+    with get_db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
+            ((f"user{i:06d}", f"user{i:06d}@example.com", "x", "User") for i in range(user_count)),
+        )
+        conn.commit()
+
+def open_page(label):
+    from streamlit.testing.v1 import AppTest
+    from src.sessions import issue_session
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.session_state.user_id = 1
+    at.session_state.session_token = issue_session(1)
+    at.run()
+    at.sidebar.radio[0].set_value(label).run()
+    return at
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+def selectbox(at, label):
+    return next(s for s in at.selectbox if s.label == label)
+
+def text_input(at, label):
+    return next(t for t in at.text_input if t.label == label)
+
+INTERACTIONS = [
+    # (name, page, fragment that owns the widget, action)
+    ("dashboard_render", "Dashboard", "dashboard_cards", lambda at: at.run()),
+    ("users_next_page", "Users", "users_list", lambda at: button(at, "Next").click().run()),
+    ("users_filter", "Users", "users_list", lambda at: text_input(at, "Username or email starts with").input("user00").run()),
+    ("users_bulk_action", "Users", "users_list",
+     lambda at: selectbox(at, "Bulk action").set_value("Change role").run()),
+    ("users_toggle_add", "Users", "add_user", lambda at: button(at, "Add New User").click().run()),
+]
+
+def measure(repeat):
+    results = {}
+    for name, page, owner, action in INTERACTIONS:
+        full, partial = [], []
+        for _ in range(repeat):
+            at = open_page(page)
+            action(at)
+            if at.exception:
+                raise RuntimeError(f"{name} raised: {at.exception[0].value}")
+            timings = at.session_state.render_timings
+            full.append(timings["script"] * 1e3)
+            partial.append(timings[owner] * 1e3)
+        results[name] = {
+            "fragment": owner,
+            "full_rerun_ms": statistics.median(full),
+            "fragment_ms": statistics.median(partial),
+        }
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-interaction script execution time")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    Config.DB_PATH = str(Path(tempfile.mkdtemp()) / "bench.db")
+    seed(args.users)
+    print(json.dumps({"users": args.users, "interactions": measure(args.repeat)}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Cold-start cost: module imports, the bootstrap stage and the first render.
+
+Every measurement runs in a fresh interpreter so nothing is already
+imported or cached, and the report gives the median and minimum over
+``--repeat`` runs in milliseconds as JSON:
+
+* ``interpreter`` - ``python -c pass``, the floor under everything else;
+* ``import.<module>`` - importing one entry module; each run also records
+  whether the import created the database file or started threads, which
+  it should never do;
+* ``bootstrap.cold`` / ``bootstrap.warm`` - ``src.bootstrap.bootstrap`` on
+  a new database (migrations and the root user's bcrypt hash) and on one
+  that is already current;
+* ``render.first`` / ``render.second`` - the first and second AppTest run
+  of ``app.py`` in a new process, i.e. what the first visitor after a
+  deploy waits for and what a warm rerun costs.
+
+Usage:
+    python -m benchmarks.startup [--repeat 5] [--modules config src.models src.api app]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE_IMPORT = """
+import json, os, sys, threading, time
+existed = os.path.exists(sys.argv[2])
+started = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "threads": threading.active_count() - 1,
+                  "db_created": not existed and os.path.exists(sys.argv[2])}))
+"""
+
+PROBE_BOOTSTRAP = """
+import json, sys, time
+from config import Config
+Config.DB_PATH = sys.argv[1]
+from src.bootstrap import bootstrap
+started = time.perf_counter()
+bootstrap()
+print(json.dumps({"seconds": time.perf_counter() - started}))
+"""
+
+PROBE_RENDER = """
+import json, sys, time
+from config import Config
+Config.DB_PATH = sys.argv[1]
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[2], default_timeout=120)
+started = time.perf_counter()
+at.run()
+first = time.perf_counter() - started
+started = time.perf_counter()
+at.run()
+print(json.dumps({"first": first, "second": time.perf_counter() - started,
+                  "errors": [str(e.value) for e in at.exception]}))
+"""
+
+def probe(code, *args) -> dict:
+    result = subprocess.run([sys.executable, "-c", code, *map(str, args)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def summarize_ms(seconds) -> dict:
+    return {"median_ms": statistics.median(seconds) * 1e3, "min_ms": min(seconds) * 1e3}
+
+def run(repeat, modules) -> dict:
+    from config import Config
+
+    report = {"interpreter": _interpreter(repeat)}
+    for module in modules:
+        runs = [probe(PROBE_IMPORT, module, Config.DB_PATH) for _ in range(repeat)]
+        report[f"import.{module}"] = {
+            **summarize_ms([r["seconds"] for r in runs]),
+            "threads_started": max(r["threads"] for r in runs),
+            "database_created": any(r["db_created"] for r in runs),
+        }
+
+    workdir = Path(tempfile.mkdtemp())
+    cold = [probe(PROBE_BOOTSTRAP, workdir / f"cold{i}.db")["seconds"] for i in range(repeat)]
+    warm = [probe(PROBE_BOOTSTRAP, workdir / "cold0.db")["seconds"] for _ in range(repeat)]
+    report["bootstrap.cold"] = summarize_ms(cold)
+    report["bootstrap.warm"] = summarize_ms(warm)
+
+    renders = [probe(PROBE_RENDER, workdir / "cold0.db", ROOT / "app.py") for _ in range(repeat)]
+    report["render.first"] = summarize_ms([r["first"] for r in renders])
+    report["render.second"] = summarize_ms([r["second"] for r in renders])
+    report["render_errors"] = sorted({e for r in renders for e in r["errors"]})
+    return report
+
+def _interpreter(repeat) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        seconds.append(time.perf_counter() - started)
+    return summarize_ms(seconds)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import, bootstrap and first-render latency")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=["config", "src.models", "src.api", "app"])
+    args = parser.parse_args(argv)
+    print(json.dumps({"benchmark": "startup", "repeat": args.repeat,
+                      **run(args.repeat, args.modules)}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,116 @@
 from decouple import config
 from pathlib import Path
 
-# Create database directory if it doesn't exist
-Path("database").mkdir(exist_ok=True)
-
 class Config:
     # Use absolute path for database
     DB_PATH = str(Path(__file__).parent / "database" / "users.db")
     SECRET_KEY = config('SECRET_KEY', default='your-secret-key-change-in-production')
     JWT_EXPIRY_HOURS = config('JWT_EXPIRY_HOURS', default=24, cast=int)
+    SESSION_SWEEP_INTERVAL = config('SESSION_SWEEP_INTERVAL', default=300.0, cast=float)
+    SESSION_SWEEP_BATCH = config('SESSION_SWEEP_BATCH', default=500, cast=int)
+    # Keep the session JWT in the ?session= URL so a login survives a browser
+    # refresh. The bearer token then ends up in browser history, Referer
+    # headers and every copied link, and sharing a link shares the login.
+    SESSION_IN_URL = config('SESSION_IN_URL', default=False, cast=bool)
+
+    # Login brute-force protection
+    LOGIN_MAX_FAILURES = config('LOGIN_MAX_FAILURES', default=5, cast=int)
+    LOGIN_CLIENT_MAX_FAILURES = config('LOGIN_CLIENT_MAX_FAILURES', default=50, cast=int)
+    LOGIN_WINDOW_SECONDS = config('LOGIN_WINDOW_SECONDS', default=900, cast=int)
+    LOGIN_LOCKOUT_SECONDS = config('LOGIN_LOCKOUT_SECONDS', default=900, cast=int)
+    LOGIN_LIMITER_MAX_KEYS = config('LOGIN_LIMITER_MAX_KEYS', default=100000, cast=int)
+    LOGIN_FLUSH_INTERVAL = config('LOGIN_FLUSH_INTERVAL', default=5.0, cast=float)
+    # Reverse proxies in front of the app and the API. X-Forwarded-For is
+    # ignored unless this is set, since any client can send the header.
+    TRUSTED_PROXY_HOPS = config('TRUSTED_PROXY_HOPS', default=0, cast=int)
+
+    # Last-login/last-seen tracking, written to users in batches
+    ACTIVITY_FLUSH_INTERVAL = config('ACTIVITY_FLUSH_INTERVAL', default=10.0, cast=float)
+    ACTIVITY_MAX_USERS = config('ACTIVITY_MAX_USERS', default=100000, cast=int)
+    ACTIVE_WINDOW_MINUTES = config('ACTIVE_WINDOW_MINUTES', default=15, cast=int)
+
+    # Storage backend for users, sessions and audit: sqlite or postgres
+    DB_BACKEND = config('DB_BACKEND', default='sqlite')
+    POSTGRES_DSN = config('POSTGRES_DSN', default='')
+    POSTGRES_POOL_MIN = config('POSTGRES_POOL_MIN', default=1, cast=int)
+    POSTGRES_POOL_MAX = config('POSTGRES_POOL_MAX', default=10, cast=int)
+
+    # Connection pool and SQLite tuning
+    DB_POOL_SIZE = config('DB_POOL_SIZE', default=5, cast=int)
+    DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10.0, cast=float)
+    DB_HEALTH_CHECK_INTERVAL = config('DB_HEALTH_CHECK_INTERVAL', default=30.0, cast=float)
+    DB_MMAP_SIZE = config('DB_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)
+    DB_CACHED_STATEMENTS = config('DB_CACHED_STATEMENTS', default=256, cast=int)
+
+    # Reporting reads (dashboard, audit log) from a periodically refreshed
+    # snapshot copy instead of the live database; SQLite only
+    REPORTING_SNAPSHOT = config('REPORTING_SNAPSHOT', default=False, cast=bool)
+    SNAPSHOT_REFRESH_SECONDS = config('SNAPSHOT_REFRESH_SECONDS', default=60.0, cast=float)
+    # Defaults to <DB_PATH without .db>-snapshot.db
+    SNAPSHOT_PATH = config('SNAPSHOT_PATH', default='')
+
+    # Instrumentation: query/page/bcrypt timings, slow-query log (0 ms disables)
+    # and a Prometheus endpoint (port 0 disables). The endpoint has no auth and
+    # its output includes SQL text, so it listens on localhost unless told otherwise
+    DB_INSTRUMENTATION = config('DB_INSTRUMENTATION', default=True, cast=bool)
+    SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=100.0, cast=float)
+    SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default='')
+    METRICS_HOST = config('METRICS_HOST', default='127.0.0.1')
+    METRICS_PORT = config('METRICS_PORT', default=0, cast=int)
+    # Per-rerun timing and query panel for users with VIEW_DEBUG
+    DEBUG_PANEL = config('DEBUG_PANEL', default=False, cast=bool)
+
+    # UI rendering
+    USE_FRAGMENTS = config('USE_FRAGMENTS', default=True, cast=bool)
+    DASHBOARD_REFRESH_SECONDS = config('DASHBOARD_REFRESH_SECONDS', default=0, cast=int)
+    REFERENCE_CACHE_TTL_SECONDS = config('REFERENCE_CACHE_TTL_SECONDS', default=60, cast=int)
+    USER_SEARCH_MIN_CHARS = config('USER_SEARCH_MIN_CHARS', default=2, cast=int)
+    USER_SEARCH_LIMIT = config('USER_SEARCH_LIMIT', default=50, cast=int)
+    # Searches matching more users than this list them unranked
+    USER_SEARCH_RANK_LIMIT = config('USER_SEARCH_RANK_LIMIT', default=1000, cast=int)
+
+    # Cross-session user cache (set either value to 0 to disable)
+    USER_CACHE_SIZE = config('USER_CACHE_SIZE', default=1024, cast=int)
+    USER_CACHE_TTL_SECONDS = config('USER_CACHE_TTL_SECONDS', default=30.0, cast=float)
+
+    # Headless auth API for other services (python -m src.api); when
+    # API_KEY is set every request must send it in the X-Api-Key header
+    API_HOST = config('API_HOST', default='127.0.0.1')
+    API_PORT = config('API_PORT', default=8600, cast=int)
+    API_KEY = config('API_KEY', default='')
+    API_WORKERS = config('API_WORKERS', default=8, cast=int)
+    API_MAX_BODY_BYTES = config('API_MAX_BODY_BYTES', default=1048576, cast=int)
+    API_BATCH_LIMIT = config('API_BATCH_LIMIT', default=1000, cast=int)
+    API_IDLE_TIMEOUT = config('API_IDLE_TIMEOUT', default=30.0, cast=float)
+
+    # Password hashing service
+    BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=12, cast=int)
+    PASSWORD_WORKERS = config('PASSWORD_WORKERS', default=4, cast=int)
+    PASSWORD_MAX_PENDING = config('PASSWORD_MAX_PENDING', default=32, cast=int)
+    PASSWORD_QUEUE_TIMEOUT = config('PASSWORD_QUEUE_TIMEOUT', default=5.0, cast=float)
+
+    # Background audit log writer
+    AUDIT_BATCH_SIZE = config('AUDIT_BATCH_SIZE', default=100, cast=int)
+    AUDIT_FLUSH_INTERVAL = config('AUDIT_FLUSH_INTERVAL', default=1.0, cast=float)
+    AUDIT_MAX_QUEUE = config('AUDIT_MAX_QUEUE', default=10000, cast=int)
+    # One of: drop_oldest, drop_newest, block
+    AUDIT_OVERFLOW_POLICY = config('AUDIT_OVERFLOW_POLICY', default='drop_oldest')
+    AUDIT_BLOCK_TIMEOUT = config('AUDIT_BLOCK_TIMEOUT', default=0.5, cast=float)
+    AUDIT_RETENTION_DAYS = config('AUDIT_RETENTION_DAYS', default=90, cast=int)
     
     ROLES_HIERARCHY = {
         "Root": ["ALL"],
-        "Admin": ["VIEW_USERS", "ADD_USER", "EDIT_USER", "DELETE_USER", "VIEW_LOGS"],
+        "Admin": ["VIEW_USERS", "ADD_USER", "EDIT_USER", "DELETE_USER", "VIEW_LOGS", "VIEW_DEBUG"],
         "Manager": ["VIEW_USERS", "ADD_USER", "EDIT_USER", "VIEW_LOGS"],
         "User": ["VIEW_PROFILE", "EDIT_PROFILE"],
         "Viewer": ["VIEW_PROFILE"]
+    }
+
+    # Roles that additionally receive every permission of the listed roles.
+    # A user may only grant roles whose permissions they hold themselves, so
+    # each role inherits the roles below it
+    ROLE_INHERITANCE = {
+        "Admin": ["Manager"],
+        "Manager": ["User"],
+        "User": ["Viewer"],
     }
\ No newline at end of file
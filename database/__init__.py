@@ -1 +1,2 @@
-from .db_operations import get_db_connection, init_database
\ No newline at end of file
+from .db_operations import ensure_database, get_db_connection, get_pool_stats, init_database
+from .repositories import DuplicateKeyError, close_storage, get_storage
@@ -1,84 +1,357 @@
 import sqlite3
+import queue
+import threading
+import time
 from contextlib import contextmanager
 import logging
 from pathlib import Path
-import sys
-
-# Add parent directory to path to import config
-sys.path.append(str(Path(__file__).parent.parent))
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Called as ``observer(sql, seconds, rows, executed, total)`` for every timed
+# cursor operation; see ``set_query_observer``
+_query_observer = None
+
+def set_query_observer(observer):
+    """Receive timings from instrumented connections (``None`` to stop).
+
+    The observer is called once per ``execute``/``executemany`` with
+    ``executed=True`` and again for every fetch with the extra time and rows
+    it took, so a query's cost includes streaming its result. ``total`` is
+    the time spent on the statement so far.
+    """
+    global _query_observer
+    _query_observer = observer
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports SQL text, duration and row counts to the query observer"""
+
+    _sql = None
+    _elapsed = 0.0
+
+    def _report(self, seconds, rows, executed):
+        self._elapsed += seconds
+        observer = _query_observer
+        if observer is not None and self._sql is not None:
+            observer(self._sql, seconds, rows, executed, self._elapsed)
+
+    def _run(self, method, sql, params):
+        self._sql, self._elapsed = sql, 0.0
+        started = time.perf_counter()
+        method(self, sql, params)
+        self._report(time.perf_counter() - started, max(self.rowcount, 0), True)
+        return self
+
+    def execute(self, sql, params=()):
+        return self._run(sqlite3.Cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_params)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._report(time.perf_counter() - started, 0 if row is None else 1, False)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._report(time.perf_counter() - started, len(rows), False)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._report(time.perf_counter() - started, len(rows), False)
+        return rows
+
+class PooledConnection(sqlite3.Connection):
+    """Connection handed out by ``ConnectionPool``.
+
+    A checkout nested inside an open transaction runs in a SAVEPOINT. While
+    it is held, ``commit`` releases the nested work into the caller's
+    transaction and ``rollback`` undoes only the nested work, so a helper
+    that commits or rolls back never ends its caller's transaction.
+    """
+
+    _savepoints = ()
+
+    def _execute_raw(self, sql):
+        sqlite3.Connection.execute(self, sql)
+
+    def begin_nested(self):
+        name = f"nested_{len(self._savepoints) + 1}"
+        self._execute_raw(f"SAVEPOINT {name}")
+        self._savepoints += (name,)
+
+    def end_nested(self, rollback=False):
+        name = self._savepoints[-1]
+        self._savepoints = self._savepoints[:-1]
+        if self.in_transaction:
+            if rollback:
+                self._execute_raw(f"ROLLBACK TO {name}")
+            self._execute_raw(f"RELEASE {name}")
+
+    def commit(self):
+        if not self._savepoints or not self.in_transaction:
+            return super().commit()
+        name = self._savepoints[-1]
+        self._execute_raw(f"RELEASE {name}")
+        self._execute_raw(f"SAVEPOINT {name}")
+
+    def rollback(self):
+        if not self._savepoints or not self.in_transaction:
+            return super().rollback()
+        self._execute_raw(f"ROLLBACK TO {self._savepoints[-1]}")
+
+class TimedConnection(PooledConnection):
+    """Connection whose shortcut ``execute`` methods go through ``TimedCursor``"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections shared between threads.
+
+    Connections are opened once, tuned with WAL journaling and kept for the
+    lifetime of the process. A thread that is already holding a connection
+    gets the same one back on nested checkouts, so helpers that open a
+    connection inside another ``get_db_connection`` block never deadlock the
+    pool. When the outer holder has a transaction open, the nested checkout
+    runs in a savepoint (see ``PooledConnection``) that is released on exit
+    and rolled back if the block raises.
+    """
+
+    def __init__(self, db_path, size=None, timeout=None, health_check_interval=None):
+        self.db_path = db_path
+        self.size = size or Config.DB_POOL_SIZE
+        self.timeout = Config.DB_POOL_TIMEOUT if timeout is None else timeout
+        self.health_check_interval = (Config.DB_HEALTH_CHECK_INTERVAL
+                                      if health_check_interval is None
+                                      else health_check_interval)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+        }
+
+        # Ensure database directory exists
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=Config.DB_CACHED_STATEMENTS,
+            factory=TimedConnection if Config.DB_INSTRUMENTATION else PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)}")
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding unhealthy pooled connection: {str(e)}")
+            with self._lock:
+                self._stats["health_check_failures"] += 1
+                self._created -= 1
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return False
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+                with self._lock:
+                    self._stats["hits"] += 1
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                        self._stats["misses"] += 1
+                if can_create:
+                    try:
+                        return self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+
+                started = time.monotonic()
+                try:
+                    conn, last_used = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                with self._lock:
+                    self._stats["waits"] += 1
+                    self._stats["wait_time"] += time.monotonic() - started
+
+            if self._is_healthy(conn, last_used):
+                return conn
+
+    def _checkin(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Dropping pooled connection after failed rollback: {str(e)}")
+            with self._lock:
+                self._created -= 1
+            conn.close()
+            return
+        if self._closed:
+            with self._lock:
+                self._created -= 1
+            conn.close()
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection, reusing the one this thread already holds"""
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            nested = held.in_transaction
+            if nested:
+                held.begin_nested()
+            self._local.depth += 1
+            try:
+                yield held
+            except BaseException:
+                if nested:
+                    held.end_nested(rollback=True)
+                raise
+            else:
+                if nested:
+                    held.end_nested()
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._checkin(conn)
+
+    def close(self):
+        """Close all idle connections; connections in use are closed on return"""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["open"] - stats["idle"]
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide pool for ``Config.DB_PATH``"""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.db_path == Config.DB_PATH:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.db_path != Config.DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(Config.DB_PATH)
+        return _pool
+
+def get_pool_stats():
+    """Pool hit/miss, wait-time and occupancy counters"""
+    return get_pool().stats()
+
 @contextmanager
 def get_db_connection():
-    conn = None
     try:
-        # Ensure database directory exists
-        Path(Config.DB_PATH).parent.mkdir(exist_ok=True)
-        
-        conn = sqlite3.connect(Config.DB_PATH)
-        conn.row_factory = sqlite3.Row
-        yield conn
+        with get_pool().connection() as conn:
+            yield conn
     except Exception as e:
         logger.error(f"Database error: {str(e)}")
         raise
-    finally:
-        if conn:
-            conn.close()
 
 def init_database():
-    """Initialize the database and create tables"""
+    """Bring the schema up to date by applying pending migrations"""
+    from .migrations import migrate
+
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    failed_login_attempts INTEGER DEFAULT 0
-                )
-            ''')
-            
-            # Create root user if not exists
-            cursor.execute("SELECT 1 FROM users WHERE username = 'root'")
-            if not cursor.fetchone():
-                import bcrypt
-                hashed_password = bcrypt.hashpw("root123".encode(), bcrypt.gensalt()).decode()
-                cursor.execute('''
-                    INSERT INTO users (username, email, password, role, is_active)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', ('root', 'root@admin.com', hashed_password, 'Root', True))
-            
-            # Audit log table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS audit_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    action TEXT NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    details TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            conn.commit()
-            logger.info("Database initialized successfully")
-            
+        Path(Config.DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        applied = migrate()
+        if applied:
+            logger.info(f"Database initialized successfully ({len(applied)} migrations applied)")
     except Exception as e:
         logger.error(f"Failed to initialize database: {str(e)}")
         raise
 
-# Initialize database when module is imported
-try:
-    init_database()
-except Exception as e:
-    logger.error(f"Failed to initialize database: {str(e)}")
\ No newline at end of file
+_initialized = set()
+_init_lock = threading.Lock()
+
+def ensure_database():
+    """Create or migrate the configured database once per process.
+
+    SQLite runs init_database; other backends ensure their own schema.
+    """
+    if Config.DB_BACKEND == "sqlite":
+        key = Config.DB_PATH
+    else:
+        key = (Config.DB_BACKEND, Config.POSTGRES_DSN)
+    if key in _initialized:
+        return
+    with _init_lock:
+        if key not in _initialized:
+            if Config.DB_BACKEND == "sqlite":
+                init_database()
+            else:
+                from .repositories import get_storage
+                get_storage().ensure_schema()
+            _initialized.add(key)
\ No newline at end of file
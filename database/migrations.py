@@ -0,0 +1,335 @@
+"""Versioned schema migrations.
+
+Every schema change is an entry in ``MIGRATIONS``: a version number, a name
+and a sequence of steps, each either one SQL statement or a callable taking
+the connection. Applied versions are recorded in ``schema_version``, so
+each migration runs exactly once per database. A database that is already
+current costs a single ``SELECT MAX(version)`` at startup.
+
+Statements use ``IF NOT EXISTS`` so databases created before versioning are
+adopted by replaying the history over the tables they already have.
+
+Usage:
+    python -m database.migrations status
+    python -m database.migrations migrate [--target N] [--dry-run]
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+from config import Config
+from .db_operations import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+def _create_root_user(conn):
+    """Insert the default root user if it does not exist"""
+    if conn.execute("SELECT 1 FROM users WHERE username = 'root'").fetchone():
+        return
+    import bcrypt
+    hashed_password = bcrypt.hashpw("root123".encode(), bcrypt.gensalt(rounds=Config.BCRYPT_ROUNDS)).decode()
+    conn.execute('''
+        INSERT INTO users (username, email, password, role, is_active)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ('root', 'root@admin.com', hashed_password, 'Root', True))
+    logger.info("Root user created successfully")
+
+MIGRATIONS = [
+    (1, "initial schema", (
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE,
+            failed_login_attempts INTEGER DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            details TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            session_token TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+    )),
+    (2, "root user", (_create_root_user,)),
+    # The leading columns also serve plain lookups on users(role), users(is_active)
+    # and audit_log(timestamp), so no separate single-column indexes are needed
+    (3, "users list indexes", (
+        "CREATE INDEX IF NOT EXISTS idx_users_role_username ON users(role, username)",
+        "CREATE INDEX IF NOT EXISTS idx_users_active_username ON users(is_active, username)",
+        "CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at, id)",
+    )),
+    (4, "audit log indexes", (
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log(timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log(user_id, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_action ON audit_log(action, timestamp, id)",
+    )),
+    (5, "per-user permission overrides", (
+        # granted = 1 is a grant, granted = 0 a revocation
+        '''
+        CREATE TABLE IF NOT EXISTS user_permissions (
+            user_id INTEGER NOT NULL,
+            permission TEXT NOT NULL,
+            granted BOOLEAN NOT NULL,
+            PRIMARY KEY (user_id, permission),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        ) WITHOUT ROWID
+        ''',
+    )),
+    (6, "session indexes", (
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id, is_active)",
+    )),
+    (7, "dashboard metric rollups", (
+        # Counters bucketed per hour and per day (UTC)
+        '''
+        CREATE TABLE IF NOT EXISTS metric_rollups (
+            metric TEXT NOT NULL,
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, granularity, bucket)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS daily_active_users (
+            day TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID
+        ''',
+        # Seed the running total for databases that predate the rollups
+        '''
+        INSERT OR IGNORE INTO metric_rollups (metric, granularity, bucket, value)
+        SELECT 'users_total', 'all', '', COUNT(*) FROM users
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_insert_metrics AFTER INSERT ON users
+        BEGIN
+            INSERT INTO metric_rollups (metric, granularity, bucket, value)
+            VALUES ('new_users', 'hour', strftime('%Y-%m-%d %H:00', 'now'), 1),
+                   ('new_users', 'day', date('now'), 1),
+                   ('users_total', 'all', '', 1)
+            ON CONFLICT (metric, granularity, bucket) DO UPDATE SET value = value + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_delete_metrics AFTER DELETE ON users
+        BEGIN
+            UPDATE metric_rollups SET value = value - 1
+            WHERE metric = 'users_total' AND granularity = 'all' AND bucket = '';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_sessions_insert_metrics AFTER INSERT ON sessions
+        BEGIN
+            INSERT INTO metric_rollups (metric, granularity, bucket, value)
+            VALUES ('sessions', 'hour', strftime('%Y-%m-%d %H:00', 'now'), 1),
+                   ('sessions', 'day', date('now'), 1)
+            ON CONFLICT (metric, granularity, bucket) DO UPDATE SET value = value + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_daily_active_users_metrics AFTER INSERT ON daily_active_users
+        BEGIN
+            INSERT INTO metric_rollups (metric, granularity, bucket, value)
+            VALUES ('active_users', 'day', NEW.day, 1)
+            ON CONFLICT (metric, granularity, bucket) DO UPDATE SET value = value + 1;
+        END
+        ''',
+    )),
+    (8, "login lockouts", (
+        "ALTER TABLE users ADD COLUMN locked_until TIMESTAMP",
+        "CREATE INDEX IF NOT EXISTS idx_users_locked_until ON users(locked_until)",
+    )),
+    (9, "user search index", (
+        # External-content FTS5 index: the text stays in users and the index
+        # only holds tokens. Prefix indexes for two to four characters keep short
+        # prefix queries off the full term list.
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            username, email, role,
+            content='users', content_rowid='id',
+            prefix='2 3 4'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO users_fts (rowid, username, email, role)
+            VALUES (NEW.id, NEW.username, NEW.email, NEW.role);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, username, email, role)
+            VALUES ('delete', OLD.id, OLD.username, OLD.email, OLD.role);
+        END
+        ''',
+        # Password, login and lockout updates leave the index alone
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_update
+        AFTER UPDATE OF username, email, role ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, username, email, role)
+            VALUES ('delete', OLD.id, OLD.username, OLD.email, OLD.role);
+            INSERT INTO users_fts (rowid, username, email, role)
+            VALUES (NEW.id, NEW.username, NEW.email, NEW.role);
+        END
+        ''',
+        # Index the users that predate the triggers
+        "INSERT INTO users_fts (users_fts) VALUES ('rebuild')",
+    )),
+    (10, "last seen", (
+        "ALTER TABLE users ADD COLUMN last_seen TIMESTAMP",
+    )),
+    # The Users page prefix filter compares lower(username) and lower(email)
+    (11, "case-insensitive user prefix indexes", (
+        "CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users(lower(username))",
+        "CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users(lower(email))",
+    )),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(conn) -> int:
+    """Highest applied migration, 0 for an unversioned database"""
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            return 0
+        raise
+
+def pending_migrations(version, target=None):
+    target = LATEST_VERSION if target is None else target
+    return [m for m in MIGRATIONS if version < m[0] <= target]
+
+def describe_step(step) -> str:
+    if callable(step):
+        return f"-- python: {step.__name__}: {step.__doc__ or ''}".rstrip(": ")
+    return "\n".join(line.strip() for line in step.strip().splitlines())
+
+def _apply(conn, version, name, steps):
+    # BEGIN IMMEDIATE takes the write lock up front, so a second process
+    # starting at the same time waits and then sees the migration as applied
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        if current_version(conn) >= version:
+            conn.rollback()
+            return False
+        for step in steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+        conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+def migrate(target=None, dry_run=False):
+    """Apply pending migrations up to ``target`` (default: latest).
+
+    Returns the list of ``(version, name)`` that were applied, or that would
+    be applied when ``dry_run`` is set.
+    """
+    with get_db_connection() as conn:
+        pending = pending_migrations(current_version(conn), target)
+        if dry_run or not pending:
+            return [(version, name) for version, name, _ in pending]
+
+        applied = []
+        for version, name, steps in pending:
+            if _apply(conn, version, name, steps):
+                logger.info(f"Applied migration {version}: {name}")
+                applied.append((version, name))
+        return applied
+
+def status() -> dict:
+    with get_db_connection() as conn:
+        version = current_version(conn)
+        history = []
+        if version:
+            history = [dict(row) for row in conn.execute(
+                "SELECT version, name, applied_at FROM schema_version ORDER BY version")]
+    return {
+        "database": Config.DB_PATH,
+        "current_version": version,
+        "latest_version": LATEST_VERSION,
+        "applied": history,
+        "pending": [(v, name) for v, name, _ in pending_migrations(version)],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show applied and pending migrations")
+    migrate_parser = subparsers.add_parser("migrate", help="Apply pending migrations")
+    migrate_parser.add_argument("--target", type=int, help="Stop after this version")
+    migrate_parser.add_argument("--dry-run", action="store_true",
+                                help="Print the pending steps without applying them")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        report = status()
+        print(f"Database: {report['database']}")
+        print(f"Schema version: {report['current_version']} (latest {report['latest_version']})")
+        for row in report["applied"]:
+            print(f"  [applied] {row['version']:>3}  {row['name']}  ({row['applied_at']})")
+        for version, name in report["pending"]:
+            print(f"  [pending] {version:>3}  {name}")
+        return 0
+
+    if args.dry_run:
+        with get_db_connection() as conn:
+            pending = pending_migrations(current_version(conn), args.target)
+        if not pending:
+            print("Schema is up to date")
+        for version, name, steps in pending:
+            print(f"-- migration {version}: {name}")
+            for step in steps:
+                print(describe_step(step) + ";")
+            print()
+        return 0
+
+    applied = migrate(args.target)
+    if not applied:
+        print("Schema is up to date")
+    for version, name in applied:
+        print(f"Applied {version}: {name}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
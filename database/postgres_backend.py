@@ -0,0 +1,287 @@
+"""PostgreSQL storage for deployments where several app replicas share one database.
+
+Requires ``psycopg`` (3.x) and ``psycopg_pool``; both are imported only when
+``Config.DB_BACKEND`` is ``postgres``. Connections come from a
+``psycopg_pool.ConnectionPool`` sized by ``Config.POSTGRES_POOL_MIN``/``MAX``,
+and full-table reads such as the user export stream through a named
+(server-side) cursor instead of materialising the result on the client.
+
+The schema is created by ``ensure_schema`` and versioned in the same
+``schema_version`` table as the SQLite migrations, so a current database
+costs one read at startup. The dashboard rollups are kept by PL/pgSQL
+equivalents of the SQLite triggers, at statement level so a bulk import
+bumps each counter once.
+"""
+import logging
+import uuid
+from config import Config
+from .repositories import DuplicateKeyError, Storage
+from .sql_repositories import (SQLAuditRepository, SQLMetricsRepository, SQLSessionRepository,
+                              SQLUserRepository)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 5
+
+# Search document for the users table; the expression must match the GIN
+# index exactly for the planner to use it
+USER_SEARCH_VECTOR = (
+    "(setweight(to_tsvector('simple', username), 'A') || "
+    "setweight(to_tsvector('simple', translate(email, '@._-', '    ')), 'B') || "
+    "setweight(to_tsvector('simple', role), 'C'))"
+)
+
+# Rollup buckets in UTC, as SQLite's strftime('%Y-%m-%d %H:00', 'now') and date('now')
+UTC_HOUR = "to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD HH24:00')"
+UTC_DAY = "to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD')"
+
+def _bump_rollups(buckets):
+    """Statement adding the number of changed rows to each ``(metric, granularity, bucket)``"""
+    values = ", ".join(f"({metric}, {granularity}, {bucket})"
+                       for metric, granularity, bucket in buckets)
+    return f'''
+        INSERT INTO metric_rollups (metric, granularity, bucket, value)
+        SELECT m.metric, m.granularity, m.bucket, c.n
+        FROM (SELECT COUNT(*) AS n FROM changed) AS c,
+             (VALUES {values}) AS m (metric, granularity, bucket)
+        WHERE c.n > 0
+        ON CONFLICT (metric, granularity, bucket)
+        DO UPDATE SET value = metric_rollups.value + excluded.value;
+    '''
+
+def _rollup_trigger(table, event, transition, body):
+    """Function and statement-level trigger running ``body`` after ``event`` on ``table``.
+
+    ``body`` sees the affected rows as the transition table ``changed``.
+    """
+    name = f"{table}_{event.lower()}_metrics"
+    return (
+        f'''
+        CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            {body}
+            RETURN NULL;
+        END
+        $$
+        ''',
+        f"DROP TRIGGER IF EXISTS trg_{name} ON {table}",
+        f"CREATE TRIGGER trg_{name} AFTER {event} ON {table} REFERENCING {transition} TABLE AS "
+        f"changed FOR EACH STATEMENT EXECUTE FUNCTION {name}()",
+    )
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc'),
+        last_login TIMESTAMP,
+        is_active BOOLEAN DEFAULT TRUE,
+        failed_login_attempts INTEGER DEFAULT 0,
+        locked_until TIMESTAMP,
+        last_seen TIMESTAMP
+    )
+    ''',
+    # Databases created at schema v2 or earlier
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS idx_users_role_username ON users(role, username)",
+    "CREATE INDEX IF NOT EXISTS idx_users_active_username ON users(is_active, username)",
+    "CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_users_locked_until ON users(locked_until)",
+    # Case-insensitive prefix filter of the Users page (schema v4)
+    'CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users ((lower(username COLLATE "C")))',
+    'CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users ((lower(email COLLATE "C")))',
+    f"CREATE INDEX IF NOT EXISTS idx_users_search ON users USING GIN ({USER_SEARCH_VECTOR})",
+    '''
+    CREATE TABLE IF NOT EXISTS user_permissions (
+        user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        permission TEXT NOT NULL,
+        granted BOOLEAN NOT NULL,
+        PRIMARY KEY (user_id, permission)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id BIGINT REFERENCES users(id) ON DELETE CASCADE,
+        session_token TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc'),
+        expires_at TIMESTAMP NOT NULL,
+        is_active BOOLEAN DEFAULT TRUE
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id, is_active)",
+    '''
+    CREATE TABLE IF NOT EXISTS audit_log (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id BIGINT REFERENCES users(id) ON DELETE SET NULL,
+        action TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc'),
+        details TEXT
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log(timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log(user_id, timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_log_action ON audit_log(action, timestamp, id)",
+    # Dashboard rollups (schema v5), as SQLite migration 7
+    '''
+    CREATE TABLE IF NOT EXISTS metric_rollups (
+        metric TEXT NOT NULL,
+        granularity TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        value BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (metric, granularity, bucket)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS daily_active_users (
+        day TEXT NOT NULL,
+        user_id BIGINT NOT NULL,
+        PRIMARY KEY (day, user_id)
+    )
+    ''',
+    # Seed the running total for databases that predate the rollups
+    '''
+    INSERT INTO metric_rollups (metric, granularity, bucket, value)
+    SELECT 'users_total', 'all', '', COUNT(*) FROM users
+    ON CONFLICT DO NOTHING
+    ''',
+    *_rollup_trigger("users", "INSERT", "NEW", _bump_rollups([
+        ("'new_users'", "'hour'", UTC_HOUR),
+        ("'new_users'", "'day'", UTC_DAY),
+        ("'users_total'", "'all'", "''"),
+    ])),
+    *_rollup_trigger("users", "DELETE", "OLD", '''
+        UPDATE metric_rollups SET value = value - (SELECT COUNT(*) FROM changed)
+        WHERE metric = 'users_total' AND granularity = 'all' AND bucket = '';
+    '''),
+    *_rollup_trigger("sessions", "INSERT", "NEW", _bump_rollups([
+        ("'sessions'", "'hour'", UTC_HOUR),
+        ("'sessions'", "'day'", UTC_DAY),
+    ])),
+    # Only first logins of the day reach the table, so this counts distinct users
+    *_rollup_trigger("daily_active_users", "INSERT", "NEW", '''
+        INSERT INTO metric_rollups (metric, granularity, bucket, value)
+        SELECT 'active_users', 'day', day, COUNT(*) FROM changed GROUP BY day
+        ON CONFLICT (metric, granularity, bucket)
+        DO UPDATE SET value = metric_rollups.value + excluded.value;
+    '''),
+)
+
+class PostgresDialect:
+    bigint = "BIGINT"
+    overrides_column = (
+        "(SELECT json_object_agg(permission, granted) FROM user_permissions "
+        "WHERE user_id = users.id)"
+    )
+
+    search_source = (f"users, to_tsquery('simple', ?) AS query "
+                     f"WHERE {USER_SEARCH_VECTOR} @@ query")
+    search_id = "id"
+    # ts_rank is higher for better matches; negated so lower sorts first as in SQLite
+    search_score = f"-ts_rank({USER_SEARCH_VECTOR}, query)"
+
+    def __init__(self, pool, integrity_errors):
+        self.pool = pool
+        self.integrity_errors = integrity_errors
+
+    def connection(self):
+        return self.pool.connection()
+
+    @staticmethod
+    def sql(query):
+        return query.replace("%", "%%").replace("?", "%s")
+
+    @staticmethod
+    def lower_column(column):
+        # The "C" collation makes lower() fold ASCII only, as SQLite's does,
+        # and the range a plain byte-order prefix match; must match the index
+        return f'lower({column} COLLATE "C")'
+
+    @staticmethod
+    def match_query(terms):
+        return " & ".join(f"{term}:*" for term in terms)
+
+    def iter_rows(self, query, params, batch_size):
+        with self.pool.connection() as conn:
+            with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+                yield from cursor
+
+class PostgresStorage(Storage):
+    name = "postgres"
+
+    def __init__(self, dsn, min_size=None, max_size=None):
+        try:
+            import psycopg
+            from psycopg.rows import dict_row
+            from psycopg_pool import ConnectionPool
+        except ImportError as e:
+            raise RuntimeError(
+                "DB_BACKEND=postgres needs the psycopg and psycopg_pool packages"
+            ) from e
+        if not dsn:
+            raise RuntimeError("DB_BACKEND=postgres needs POSTGRES_DSN")
+
+        self.pool = ConnectionPool(
+            dsn,
+            min_size=min_size or Config.POSTGRES_POOL_MIN,
+            max_size=max_size or Config.POSTGRES_POOL_MAX,
+            timeout=Config.DB_POOL_TIMEOUT,
+            kwargs={"row_factory": dict_row},
+            open=True,
+        )
+        dialect = PostgresDialect(self.pool, (psycopg.errors.UniqueViolation,))
+        self.users = SQLUserRepository(dialect)
+        self.sessions = SQLSessionRepository(dialect)
+        self.audit = SQLAuditRepository(dialect)
+        self.metrics = SQLMetricsRepository(dialect)
+
+    def _current_version(self, conn):
+        exists = conn.execute("SELECT to_regclass('schema_version') AS t").fetchone()["t"]
+        if exists is None:
+            return 0
+        return conn.execute("SELECT MAX(version) AS v FROM schema_version").fetchone()["v"] or 0
+
+    def ensure_schema(self):
+        with self.pool.connection() as conn:
+            if self._current_version(conn) >= SCHEMA_VERSION:
+                return
+            # Serialise replicas starting at the same time
+            conn.execute("SELECT pg_advisory_xact_lock(hashtext('tbc_schema'))")
+            if self._current_version(conn) < SCHEMA_VERSION:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                    (SCHEMA_VERSION, f"schema v{SCHEMA_VERSION}"),
+                )
+                logger.info("PostgreSQL schema created")
+            conn.commit()
+        self._create_root_user()
+
+    def _create_root_user(self):
+        if self.users.get_credentials("root") is not None:
+            return
+        import bcrypt
+        hashed_password = bcrypt.hashpw("root123".encode(), bcrypt.gensalt(rounds=Config.BCRYPT_ROUNDS)).decode()
+        try:
+            self.users.insert("root", "root@admin.com", hashed_password, "Root")
+            logger.info("Root user created successfully")
+        except DuplicateKeyError:
+            pass
+
+    def close(self):
+        self.pool.close()
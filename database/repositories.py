@@ -0,0 +1,247 @@
+"""Storage interfaces for users, sessions, the audit log and dashboard metrics.
+
+Application code talks to ``get_storage().users`` / ``.sessions`` /
+``.audit`` / ``.metrics`` rather than to a database driver. ``Config.DB_BACKEND`` selects
+the implementation: ``sqlite`` (default, ``database/sqlite_backend.py``) or
+``postgres`` (``database/postgres_backend.py``, needs ``psycopg`` and
+``psycopg_pool``). Both share the SQL in ``database/sql_repositories.py``
+and must pass ``tests/test_storage_conformance.py``.
+
+Rows are returned as plain dicts. Timestamps that callers compare or
+parse (session expiry, lockouts) are returned as ``YYYY-MM-DD HH:MM:SS``
+strings on every backend.
+"""
+import threading
+from abc import ABC, abstractmethod
+from config import Config
+
+# Columns the Users page may sort by; each is backed by an index
+SORTABLE_COLUMNS = ("username", "email", "created_at")
+UPDATABLE_COLUMNS = ("email", "password", "role", "is_active")
+# Columns a bulk action may set on many users at once
+BULK_UPDATABLE_COLUMNS = ("role", "is_active")
+# Fields loaded for each way a user is shown; ``permission_overrides`` is the
+# ``{permission: granted}`` aggregate of user_permissions. The password hash
+# is never part of a projection.
+USER_PROJECTIONS = {
+    "sidebar": ("id", "username", "role", "is_active", "permission_overrides"),
+    "row": ("id", "username", "email", "role", "is_active", "created_at", "last_login"),
+    "profile": ("id", "username", "email", "role", "is_active", "created_at", "last_login",
+                "permission_overrides"),
+}
+
+class DuplicateKeyError(ValueError):
+    """A write violated a unique constraint (username, email, session token)"""
+
+class UserRepository(ABC):
+    @abstractmethod
+    def get(self, user_id, projection="profile"):
+        """User row with the fields of ``USER_PROJECTIONS[projection]``, or None"""
+
+    @abstractmethod
+    def get_many(self, user_ids, projection="profile") -> list:
+        """Rows for the ids that exist, in no particular order, from one ``IN`` query"""
+
+    @abstractmethod
+    def get_by_username(self, username):
+        """The ``row`` projection of a user, or None"""
+
+    @abstractmethod
+    def get_credentials(self, username):
+        """``{id, password, is_active}`` for a login attempt, or None"""
+
+    @abstractmethod
+    def get_password(self, user_id):
+        """Stored password hash, or None"""
+
+    @abstractmethod
+    def count(self, role=None, is_active=None, prefix=None) -> int:
+        pass
+
+    @abstractmethod
+    def page(self, role=None, is_active=None, prefix=None, sort_by="username",
+             descending=False, after=None, limit=50) -> tuple:
+        """Keyset page of ``row`` projections and the ``(sort value, id)`` cursor of the next page"""
+
+    @abstractmethod
+    def search(self, text, limit=50, rank_limit=1000) -> tuple:
+        """Rows where every word of ``text`` prefixes a username, email or role word.
+
+        Returns ``(rows, ranked)``: best match first when at most
+        ``rank_limit`` rows match, otherwise ``ranked`` is False and the rows
+        are the first ``limit`` matches in username order.
+        """
+
+    @abstractmethod
+    def insert(self, username, email, password_hash, role) -> int:
+        """Insert one user and return its id; raises DuplicateKeyError"""
+
+    @abstractmethod
+    def insert_many(self, rows) -> int:
+        """Insert ``(username, email, password_hash, role)`` rows in one
+        transaction; raises DuplicateKeyError and inserts nothing on conflict"""
+
+    @abstractmethod
+    def existing_keys(self, usernames, emails) -> tuple:
+        """The subsets of ``usernames`` and ``emails`` already taken"""
+
+    @abstractmethod
+    def update(self, user_id, **fields):
+        """Update ``UPDATABLE_COLUMNS``; raises DuplicateKeyError"""
+
+    @abstractmethod
+    def update_many(self, user_ids, protected_roles=(), exclude_ids=(), **fields) -> list:
+        """Set ``BULK_UPDATABLE_COLUMNS`` on every listed user in one statement.
+
+        Users whose role is in ``protected_roles`` or whose id is in
+        ``exclude_ids`` are left alone. Returns the ids actually updated.
+        """
+
+    @abstractmethod
+    def delete(self, user_ids, protected_roles=(), exclude_ids=()) -> list:
+        """Delete users and their permission overrides in one transaction,
+        skipping ``protected_roles``/``exclude_ids``; returns the deleted ids"""
+
+    @abstractmethod
+    def set_permission_override(self, user_id, permission, granted):
+        pass
+
+    @abstractmethod
+    def clear_permission_override(self, user_id, permission):
+        pass
+
+    @abstractmethod
+    def save_login_state(self, rows):
+        """Persist ``(username, failed_login_attempts, locked_until)`` rows"""
+
+    @abstractmethod
+    def save_activity(self, rows):
+        """Batch of ``(user_id, last_login or None, last_seen)``; None keeps the stored login"""
+
+    @abstractmethod
+    def locked_users(self, now) -> list:
+        """``{username, failed_login_attempts, locked_until}`` rows locked after ``now``"""
+
+    @abstractmethod
+    def iter_all(self, columns, batch_size=1000):
+        """Stream every user ordered by id without loading the table"""
+
+class SessionRepository(ABC):
+    @abstractmethod
+    def create(self, user_id, token, expires_at):
+        pass
+
+    @abstractmethod
+    def deactivate(self, token):
+        pass
+
+    @abstractmethod
+    def deactivate_for_users(self, user_ids, now) -> list:
+        """Deactivate all sessions of ``user_ids``; returns the
+        ``(token, expires_at)`` pairs that were still live"""
+
+    @abstractmethod
+    def revoked_unexpired(self, now) -> list:
+        """``(token, expires_at)`` pairs of deactivated sessions not yet expired"""
+
+    @abstractmethod
+    def delete_expired(self, now, batch_size) -> int:
+        """Delete at most ``batch_size`` expired sessions"""
+
+class AuditRepository(ABC):
+    @abstractmethod
+    def insert_many(self, events) -> int:
+        """Insert ``(user_id, action, timestamp, details)`` rows"""
+
+    @abstractmethod
+    def page(self, start=None, end=None, user_id=None, action=None,
+             before=None, limit=50) -> tuple:
+        """Events joined with the username, newest first, and the next cursor"""
+
+    @abstractmethod
+    def distinct_actions(self) -> list:
+        pass
+
+    @abstractmethod
+    def oldest_before(self, cutoff, limit) -> list:
+        """Up to ``limit`` events older than ``cutoff``, oldest first, without the username"""
+
+    @abstractmethod
+    def move_to_archive(self, events):
+        """Copy ``events`` to per-month ``audit_log_archive_YYYY_MM`` tables and
+        delete them from ``audit_log``, in one transaction"""
+
+    @abstractmethod
+    def delete(self, event_ids):
+        pass
+
+class MetricsRepository(ABC):
+    """Dashboard counters in ``metric_rollups``, keyed by (metric, granularity, bucket).
+
+    Registrations, deletions and sessions are counted by triggers on
+    ``users`` and ``sessions``; logins through ``record_login``.
+    """
+
+    @abstractmethod
+    def record_login(self, user_id, day, hour):
+        """Count a login in its hour and day buckets and mark the user active on ``day``"""
+
+    @abstractmethod
+    def get(self, metric, granularity="all", bucket="") -> int:
+        pass
+
+    @abstractmethod
+    def daily(self, metrics, first_day, last_day) -> list:
+        """``{metric, bucket, value}`` rows of the day buckets in the inclusive range"""
+
+class Storage(ABC):
+    """A backend: one repository of each kind over a shared connection pool"""
+
+    name = None
+    users: UserRepository
+    sessions: SessionRepository
+    audit: AuditRepository
+    metrics: MetricsRepository
+
+    @abstractmethod
+    def ensure_schema(self):
+        pass
+
+    def close(self):
+        pass
+
+_storage = None
+_storage_key = None
+_storage_lock = threading.Lock()
+
+def _create_storage(backend):
+    if backend == "sqlite":
+        from .sqlite_backend import SQLiteStorage
+        return SQLiteStorage()
+    if backend == "postgres":
+        from .postgres_backend import PostgresStorage
+        return PostgresStorage(Config.POSTGRES_DSN)
+    raise ValueError(f"Unknown DB_BACKEND: {backend!r}")
+
+def get_storage() -> Storage:
+    """Process-wide storage for ``Config.DB_BACKEND``"""
+    global _storage, _storage_key
+    key = (Config.DB_BACKEND, Config.POSTGRES_DSN if Config.DB_BACKEND == "postgres" else Config.DB_PATH)
+    storage = _storage
+    if storage is not None and _storage_key == key:
+        return storage
+    with _storage_lock:
+        if _storage is None or _storage_key != key:
+            if _storage is not None:
+                _storage.close()
+            _storage = _create_storage(Config.DB_BACKEND)
+            _storage_key = key
+        return _storage
+
+def close_storage():
+    """Close the process-wide storage; the next ``get_storage`` opens a new one"""
+    global _storage, _storage_key
+    with _storage_lock:
+        if _storage is not None:
+            _storage.close()
+        _storage = _storage_key = None
@@ -0,0 +1,98 @@
+"""Read-only snapshot copies of the SQLite database for reporting queries.
+
+``Snapshot.refresh`` copies the live database with SQLite's online backup
+API into a temporary file, switches the copy to rollback journaling and
+renames it over the previous snapshot. In WAL mode the backup is a plain
+reader, so logins and registrations keep writing while it runs. Readers
+open the snapshot with ``mode=ro&immutable=1``: the file is never changed
+in place, so SQLite skips locking entirely and a reporting query can
+neither block nor be blocked by the primary. Connections opened before a
+refresh keep reading the old file until their thread next asks for one.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from config import Config
+from .db_operations import TimedConnection
+from .sqlite_backend import SQLiteDialect
+
+logger = logging.getLogger(__name__)
+
+class Snapshot:
+    def __init__(self, source_path, path=None):
+        self.source_path = source_path
+        self.path = path or f"{Path(source_path).with_suffix('')}-snapshot.db"
+        self.refreshed_at = None
+        self.duration = None
+        self.size = None
+        self._generation = 0
+        self._refresh_lock = threading.Lock()
+        self._local = threading.local()
+
+    def refresh(self):
+        """Copy the live database to a new snapshot; returns the time taken"""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            # Unique per process so replicas sharing the directory never collide
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            source = sqlite3.connect(self.source_path)
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target)
+                # Immutable readers cannot replay a WAL, so the copy is a plain file
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+                source.close()
+            os.replace(temp_path, self.path)
+
+            self.duration = time.perf_counter() - started
+            self.size = os.path.getsize(self.path)
+            self.refreshed_at = time.time()
+            self._generation += 1
+        logger.info(f"Reporting snapshot refreshed in {self.duration * 1000:.0f} ms "
+                    f"({self.size / 1e6:.1f} MB)")
+        return self.duration
+
+    @contextmanager
+    def connection(self):
+        """This thread's read-only connection to the newest snapshot"""
+        if self.refreshed_at is None:
+            self.refresh()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            if conn is not None:
+                conn.close()
+            uri = f"{Path(self.path).resolve().as_uri()}?mode=ro&immutable=1"
+            conn = sqlite3.connect(
+                uri, uri=True, check_same_thread=False,
+                factory=TimedConnection if Config.DB_INSTRUMENTATION else sqlite3.Connection,
+            )
+            conn.row_factory = sqlite3.Row
+            self._local.conn, self._local.generation = conn, self._generation
+        yield conn
+
+    def status(self) -> dict:
+        """When the snapshot was taken, how old it is and what it cost"""
+        if self.refreshed_at is None:
+            return {"mode": "snapshot", "refreshed_at": None}
+        return {
+            "mode": "snapshot",
+            "refreshed_at": self.refreshed_at,
+            "age_seconds": time.time() - self.refreshed_at,
+            "refresh_ms": self.duration * 1000,
+            "size_bytes": self.size,
+        }
+
+class SnapshotDialect(SQLiteDialect):
+    """SQLite dialect whose connections read from a snapshot"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def connection(self):
+        return self.snapshot.connection()
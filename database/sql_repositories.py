@@ -0,0 +1,515 @@
+"""Repository implementations shared by the SQL backends.
+
+The statements are written once, with ``?`` placeholders and SQL that both
+SQLite and PostgreSQL accept (row-value comparisons, ``ON CONFLICT``,
+``RETURNING``). Each backend supplies a small dialect object providing the
+connection, placeholder translation, its unique-violation exception types,
+its 64-bit integer type, the per-user overrides aggregate, the lower-cased
+column expression the prefix filter compares, a streaming query and the
+full-text search source and score.
+"""
+import json
+import re
+import string
+from datetime import datetime
+from .repositories import (BULK_UPDATABLE_COLUMNS, SORTABLE_COLUMNS, UPDATABLE_COLUMNS,
+                           USER_PROJECTIONS, AuditRepository, DuplicateKeyError, MetricsRepository,
+                           SessionRepository, UserRepository)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_SEARCH_TERMS = 8
+
+_search_token = re.compile(r"[^\W_]+")
+# lower() folds only ASCII letters on both backends, so the prefix is folded the same way
+_ascii_lower = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def search_terms(text) -> list:
+    """Lower-cased words of a search box entry, split the way the indexes tokenise"""
+    return _search_token.findall(text.lower())[:MAX_SEARCH_TERMS]
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with ``prefix``"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def _text(value):
+    """Render a timestamp column as text whatever type the driver returned"""
+    if isinstance(value, datetime):
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+def _write_unique(db, query, params, many=False, fetch=False):
+    """Run one write and commit; unique violations raise DuplicateKeyError.
+
+    The error is raised after the connection is released so the pool does not
+    log an expected conflict as a database failure.
+    """
+    error = result = None
+    with db.connection() as conn:
+        try:
+            if many:
+                conn.cursor().executemany(db.sql(query), params)
+            else:
+                cursor = conn.execute(db.sql(query), params)
+                result = cursor.fetchone() if fetch else None
+            conn.commit()
+        except db.integrity_errors as e:
+            conn.rollback()
+            error = e
+    if error is not None:
+        raise DuplicateKeyError(str(error)) from error
+    return result
+
+class SQLUserRepository(UserRepository):
+    def __init__(self, dialect):
+        self.db = dialect
+
+    def _one(self, query, params):
+        with self.db.connection() as conn:
+            row = conn.execute(self.db.sql(query), params).fetchone()
+        return dict(row) if row else None
+
+    def _projection(self, projection) -> str:
+        """Select list for a ``USER_PROJECTIONS`` entry, qualified for joins"""
+        if projection not in USER_PROJECTIONS:
+            raise ValueError(f"Unknown user projection {projection!r}")
+        return ", ".join(
+            f"{self.db.overrides_column} AS permission_overrides"
+            if column == "permission_overrides" else f"users.{column}"
+            for column in USER_PROJECTIONS[projection]
+        )
+
+    @staticmethod
+    def _decode(row):
+        if "permission_overrides" in row:
+            overrides = row["permission_overrides"]
+            if isinstance(overrides, str):
+                overrides = json.loads(overrides)
+            row["permission_overrides"] = {k: bool(v) for k, v in (overrides or {}).items()}
+        return row
+
+    def get(self, user_id, projection="profile"):
+        row = self._one(f"SELECT {self._projection(projection)} FROM users WHERE id = ?", (user_id,))
+        return self._decode(row) if row is not None else None
+
+    def get_many(self, user_ids, projection="profile") -> list:
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return []
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(
+                f"SELECT {self._projection(projection)} FROM users "
+                f"WHERE id IN ({_placeholders(user_ids)})"
+            ), user_ids).fetchall()
+        return [self._decode(dict(row)) for row in rows]
+
+    def get_by_username(self, username):
+        return self._one(f"SELECT {self._projection('row')} FROM users WHERE username = ?", (username,))
+
+    def get_credentials(self, username):
+        return self._one("SELECT id, password, is_active FROM users WHERE username = ?", (username,))
+
+    def get_password(self, user_id):
+        row = self._one("SELECT password FROM users WHERE id = ?", (user_id,))
+        return row["password"] if row else None
+
+    def _filter_clause(self, role=None, is_active=None, prefix=None) -> tuple:
+        clauses, params = [], []
+        if role:
+            clauses.append("role = ?")
+            params.append(role)
+        if is_active is not None:
+            clauses.append("is_active = ?")
+            params.append(bool(is_active))
+        if prefix:
+            # Case-insensitive; range predicates instead of LIKE so the
+            # lower(username)/lower(email) expression indexes are used
+            prefix = prefix.translate(_ascii_lower)
+            upper = _prefix_upper_bound(prefix)
+            username, email = self.db.lower_column("username"), self.db.lower_column("email")
+            clauses.append(f"(({username} >= ? AND {username} < ?) "
+                           f"OR ({email} >= ? AND {email} < ?))")
+            params.extend([prefix, upper, prefix, upper])
+        return clauses, params
+
+    def count(self, role=None, is_active=None, prefix=None) -> int:
+        clauses, params = self._filter_clause(role, is_active, prefix)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._one(f"SELECT COUNT(*) AS n FROM users {where}", params)["n"]
+
+    def page(self, role=None, is_active=None, prefix=None, sort_by="username",
+             descending=False, after=None, limit=50) -> tuple:
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort users by {sort_by!r}")
+
+        clauses, params = self._filter_clause(role, is_active, prefix)
+        if after is not None:
+            clauses.append(f"({sort_by}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = "DESC" if descending else "ASC"
+
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(f'''
+                SELECT {self._projection("row")} FROM users
+                {where}
+                ORDER BY {sort_by} {direction}, id {direction}
+                LIMIT ?
+            '''), params + [limit + 1]).fetchall()
+
+        rows = [dict(row) for row in rows]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][sort_by], rows[-1]["id"])
+        return rows, next_cursor
+
+    def search(self, text, limit=50, rank_limit=1000) -> tuple:
+        terms = search_terms(text)
+        if not terms:
+            return [], True
+        db = self.db
+        match = db.match_query(terms)
+        with db.connection() as conn:
+            # Ranking scores every match, so it is only worth it for a bounded
+            # set; counting up to the bound stops early on broad prefixes
+            matches = conn.execute(db.sql(f'''
+                SELECT COUNT(*) AS n FROM (SELECT {db.search_id} FROM {db.search_source} LIMIT ?) AS capped
+            '''), [match, rank_limit + 1]).fetchone()["n"]
+            ranked = matches <= rank_limit
+            if ranked:
+                hits = (f"SELECT {db.search_id} AS hit_id, {db.search_score} AS score "
+                        f"FROM {db.search_source} ORDER BY score LIMIT ?")
+                order = "hits.score, hits.hit_id"
+            else:
+                hits = f"SELECT {db.search_id} AS hit_id FROM {db.search_source} LIMIT ?"
+                order = "users.username"
+            # Only the winners are joined back to users
+            rows = conn.execute(db.sql(f'''
+                SELECT {self._projection("row")} FROM ({hits}) AS hits
+                JOIN users ON users.id = hits.hit_id
+                ORDER BY {order}
+            '''), [match, limit]).fetchall()
+        return [dict(row) for row in rows], ranked
+
+    def insert(self, username, email, password_hash, role) -> int:
+        row = _write_unique(self.db, '''
+            INSERT INTO users (username, email, password, role)
+            VALUES (?, ?, ?, ?)
+            RETURNING id
+        ''', (username, email, password_hash, role), fetch=True)
+        return row["id"]
+
+    def insert_many(self, rows) -> int:
+        rows = list(rows)
+        _write_unique(self.db, "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
+                      rows, many=True)
+        return len(rows)
+
+    def existing_keys(self, usernames, emails) -> tuple:
+        usernames, emails = list(usernames), list(emails)
+        if not usernames and not emails:
+            return set(), set()
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(
+                f"SELECT username, email FROM users "
+                f"WHERE username IN ({_placeholders(usernames) or 'NULL'}) "
+                f"OR email IN ({_placeholders(emails) or 'NULL'})"
+            ), usernames + emails).fetchall()
+        return {row["username"] for row in rows}, {row["email"] for row in rows}
+
+    def update(self, user_id, **fields):
+        unknown = set(fields) - set(UPDATABLE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot update users columns: {sorted(unknown)}")
+        if "is_active" in fields:
+            fields["is_active"] = bool(fields["is_active"])
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        _write_unique(self.db, f"UPDATE users SET {assignments} WHERE id = ?",
+                      list(fields.values()) + [user_id])
+
+    @staticmethod
+    def _batch_clause(user_ids, protected_roles=(), exclude_ids=()) -> tuple:
+        clauses, params = [f"id IN ({_placeholders(user_ids)})"], list(user_ids)
+        if protected_roles:
+            clauses.append(f"role NOT IN ({_placeholders(protected_roles)})")
+            params.extend(protected_roles)
+        if exclude_ids:
+            clauses.append(f"id NOT IN ({_placeholders(exclude_ids)})")
+            params.extend(exclude_ids)
+        return " AND ".join(clauses), params
+
+    def update_many(self, user_ids, protected_roles=(), exclude_ids=(), **fields) -> list:
+        unknown = set(fields) - set(BULK_UPDATABLE_COLUMNS)
+        if unknown or not fields:
+            raise ValueError(f"Cannot bulk update users columns: {sorted(unknown) or 'none given'}")
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        if "is_active" in fields:
+            fields["is_active"] = bool(fields["is_active"])
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        where, params = self._batch_clause(user_ids, list(protected_roles), list(exclude_ids))
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(
+                f"UPDATE users SET {assignments} WHERE {where} RETURNING id"
+            ), list(fields.values()) + params).fetchall()
+            conn.commit()
+        return [row["id"] for row in rows]
+
+    def delete(self, user_ids, protected_roles=(), exclude_ids=()) -> list:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        where, params = self._batch_clause(user_ids, list(protected_roles), list(exclude_ids))
+        with self.db.connection() as conn:
+            deleted = [row["id"] for row in conn.execute(self.db.sql(
+                f"DELETE FROM users WHERE {where} RETURNING id"
+            ), params).fetchall()]
+            if deleted:
+                conn.execute(self.db.sql(
+                    f"DELETE FROM user_permissions WHERE user_id IN ({_placeholders(deleted)})"
+                ), deleted)
+            conn.commit()
+        return deleted
+
+    def set_permission_override(self, user_id, permission, granted):
+        with self.db.connection() as conn:
+            conn.execute(self.db.sql('''
+                INSERT INTO user_permissions (user_id, permission, granted) VALUES (?, ?, ?)
+                ON CONFLICT (user_id, permission) DO UPDATE SET granted = excluded.granted
+            '''), (user_id, permission, bool(granted)))
+            conn.commit()
+
+    def clear_permission_override(self, user_id, permission):
+        with self.db.connection() as conn:
+            conn.execute(self.db.sql(
+                "DELETE FROM user_permissions WHERE user_id = ? AND permission = ?"
+            ), (user_id, permission))
+            conn.commit()
+
+    def save_login_state(self, rows):
+        rows = [(failures, locked_until, username) for username, failures, locked_until in rows]
+        if not rows:
+            return
+        with self.db.connection() as conn:
+            conn.cursor().executemany(self.db.sql(
+                "UPDATE users SET failed_login_attempts = ?, locked_until = ? WHERE username = ?"
+            ), rows)
+            conn.commit()
+
+    def save_activity(self, rows):
+        rows = [(last_login, last_seen, user_id) for user_id, last_login, last_seen in rows]
+        if not rows:
+            return
+        with self.db.connection() as conn:
+            conn.cursor().executemany(self.db.sql(
+                "UPDATE users SET last_login = COALESCE(?, last_login), last_seen = ? WHERE id = ?"
+            ), rows)
+            conn.commit()
+
+    def locked_users(self, now) -> list:
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(
+                "SELECT username, failed_login_attempts, locked_until FROM users "
+                "WHERE locked_until > ?"
+            ), (now,)).fetchall()
+        return [dict(row, locked_until=_text(row["locked_until"])) for row in rows]
+
+    def iter_all(self, columns, batch_size=1000):
+        query = f"SELECT {', '.join(columns)} FROM users ORDER BY id"
+        for row in self.db.iter_rows(self.db.sql(query), (), batch_size):
+            yield dict(row)
+
+class SQLSessionRepository(SessionRepository):
+    def __init__(self, dialect):
+        self.db = dialect
+
+    def create(self, user_id, token, expires_at):
+        _write_unique(self.db, "INSERT INTO sessions (user_id, session_token, expires_at) VALUES (?, ?, ?)",
+                      (user_id, token, expires_at))
+
+    def deactivate(self, token):
+        with self.db.connection() as conn:
+            conn.execute(self.db.sql(
+                "UPDATE sessions SET is_active = FALSE WHERE session_token = ?"
+            ), (token,))
+            conn.commit()
+
+    def deactivate_for_users(self, user_ids, now) -> list:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        placeholders = _placeholders(user_ids)
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(f'''
+                SELECT session_token, expires_at FROM sessions
+                WHERE user_id IN ({placeholders}) AND is_active AND expires_at > ?
+            '''), user_ids + [now]).fetchall()
+            conn.execute(self.db.sql(
+                f"UPDATE sessions SET is_active = FALSE WHERE user_id IN ({placeholders})"
+            ), user_ids)
+            conn.commit()
+        return [(row["session_token"], _text(row["expires_at"])) for row in rows]
+
+    def revoked_unexpired(self, now) -> list:
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(
+                "SELECT session_token, expires_at FROM sessions WHERE NOT is_active AND expires_at > ?"
+            ), (now,)).fetchall()
+        return [(row["session_token"], _text(row["expires_at"])) for row in rows]
+
+    def delete_expired(self, now, batch_size) -> int:
+        with self.db.connection() as conn:
+            cursor = conn.execute(self.db.sql('''
+                DELETE FROM sessions WHERE id IN (
+                    SELECT id FROM sessions WHERE expires_at <= ? LIMIT ?
+                )
+            '''), (now, batch_size))
+            conn.commit()
+        return cursor.rowcount
+
+class SQLAuditRepository(AuditRepository):
+    def __init__(self, dialect):
+        self.db = dialect
+
+    def insert_many(self, events) -> int:
+        events = list(events)
+        with self.db.connection() as conn:
+            conn.cursor().executemany(self.db.sql(
+                "INSERT INTO audit_log (user_id, action, timestamp, details) VALUES (?, ?, ?, ?)"
+            ), events)
+            conn.commit()
+        return len(events)
+
+    @staticmethod
+    def _filter_clause(start=None, end=None, user_id=None, action=None):
+        clauses, params = [], []
+        if start:
+            clauses.append("a.timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("a.timestamp < ?")
+            params.append(end)
+        if user_id is not None:
+            clauses.append("a.user_id = ?")
+            params.append(user_id)
+        if action:
+            clauses.append("a.action = ?")
+            params.append(action)
+        return clauses, params
+
+    def page(self, start=None, end=None, user_id=None, action=None,
+             before=None, limit=50) -> tuple:
+        clauses, params = self._filter_clause(start, end, user_id, action)
+        if before is not None:
+            clauses.append("(a.timestamp, a.id) < (?, ?)")
+            params.extend(before)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(f'''
+                SELECT a.id, a.timestamp, a.user_id, u.username, a.action, a.details
+                FROM audit_log a LEFT JOIN users u ON u.id = a.user_id
+                {where}
+                ORDER BY a.timestamp DESC, a.id DESC
+                LIMIT ?
+            '''), params + [limit + 1]).fetchall()
+
+        rows = [dict(row, timestamp=_text(row["timestamp"])) for row in rows]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1]["timestamp"], rows[-1]["id"])
+        return rows, next_cursor
+
+    def distinct_actions(self) -> list:
+        with self.db.connection() as conn:
+            rows = conn.execute("SELECT DISTINCT action FROM audit_log ORDER BY action").fetchall()
+        return [row["action"] for row in rows]
+
+    def oldest_before(self, cutoff, limit) -> list:
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql('''
+                SELECT id, user_id, action, timestamp, details FROM audit_log
+                WHERE timestamp < ?
+                ORDER BY timestamp, id
+                LIMIT ?
+            '''), (cutoff, limit)).fetchall()
+        return [dict(row, timestamp=_text(row["timestamp"])) for row in rows]
+
+    def move_to_archive(self, events):
+        by_table = {}
+        for event in events:
+            month = event["timestamp"][:7].replace("-", "_")
+            by_table.setdefault(f"audit_log_archive_{month}", []).append(event["id"])
+        event_ids = [event["id"] for event in events]
+        with self.db.connection() as conn:
+            for table, month_ids in by_table.items():
+                conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id {self.db.bigint} PRIMARY KEY,
+                        user_id {self.db.bigint},
+                        action TEXT NOT NULL,
+                        timestamp TIMESTAMP,
+                        details TEXT
+                    )
+                ''')
+                conn.execute(self.db.sql(f'''
+                    INSERT INTO {table} (id, user_id, action, timestamp, details)
+                    SELECT id, user_id, action, timestamp, details FROM audit_log
+                    WHERE id IN ({_placeholders(month_ids)})
+                    ON CONFLICT (id) DO NOTHING
+                '''), month_ids)
+            conn.execute(self.db.sql(
+                f"DELETE FROM audit_log WHERE id IN ({_placeholders(event_ids)})"
+            ), event_ids)
+            conn.commit()
+
+    def delete(self, event_ids):
+        event_ids = list(event_ids)
+        if not event_ids:
+            return
+        with self.db.connection() as conn:
+            conn.execute(self.db.sql(
+                f"DELETE FROM audit_log WHERE id IN ({_placeholders(event_ids)})"
+            ), event_ids)
+            conn.commit()
+
+class SQLMetricsRepository(MetricsRepository):
+    def __init__(self, dialect):
+        self.db = dialect
+
+    def record_login(self, user_id, day, hour):
+        with self.db.connection() as conn:
+            conn.cursor().executemany(self.db.sql('''
+                INSERT INTO metric_rollups (metric, granularity, bucket, value)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (metric, granularity, bucket)
+                DO UPDATE SET value = metric_rollups.value + excluded.value
+            '''), [("logins", "hour", hour, 1), ("logins", "day", day, 1)])
+            # The daily_active_users trigger bumps active_users only on the first login of the day
+            conn.execute(self.db.sql(
+                "INSERT INTO daily_active_users (day, user_id) VALUES (?, ?) ON CONFLICT DO NOTHING"
+            ), (day, user_id))
+            conn.commit()
+
+    def get(self, metric, granularity="all", bucket="") -> int:
+        with self.db.connection() as conn:
+            row = conn.execute(self.db.sql('''
+                SELECT value FROM metric_rollups
+                WHERE metric = ? AND granularity = ? AND bucket = ?
+            '''), (metric, granularity, bucket)).fetchone()
+        return row["value"] if row else 0
+
+    def daily(self, metrics, first_day, last_day) -> list:
+        metrics = list(metrics)
+        with self.db.connection() as conn:
+            rows = conn.execute(self.db.sql(f'''
+                SELECT metric, bucket, value FROM metric_rollups
+                WHERE granularity = 'day' AND metric IN ({_placeholders(metrics)})
+                  AND bucket BETWEEN ? AND ?
+            '''), metrics + [first_day, last_day]).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,62 @@
+"""SQLite storage: the repositories over the pooled connections of ``db_operations``"""
+import sqlite3
+from .db_operations import get_db_connection, init_database
+from .repositories import Storage
+from .sql_repositories import (SQLAuditRepository, SQLMetricsRepository, SQLSessionRepository,
+                              SQLUserRepository)
+
+class SQLiteDialect:
+    integrity_errors = (sqlite3.IntegrityError,)
+    bigint = "INTEGER"
+    # Per-user overrides as a {permission: granted} JSON object, loaded in the
+    # same statement as the user row
+    overrides_column = (
+        "(SELECT json_group_object(permission, granted) FROM user_permissions "
+        "WHERE user_id = users.id)"
+    )
+
+    # Full-text search over the users_fts index. bm25 is lower for better
+    # matches, and a username hit outranks an email hit, which outranks a role hit
+    search_source = "users_fts WHERE users_fts MATCH ?"
+    search_id = "rowid"
+    search_score = "bm25(users_fts, 10.0, 4.0, 1.0)"
+
+    @staticmethod
+    def lower_column(column):
+        # Must match the expression indexes of migration 11
+        return f"lower({column})"
+
+    @staticmethod
+    def match_query(terms):
+        # Every term as a quoted prefix query; terms are plain words, so quoting is safe
+        return " ".join(f'"{term}"*' for term in terms)
+
+    @staticmethod
+    def connection():
+        return get_db_connection()
+
+    @staticmethod
+    def sql(query):
+        return query
+
+    def iter_rows(self, query, params, batch_size):
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self):
+        dialect = SQLiteDialect()
+        self.users = SQLUserRepository(dialect)
+        self.sessions = SQLSessionRepository(dialect)
+        self.audit = SQLAuditRepository(dialect)
+        self.metrics = SQLMetricsRepository(dialect)
+
+    def ensure_schema(self):
+        init_database()
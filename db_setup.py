@@ -1,5 +1,3 @@
-import sqlite3
-import bcrypt
 import logging
 from pathlib import Path
 from config import Config
@@ -24,72 +22,14 @@ def create_database_directory():
         return False
 
 def init_database():
-    """Initialize the database with required tables"""
+    """Initialize the database by applying the schema migrations"""
     try:
         # Create database directory
         if not create_database_directory():
             return False
 
-        # Connect to database (this will create it if it doesn't exist)
-        conn = sqlite3.connect(Config.DB_PATH)
-        cursor = conn.cursor()
-
-        # Create users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE,
-                failed_login_attempts INTEGER DEFAULT 0
-            )
-        ''')
-
-        # Create audit_log table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                action TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                details TEXT,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-
-        # Create sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                session_token TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL,
-                is_active BOOLEAN DEFAULT TRUE,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-
-        # Create root user if it doesn't exist
-        cursor.execute("SELECT 1 FROM users WHERE username = 'root'")
-        if not cursor.fetchone():
-            # Hash the password
-            hashed_password = bcrypt.hashpw("root123".encode(), bcrypt.gensalt()).decode()
-            
-            # Insert root user
-            cursor.execute('''
-                INSERT INTO users (username, email, password, role, is_active)
-                VALUES (?, ?, ?, ?, ?)
-            ''', ('root', 'root@admin.com', hashed_password, 'Root', True))
-            logger.info("Root user created successfully")
-
-        # Commit changes and close connection
-        conn.commit()
-        conn.close()
+        from database.migrations import migrate
+        migrate()
 
         logger.info(f"Database initialized successfully at: {Config.DB_PATH}")
         return True
@@ -0,0 +1,116 @@
+"""Last-login and last-seen tracking with coalesced writes.
+
+Logins and script runs only touch an in-memory map, so no rerun waits on
+the SQLite writer lock. A background task writes whatever changed since
+its last run to ``users.last_login``/``users.last_seen`` in one batched
+transaction every ``Config.ACTIVITY_FLUSH_INTERVAL`` seconds, and once more
+at shutdown. However often a user reruns, they cost at most one UPDATE per
+flush.
+
+The map is ordered by last activity and capped at
+``Config.ACTIVITY_MAX_USERS``; the least recently seen users are dropped
+first, and they are the ones no "active in the last N minutes" window
+needs. The count is per process: each app replica sees its own sessions.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from config import Config
+from database.repositories import get_storage
+from .utils import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _timestamp(epoch):
+    return datetime.utcfromtimestamp(epoch).strftime(TIMESTAMP_FORMAT) if epoch else None
+
+class ActivityTracker:
+    def __init__(self, max_users=None, flush_interval=None):
+        self.max_users = max_users or Config.ACTIVITY_MAX_USERS
+        # user_id -> last seen (epoch seconds), least recently seen first
+        self._seen = OrderedDict()
+        # user_id -> [last login or None, last seen] awaiting a flush
+        self._dirty = {}
+        self._lock = threading.Lock()
+        interval = Config.ACTIVITY_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._flusher = PeriodicTask("activity-flush", interval, self.flush, run_on_stop=True)
+
+    def start(self):
+        self._flusher.start()
+        return self
+
+    def seen(self, user_id, now=None, login=False):
+        """Record activity by ``user_id``; ``login`` also sets its last login"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._seen[user_id] = now
+            self._seen.move_to_end(user_id)
+            if len(self._seen) > self.max_users:
+                self._seen.popitem(last=False)
+            pending = self._dirty.get(user_id)
+            if pending is None:
+                self._dirty[user_id] = [now if login else None, now]
+            else:
+                pending[1] = now
+                if login:
+                    pending[0] = now
+
+    def login(self, user_id, now=None):
+        self.seen(user_id, now, login=True)
+
+    def active_count(self, minutes, now=None) -> int:
+        """Users seen in the last ``minutes`` minutes; walks only those users"""
+        cutoff = (time.time() if now is None else now) - minutes * 60
+        count = 0
+        with self._lock:
+            for last_seen in reversed(self._seen.values()):
+                if last_seen < cutoff:
+                    break
+                count += 1
+        return count
+
+    def last_seen(self, user_id):
+        with self._lock:
+            return self._seen.get(user_id)
+
+    def flush(self):
+        """Write pending activity in one transaction; returns the number of users"""
+        with self._lock:
+            pending, self._dirty = self._dirty, {}
+        if not pending:
+            return 0
+        try:
+            get_storage().users.save_activity(
+                (user_id, _timestamp(last_login), _timestamp(last_seen))
+                for user_id, (last_login, last_seen) in pending.items()
+            )
+        except Exception:
+            # Put the batch back unless newer activity superseded it
+            with self._lock:
+                for user_id, (last_login, last_seen) in pending.items():
+                    newer = self._dirty.setdefault(user_id, [last_login, last_seen])
+                    if newer[0] is None:
+                        newer[0] = last_login
+            raise
+        return len(pending)
+
+    def __len__(self):
+        return len(self._seen)
+
+    def stop(self):
+        self._flusher.stop()
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_activity_tracker() -> ActivityTracker:
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = ActivityTracker().start()
+    return _tracker
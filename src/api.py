@@ -0,0 +1,328 @@
+"""Headless JSON-over-HTTP auth API for other services.
+
+Built on ``asyncio.start_server`` with a small HTTP/1.1 parser (keep-alive,
+``Content-Length`` bodies only), so it adds no dependencies. The event loop
+only parses requests and writes responses; every handler runs on a thread
+pool of ``Config.API_WORKERS`` because it may touch SQLite or wait on
+bcrypt. Handlers use the same ``User``, session and permission code as the
+Streamlit app, so throttling, revocation and audit behave identically.
+
+Endpoints (all bodies are JSON):
+    GET  /healthz
+    POST /v1/login               {"username", "password"} -> {"token", "user_id", "expires_at"}
+    POST /v1/introspect          {"token"} -> {"active", "user_id", "username", "role", "exp"}
+    POST /v1/permissions/check   {"checks": [{"user_id" or "token", "permission"}, ...]}
+                                 -> {"results": [{..., "allowed"}, ...]}
+    POST /v1/users/lookup        {"ids": [...]} or {"usernames": [...]} -> {"users", "missing"}
+
+When ``Config.API_KEY`` is set, every endpoint but ``/healthz`` requires
+it in the ``X-Api-Key`` header.
+
+Usage:
+    python -m src.api [--host 127.0.0.1] [--port 8600] [--workers 8]
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from config import Config
+from .audit import log_event
+from .auth import verify_jwt_token
+from .bootstrap import bootstrap, configure_logging
+from .instrumentation import record_timer
+from .models import User
+from .passwords import PasswordServiceBusy
+from .permissions import get_registry
+from .ratelimit import LoginThrottled, client_address
+from .sessions import issue_session, verify_session
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADERS = 100
+
+class ApiError(Exception):
+    """An error response: HTTP status, machine-readable code and message"""
+
+    def __init__(self, status, code, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.headers = headers or {}
+
+def _require_str(payload, name):
+    value = payload.get(name)
+    if not isinstance(value, str):
+        raise ApiError(400, "bad_request", f"'{name}' must be a string")
+    return value
+
+def _batch(payload, name, kind):
+    values = payload.get(name)
+    if not isinstance(values, list) or not all(isinstance(v, kind) for v in values):
+        raise ApiError(400, "bad_request", f"'{name}' must be a list of {kind.__name__}")
+    if len(values) > Config.API_BATCH_LIMIT:
+        raise ApiError(413, "batch_too_large", f"At most {Config.API_BATCH_LIMIT} items per request")
+    return values
+
+def _user_dict(user):
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "role": user.role,
+        "is_active": user.is_active,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "last_login": user.last_login.isoformat() if user.last_login else None,
+    }
+
+def _active_user(user_id):
+    user = User.get_by_id(user_id, "sidebar") if user_id is not None else None
+    return user if user is not None and user.is_active else None
+
+def login(payload, client):
+    username = _require_str(payload, "username")
+    password = _require_str(payload, "password")
+    try:
+        success, user_id = User.authenticate(username, password, client=client)
+    except LoginThrottled as e:
+        log_event(None, "LOGIN_THROTTLED", {"username": username, "via": "api"})
+        raise ApiError(429, "throttled", str(e), {"Retry-After": str(math.ceil(e.retry_after))})
+    except PasswordServiceBusy:
+        raise ApiError(503, "busy", "The server is busy, please try again in a moment",
+                       {"Retry-After": "1"})
+    if not success:
+        log_event(None, "LOGIN_FAILED", {"username": username, "via": "api"})
+        raise ApiError(401, "invalid_credentials", "Invalid username or password")
+    log_event(user_id, "LOGIN", {"via": "api"})
+    token = issue_session(user_id)
+    return {"token": token, "user_id": user_id, "expires_at": verify_jwt_token(token)["exp"]}
+
+def introspect(payload, client):
+    """Token status in the spirit of RFC 7662: anything invalid is just inactive"""
+    token = _require_str(payload, "token")
+    user = _active_user(verify_session(token))
+    if user is None:
+        return {"active": False}
+    return {
+        "active": True,
+        "user_id": user.id,
+        "username": user.username,
+        "role": user.role,
+        "exp": verify_jwt_token(token)["exp"],
+    }
+
+def check_permissions(payload, client):
+    """Evaluate many (user, permission) pairs; unknown users or permissions are denied"""
+    checks = _batch(payload, "checks", dict)
+    registry = get_registry()
+    resolved = []
+    for check in checks:
+        if "token" in check:
+            user_id = verify_session(check["token"]) if isinstance(check["token"], str) else None
+        else:
+            user_id = check.get("user_id")
+        if not isinstance(user_id, int) or isinstance(user_id, bool):
+            user_id = None
+        resolved.append((user_id, check.get("permission")))
+
+    users = User.get_many({user_id for user_id, _ in resolved if user_id is not None}, "sidebar")
+    results = []
+    for user_id, permission in resolved:
+        user = users.get(user_id)
+        # Never intern caller-supplied names, or the registry grows without bound
+        allowed = (user is not None and user.is_active and isinstance(permission, str)
+                   and permission in registry and user.has_permission(permission))
+        results.append({"user_id": user_id, "permission": permission, "allowed": allowed})
+    return {"results": results}
+
+def lookup_users(payload, client):
+    if "usernames" in payload:
+        keys = _batch(payload, "usernames", str)
+        found = {key: User.get_by_username(key) for key in dict.fromkeys(keys)}
+    else:
+        keys = _batch(payload, "ids", int)
+        users = User.get_many(keys, "row")
+        found = {key: users.get(key) for key in dict.fromkeys(keys)}
+    return {
+        "users": [_user_dict(user) for user in found.values() if user is not None],
+        "missing": [key for key, user in found.items() if user is None],
+    }
+
+ROUTES = {
+    "/v1/login": login,
+    "/v1/introspect": introspect,
+    "/v1/permissions/check": check_permissions,
+    "/v1/users/lookup": lookup_users,
+}
+
+class AuthAPI:
+    def __init__(self, host=None, port=None, workers=None, api_key=None):
+        self.host = host or Config.API_HOST
+        self.port = Config.API_PORT if port is None else port
+        self.api_key = Config.API_KEY if api_key is None else api_key
+        self.executor = ThreadPoolExecutor(max_workers=workers or Config.API_WORKERS,
+                                           thread_name_prefix="api")
+        self.server = None
+        self._clients = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Auth API listening on {self.host}:{self.port}")
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # Idle keep-alive connections see EOF and their handlers return
+        for writer in self._clients.values():
+            writer.close()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def _serve_client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        task = asyncio.current_task()
+        self._clients[task] = writer
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader),
+                                                     Config.API_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except ApiError as e:
+                    await self._respond(writer, e.status, {"error": e.code, "message": str(e)},
+                                        False, e.headers)
+                    break
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, payload, extra = await self._handle(method, path, headers, body, peer)
+                await self._respond(writer, status, payload, keep_alive, extra)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.pop(task, None)
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            line = await reader.readline()
+            if not line:
+                return None
+            try:
+                method, target, version = line.decode("latin-1").split()
+            except ValueError:
+                raise ApiError(400, "bad_request", "Malformed request line")
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+                if len(headers) > MAX_HEADERS:
+                    raise ApiError(431, "headers_too_large", "Too many headers")
+        except (ValueError, asyncio.LimitOverrunError):
+            # StreamReader's line limit: a header or request line over 64 KiB
+            raise ApiError(431, "headers_too_large", "Request line or header too long")
+        if "transfer-encoding" in headers:
+            raise ApiError(411, "length_required", "Send a Content-Length body")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise ApiError(400, "bad_request", "Invalid Content-Length")
+        if length > Config.API_MAX_BODY_BYTES:
+            raise ApiError(413, "body_too_large", f"Body exceeds {Config.API_MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method.upper(), target.split("?", 1)[0], version.upper(), headers, body
+
+    async def _handle(self, method, path, headers, body, peer):
+        """Route one request; returns (status, payload, extra headers)"""
+        if path == "/healthz":
+            return 200, {"status": "ok"}, None
+        handler = ROUTES.get(path)
+        if handler is None:
+            return 404, {"error": "not_found", "message": f"No endpoint {path}"}, None
+        if method != "POST":
+            return 405, {"error": "method_not_allowed", "message": "Use POST"}, {"Allow": "POST"}
+        if self.api_key and not hmac.compare_digest(headers.get("x-api-key", ""), self.api_key):
+            return 401, {"error": "unauthorized", "message": "Missing or invalid X-Api-Key"}, None
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "bad_request", "message": "Body is not valid JSON"}, None
+        if not isinstance(payload, dict):
+            return 400, {"error": "bad_request", "message": "Body must be a JSON object"}, None
+
+        client = client_address(peer[0] if peer else None, headers.get("x-forwarded-for"))
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._call, handler, payload, client
+            )
+            return 200, result, None
+        except ApiError as e:
+            return e.status, {"error": e.code, "message": str(e)}, e.headers
+        except Exception as e:
+            logger.error(f"API {path} failed: {str(e)}")
+            return 500, {"error": "internal", "message": "Internal error"}, None
+        finally:
+            record_timer(f"api.{handler.__name__}", time.perf_counter() - started)
+
+    @staticmethod
+    def _call(handler, payload, client):
+        # Executor threads are reused, so each request starts a fresh identity map
+        User.begin_request()
+        return handler(payload, client)
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive, headers=None):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        lines = [
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+async def serve(host=None, port=None, workers=None):
+    """Run the API until cancelled"""
+    bootstrap()
+    api = AuthAPI(host, port, workers)
+    await api.start()
+    try:
+        await api.server.serve_forever()
+    finally:
+        await api.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the headless auth API")
+    parser.add_argument("--host", default=Config.API_HOST)
+    parser.add_argument("--port", type=int, default=Config.API_PORT)
+    parser.add_argument("--workers", type=int, default=Config.API_WORKERS)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if not Config.API_KEY:
+        logger.warning("API_KEY is not set; any client that can reach the port can use the API")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
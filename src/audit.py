@@ -0,0 +1,273 @@
+"""Asynchronous, batched writer for the ``audit_log`` table.
+
+``log_event`` only appends to an in-memory buffer; a background thread
+writes the buffer in one transaction whenever ``AUDIT_BATCH_SIZE`` events
+are pending or ``AUDIT_FLUSH_INTERVAL`` seconds have passed, so interactive
+actions never wait on an fsync. The buffer is bounded by
+``AUDIT_MAX_QUEUE``; when it is full ``AUDIT_OVERFLOW_POLICY`` decides
+whether the oldest event is dropped, the new event is dropped, or the
+caller blocks for up to ``AUDIT_BLOCK_TIMEOUT`` seconds first.
+
+Usage:
+    python -m src.audit compact [--days 90] [--to-files archive/]
+    python -m src.audit export events.csv [--start ...] [--end ...]
+"""
+import argparse
+import atexit
+import csv
+import io
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from config import Config
+from database.db_operations import ensure_database
+from database.repositories import get_storage
+from .reporting import reporting_audit
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+class AuditLogger:
+    def __init__(self, batch_size=None, flush_interval=None, max_queue=None,
+                 overflow_policy=None, block_timeout=None):
+        self.batch_size = batch_size or Config.AUDIT_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.AUDIT_FLUSH_INTERVAL
+        self.max_queue = max_queue or Config.AUDIT_MAX_QUEUE
+        self.overflow_policy = overflow_policy or Config.AUDIT_OVERFLOW_POLICY
+        self.block_timeout = (Config.AUDIT_BLOCK_TIMEOUT
+                              if block_timeout is None else block_timeout)
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {self.overflow_policy}")
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._stopping = False
+        self._thread = None
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def log(self, user_id, action: str, details=None) -> bool:
+        """Queue an event; returns False if the overflow policy dropped it"""
+        if details is not None and not isinstance(details, str):
+            details = json.dumps(details, default=str)
+        event = (user_id, action, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), details)
+
+        with self._cond:
+            if self._stopping:
+                return False
+            self._ensure_started()
+            if len(self._buffer) >= self.max_queue:
+                if self.overflow_policy == "block":
+                    self._cond.wait_for(lambda: len(self._buffer) < self.max_queue,
+                                        timeout=self.block_timeout)
+                if len(self._buffer) >= self.max_queue:
+                    self._stats["dropped"] += 1
+                    if self.overflow_policy != "drop_oldest":
+                        return False
+                    self._buffer.popleft()
+            self._buffer.append(event)
+            self._stats["enqueued"] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def _take_batch(self):
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while (len(self._buffer) < self.batch_size and not self._flush_requested
+                   and not self._stopping):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._buffer), self.batch_size)
+            batch = [self._buffer.popleft() for _ in range(count)]
+            self._in_flight = len(batch)
+            if not self._buffer:
+                self._flush_requested = False
+            # Wake producers blocked on a full buffer
+            self._cond.notify_all()
+            return batch
+
+    def _write(self, batch):
+        try:
+            get_storage().audit.insert_many(batch)
+            written, failed = len(batch), 0
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} audit events: {str(e)}")
+            written, failed = 0, len(batch)
+        with self._cond:
+            self._stats["written"] += written
+            self._stats["failed"] += failed
+            self._stats["batches"] += 1
+            self._in_flight = 0
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+            elif self._stopping:
+                return
+
+    def flush(self, timeout=5.0) -> bool:
+        """Write everything queued so far; returns False on timeout"""
+        with self._cond:
+            if self._thread is None:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._buffer and not self._in_flight,
+                                       timeout=timeout)
+
+    def close(self, timeout=5.0):
+        """Drain the buffer and stop the writer thread"""
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._buffer:
+                logger.warning(f"{len(self._buffer)} audit events were not written at shutdown")
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queued"] = len(self._buffer) + self._in_flight
+        return stats
+
+_audit_logger = None
+_audit_lock = threading.Lock()
+
+def get_audit_logger() -> AuditLogger:
+    global _audit_logger
+    if _audit_logger is None:
+        with _audit_lock:
+            if _audit_logger is None:
+                _audit_logger = AuditLogger()
+    return _audit_logger
+
+def log_event(user_id, action: str, details=None) -> bool:
+    return get_audit_logger().log(user_id, action, details)
+
+def recent_events(limit=100) -> list:
+    """Most recent audit events joined with the acting username"""
+    return get_events_page(limit=limit)[0]
+
+def get_events_page(start=None, end=None, user_id=None, action=None, before=None, limit=50) -> tuple:
+    """One page of events, newest first, and the cursor for the next page.
+
+    Pages are keyed on ``(timestamp, id)``: ``before`` is the cursor returned by
+    the previous call, so deep pages cost the same index seek as the first one.
+    ``start`` is inclusive and ``end`` exclusive, both as ``YYYY-MM-DD HH:MM:SS``.
+    """
+    return reporting_audit().page(start, end, user_id, action, before, limit)
+
+def distinct_actions() -> list:
+    return reporting_audit().distinct_actions()
+
+EXPORT_COLUMNS = ("id", "timestamp", "user_id", "username", "action", "details")
+
+def iter_events_csv(start=None, end=None, user_id=None, action=None, batch_size=1000):
+    """Yield the matching events as CSV text, one keyset page at a time.
+
+    Memory use is bounded by ``batch_size`` and no connection is held between
+    pages, so exporting the whole table never blocks writers for long.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    cursor = None
+    while True:
+        events, cursor = get_events_page(start, end, user_id, action, before=cursor, limit=batch_size)
+        for event in events:
+            writer.writerow([event[column] for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if cursor is None:
+            return
+
+def compact(older_than_days=None, archive_dir=None, batch_size=1000) -> int:
+    """Move events older than the retention window out of the hot table.
+
+    Rows go to per-month tables (``audit_log_archive_YYYY_MM``) or, when
+    ``archive_dir`` is given, to per-month JSONL files. Each batch is copied
+    and deleted in its own transaction so the writer lock is held briefly.
+    Returns the number of archived rows.
+    """
+    days = Config.AUDIT_RETENTION_DAYS if older_than_days is None else older_than_days
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    if archive_dir:
+        Path(archive_dir).mkdir(parents=True, exist_ok=True)
+
+    audit = get_storage().audit
+    archived = 0
+    while True:
+        rows = audit.oldest_before(cutoff, batch_size)
+        if not rows:
+            break
+        if archive_dir:
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(row["timestamp"][:7].replace("-", "_"), []).append(row)
+            for month, month_rows in by_month.items():
+                with open(Path(archive_dir) / f"audit_log_{month}.jsonl", "a", encoding="utf-8") as f:
+                    for row in month_rows:
+                        f.write(json.dumps(row) + "\n")
+            audit.delete([row["id"] for row in rows])
+        else:
+            audit.move_to_archive(rows)
+        archived += len(rows)
+
+    logger.info(f"Archived {archived} audit events older than {cutoff}")
+    return archived
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit log maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="Archive events past the retention window")
+    compact_parser.add_argument("--days", type=int, default=None,
+                                help="Retention window (defaults to AUDIT_RETENTION_DAYS)")
+    compact_parser.add_argument("--to-files", metavar="DIR",
+                                help="Write per-month JSONL files instead of archive tables")
+
+    export_parser = subparsers.add_parser("export", help="Stream events to a CSV file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--start")
+    export_parser.add_argument("--end")
+    export_parser.add_argument("--user-id", type=int)
+    export_parser.add_argument("--action")
+
+    args = parser.parse_args(argv)
+    ensure_database()
+    if args.command == "compact":
+        print(f"Archived {compact(args.days, args.to_files)} events")
+        return 0
+
+    with open(args.path, "w", newline="", encoding="utf-8") as f:
+        for chunk in iter_events_csv(args.start, args.end, args.user_id, args.action):
+            f.write(chunk)
+    print(f"Exported audit events to {args.path}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
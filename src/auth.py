@@ -1,19 +1,27 @@
-import jwt
 from datetime import datetime, timedelta
 from functools import wraps
-import streamlit as st
 from .models import User
 from config import Config
 
-def create_jwt_token(user_id: int) -> str:
+# jwt and streamlit are imported where they are used, so services that only
+# need the token helpers (such as src.api) do not load Streamlit
+
+def create_jwt_token(user_id: int, jti: str = None) -> str:
+    import jwt
+
     expiry = datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRY_HOURS)
+    claims = {'user_id': user_id, 'exp': expiry}
+    if jti:
+        claims['jti'] = jti
     return jwt.encode(
-        {'user_id': user_id, 'exp': expiry},
+        claims,
         Config.SECRET_KEY,
         algorithm='HS256'
     )
 
 def verify_jwt_token(token: str) -> dict:
+    import jwt
+
     try:
         return jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
@@ -24,6 +32,8 @@ def verify_jwt_token(token: str) -> dict:
 def login_required(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
+        import streamlit as st
+
         if 'user_id' not in st.session_state:
             st.error("Please login to access this feature")
             st.stop()
@@ -35,7 +45,9 @@ def has_permission(permission):
         @wraps(func)
         @login_required
         def wrapper(*args, **kwargs):
-            user = User.get_by_id(st.session_state.user_id)
+            import streamlit as st
+
+            user = User.get_by_id(st.session_state.user_id, "sidebar")
             if user.has_permission(permission):
                 return func(*args, **kwargs)
             st.error("You don't have permission to access this feature")
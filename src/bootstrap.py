@@ -0,0 +1,41 @@
+"""Once-per-process application startup.
+
+Importing the application modules has no side effects: nothing creates
+directories, configures logging, migrates the schema or starts threads
+until ``bootstrap`` runs. The Streamlit app, the auth API and the
+benchmarks call it at startup; after the first call it only checks that
+the schema of ``Config.DB_PATH`` is current, which is a set lookup.
+"""
+import logging
+import threading
+import time
+from database.db_operations import ensure_database, get_pool
+from .instrumentation import install_instrumentation, record_timer, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_started = False
+_start_lock = threading.Lock()
+
+def configure_logging(level=logging.INFO):
+    """Root logging setup; a no-op when the host process already configured it"""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+def bootstrap():
+    """Start the process on first call and return the shared connection pool"""
+    global _started
+    if not _started:
+        with _start_lock:
+            if not _started:
+                started = time.perf_counter()
+                configure_logging()
+                install_instrumentation()
+                ensure_database()
+                start_metrics_server()
+                _started = True
+                record_timer("startup.bootstrap", time.perf_counter() - started)
+    # Config.DB_PATH may have been pointed at another database since
+    ensure_database()
+    return get_pool()
@@ -0,0 +1,226 @@
+"""Streaming bulk import and export of users (CSV or JSON Lines).
+
+Usage:
+    python -m src.bulk import people.csv [--role User] [--chunk-size 500]
+    python -m src.bulk export users.jsonl
+"""
+import argparse
+import csv
+import json
+import logging
+import sys
+from itertools import islice
+from pathlib import Path
+from config import Config
+from database.db_operations import ensure_database
+from database.repositories import DuplicateKeyError, get_storage
+from .models import notify_user_write
+from .passwords import get_password_hasher
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ("id", "username", "email", "role", "is_active", "created_at", "last_login")
+IMPORT_FIELDS = ("username", "email", "password", "role")
+# Conflicts and errors listed per report; the counts include the rest
+REPORT_MAX_ROWS = 1000
+
+class ImportReport:
+    """Outcome of an import: rows created plus per-row conflicts and errors.
+
+    Only the first ``max_rows`` conflicts and errors are kept, so a bad file
+    of any size reports in bounded memory; ``conflict_count`` and
+    ``error_count`` count every row.
+    """
+
+    def __init__(self, max_rows=REPORT_MAX_ROWS):
+        self.max_rows = max_rows
+        self.created = 0
+        self.conflict_count = 0
+        self.error_count = 0
+        self.conflicts = []
+        self.errors = []
+
+    def add_conflict(self, line, username, reason):
+        self.conflict_count += 1
+        if len(self.conflicts) < self.max_rows:
+            self.conflicts.append({"line": line, "username": username, "reason": reason})
+
+    def add_error(self, line, reason):
+        self.error_count += 1
+        if len(self.errors) < self.max_rows:
+            self.errors.append({"line": line, "reason": reason})
+
+    def as_dict(self):
+        return {"created": self.created, "conflict_count": self.conflict_count,
+                "error_count": self.error_count, "conflicts": self.conflicts, "errors": self.errors}
+
+def detect_format(path) -> str:
+    return "jsonl" if Path(path).suffix.lower() in (".jsonl", ".ndjson", ".json") else "csv"
+
+def iter_records(fileobj, fmt="csv"):
+    """Yield ``(line_number, record)`` pairs from a text stream without buffering it"""
+    if fmt == "csv":
+        reader = csv.DictReader(fileobj)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(fileobj, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, {"_error": f"Invalid JSON: {e.msg}"}
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+def _validate(record, default_role, actor=None):
+    # A JSONL line may hold any JSON value, not just an object of strings
+    if not isinstance(record, dict):
+        return None, "Expected an object with username, email and password"
+    if "_error" in record:
+        return None, record["_error"]
+    for field in IMPORT_FIELDS:
+        if not isinstance(record.get(field) or "", str):
+            return None, f"{field} must be a string"
+    username = (record.get("username") or "").strip()
+    email = (record.get("email") or "").strip()
+    password = record.get("password") or ""
+    role = (record.get("role") or default_role).strip()
+    if not username or not email or not password:
+        return None, "username, email and password are required"
+    if role not in Config.ROLES_HIERARCHY:
+        return None, f"Unknown role: {role}"
+    if actor is not None and not actor.can_grant_role(role):
+        return None, f"You can't grant the {role} role"
+    return (username, email, password, role), None
+
+def _import_chunk(chunk, default_role, report, actor=None):
+    candidates = []
+    seen_usernames, seen_emails = set(), set()
+    for line, record in chunk:
+        values, error = _validate(record, default_role, actor)
+        if error:
+            report.add_error(line, error)
+            continue
+        username, email = values[0], values[1]
+        if username in seen_usernames or email in seen_emails:
+            report.add_conflict(line, username, "Duplicate username or email within the file")
+            continue
+        seen_usernames.add(username)
+        seen_emails.add(email)
+        candidates.append((line, values))
+
+    if not candidates:
+        return
+
+    users = get_storage().users
+    taken_usernames, taken_emails = users.existing_keys(
+        [v[0] for _, v in candidates], [v[1] for _, v in candidates]
+    )
+    rows = []
+    for line, values in candidates:
+        if values[0] in taken_usernames:
+            report.add_conflict(line, values[0], "Username already exists")
+        elif values[1] in taken_emails:
+            report.add_conflict(line, values[0], "Email already exists")
+        else:
+            rows.append((line, values))
+
+    if not rows:
+        return
+
+    # Only rows that will actually be inserted pay for bcrypt
+    hashes = get_password_hasher().hash_many(values[2] for _, values in rows)
+    params = [(values[0], values[1], hashed, values[3])
+              for (_, values), hashed in zip(rows, hashes)]
+    try:
+        report.created += users.insert_many(params)
+        return
+    except DuplicateKeyError:
+        # Lost a race with a concurrent writer; redo the chunk row by row
+        pass
+
+    for (line, values), row in zip(rows, params):
+        try:
+            users.insert(*row)
+            report.created += 1
+        except DuplicateKeyError:
+            report.add_conflict(line, values[0], "Username or email already exists")
+
+def import_users(records, default_role="User", chunk_size=500, actor=None) -> ImportReport:
+    """Insert users from ``(line_number, record)`` pairs in chunked transactions.
+
+    Records are consumed lazily, so memory use is bounded by ``chunk_size``
+    regardless of the input size. Each chunk is checked for duplicates with
+    one lookup, hashed in parallel on the password service and inserted
+    with a single ``insert_many``. When ``actor`` (a ``User``) is given,
+    rows with a role it may not grant are reported as errors; the command
+    line import runs without one.
+    """
+    report = ImportReport()
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(chunk, default_role, report, actor)
+    if report.created:
+        notify_user_write(None)
+    logger.info(f"Bulk import finished: {report.created} created, "
+                f"{report.conflict_count} conflicts, {report.error_count} errors")
+    return report
+
+def export_users(fileobj, fmt="csv", batch_size=1000) -> int:
+    """Stream all users (without password hashes) to a text stream"""
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(fileobj)
+        writer.writerow(EXPORT_COLUMNS)
+
+    written = 0
+    for row in get_storage().users.iter_all(EXPORT_COLUMNS, batch_size):
+        if writer:
+            writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        else:
+            fileobj.write(json.dumps(row, default=str) + "\n")
+        written += 1
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import or export users")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import users from CSV or JSONL")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"])
+    import_parser.add_argument("--role", default="User", help="Role for rows without one")
+    import_parser.add_argument("--chunk-size", type=int, default=500)
+
+    export_parser = subparsers.add_parser("export", help="Export users to CSV or JSONL")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"])
+
+    args = parser.parse_args(argv)
+    fmt = args.format or detect_format(args.path)
+    ensure_database()
+
+    if args.command == "import":
+        with open(args.path, newline="", encoding="utf-8") as f:
+            report = import_users(iter_records(f, fmt), args.role, args.chunk_size)
+        json.dump(report.as_dict(), sys.stdout, indent=2)
+        print()
+        return 0 if not report.error_count else 1
+
+    with open(args.path, "w", newline="", encoding="utf-8") as f:
+        count = export_users(f, fmt)
+    print(f"Exported {count} users to {args.path}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""Streamlit caches for slow-changing reference data.
+
+Reference queries are ``st.cache_data`` entries with a TTL of
+``Config.REFERENCE_CACHE_TTL_SECONDS``; any write through ``User`` clears
+them straight away so a session never sees its own change go missing.
+Process-wide setup lives in ``src.bootstrap``.
+"""
+import streamlit as st
+from config import Config
+from . import metrics
+from .audit import distinct_actions
+from .models import User, on_user_write
+
+TTL = Config.REFERENCE_CACHE_TTL_SECONDS
+
+@st.cache_data(ttl=TTL, show_spinner=False)
+def cached_user_count(role=None, is_active=None, prefix=None) -> int:
+    return User.count(role=role, is_active=is_active, prefix=prefix)
+
+@st.cache_data(ttl=TTL, show_spinner=False)
+def cached_dashboard_summary() -> dict:
+    return metrics.dashboard_summary()
+
+@st.cache_data(ttl=TTL, show_spinner=False)
+def cached_distinct_actions() -> list:
+    return distinct_actions()
+
+@st.cache_data(ttl=TTL, show_spinner=False, max_entries=256)
+def cached_user_search(text, limit) -> tuple:
+    return User.search(text, limit)
+
+def clear_reference_caches(user_id=None):
+    """Drop cached reference data that depends on the users table"""
+    cached_user_count.clear()
+    cached_user_search.clear()
+    cached_dashboard_summary.clear()
+
+on_user_write(clear_reference_caches)
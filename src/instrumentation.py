@@ -0,0 +1,278 @@
+"""Where the time goes: query, page and bcrypt timings.
+
+Pooled SQLite connections use ``TimedCursor`` (see ``database.db_operations``)
+and report every statement here with its duration and row count. Page
+functions and password hashing are timed with ``timed``/``timer``. Each
+measurement lands in two places:
+
+* process-wide aggregates per statement and per timer, exported in the
+  Prometheus text format by ``render_prometheus`` and, when
+  ``Config.METRICS_PORT`` is set, served on ``/metrics`` at
+  ``Config.METRICS_HOST`` (localhost by default);
+* the profile of the current script run (a thread-local started by
+  ``begin_profile``), which the admin debug panel shows when
+  ``Config.DEBUG_PANEL`` is on.
+
+Statements slower than ``Config.SLOW_QUERY_MS`` are logged to the
+``slow_query`` logger, and to ``Config.SLOW_QUERY_LOG`` when it is set.
+Queries are only observed after ``install_instrumentation``, which
+``src.bootstrap`` calls once per process.
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from config import Config
+from database.db_operations import get_pool_stats, set_query_observer
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("slow_query")
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_whitespace = re.compile(r"\s+")
+_placeholder_list = re.compile(r"\?(?:\s*,\s*\?)+")
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """One label per statement shape: whitespace collapsed, ``IN (?, ?, ...)`` folded"""
+    return _placeholder_list.sub("?...", _whitespace.sub(" ", sql).strip())
+
+class _Series:
+    __slots__ = ("count", "seconds", "rows", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+class Registry:
+    """Process-wide aggregates behind the Prometheus export"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = {}
+        self.timers = {}
+        self.slow_queries = 0
+
+    def record_query(self, statement, seconds, rows, executed):
+        with self._lock:
+            series = self.queries.get(statement)
+            if series is None:
+                series = self.queries[statement] = _Series()
+            series.count += executed
+            series.seconds += seconds
+            series.rows += rows
+
+    def record_timer(self, name, seconds):
+        with self._lock:
+            series = self.timers.get(name)
+            if series is None:
+                series = self.timers[name] = _Series()
+            series.observe(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "queries": {k: (v.count, v.seconds, v.rows) for k, v in self.queries.items()},
+                "timers": {k: (v.count, v.seconds, v.max, list(v.buckets))
+                           for k, v in self.timers.items()},
+                "slow_queries": self.slow_queries,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.queries.clear()
+            self.timers.clear()
+            self.slow_queries = 0
+
+registry = Registry()
+_profile = threading.local()
+
+def begin_profile():
+    """Start a fresh profile for the script run or fragment on this thread"""
+    _profile.current = {"started": time.perf_counter(), "queries": {}, "timers": []}
+
+def current_profile():
+    """The profile of the current run, or ``None`` outside ``begin_profile``"""
+    return getattr(_profile, "current", None)
+
+def _observe_query(sql, seconds, rows, executed, total):
+    statement = normalize_sql(sql)
+    registry.record_query(statement, seconds, rows, executed)
+
+    profile = current_profile()
+    if profile is not None:
+        entry = profile["queries"].get(statement)
+        if entry is None:
+            entry = profile["queries"][statement] = [0, 0.0, 0]
+        entry[0] += executed
+        entry[1] += seconds
+        entry[2] += rows
+
+    # Log once, when the statement's running time first crosses the threshold
+    threshold = Config.SLOW_QUERY_MS / 1000
+    if threshold and total >= threshold > total - seconds:
+        with registry._lock:
+            registry.slow_queries += 1
+        slow_query_logger.warning(f"{total * 1000:.1f} ms: {statement}")
+
+def record_timer(name, seconds):
+    registry.record_timer(name, seconds)
+    profile = current_profile()
+    if profile is not None:
+        profile["timers"].append((name, seconds))
+
+@contextmanager
+def timer(name):
+    """Time the enclosed block as ``name``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timer(name, time.perf_counter() - started)
+
+def timed(name):
+    """Decorator form of ``timer``"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def profile_summary(profile=None) -> dict:
+    """Totals and per-statement rows of a run profile, slowest statements first"""
+    profile = profile or current_profile() or {"started": time.perf_counter(),
+                                                "queries": {}, "timers": []}
+    queries = sorted(
+        ({"statement": statement, "executions": count, "ms": seconds * 1000, "rows": rows}
+         for statement, (count, seconds, rows) in profile["queries"].items()),
+        key=lambda q: q["ms"], reverse=True,
+    )
+    timers = {}
+    for name, seconds in profile["timers"]:
+        timers[name] = timers.get(name, 0.0) + seconds * 1000
+    return {
+        "elapsed_ms": (time.perf_counter() - profile["started"]) * 1000,
+        "query_count": sum(q["executions"] for q in queries),
+        "query_ms": sum(q["ms"] for q in queries),
+        "timers_ms": timers,
+        "queries": queries,
+    }
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def _histogram(lines, name, label, series):
+    count, seconds, _, buckets = series
+    cumulative = 0
+    for bound, hits in zip(BUCKETS, buckets):
+        cumulative += hits
+        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {count}')
+    lines.append(f"{name}_sum{{{label}}} {seconds}")
+    lines.append(f"{name}_count{{{label}}} {count}")
+
+def render_prometheus() -> str:
+    """All counters in the Prometheus text exposition format (version 0.0.4)"""
+    snapshot = registry.snapshot()
+    queries = sorted(snapshot["queries"].items())
+    lines = []
+    for metric, index, help_text in (
+        ("tbc_db_queries_total", 0, "Executions of each SQL statement"),
+        ("tbc_db_query_seconds_total", 1, "Time spent executing and fetching each SQL statement"),
+        ("tbc_db_query_rows_total", 2, "Rows returned or changed by each SQL statement"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for statement, series in queries:
+            lines.append(f'{metric}{{statement="{_escape(statement)}"}} {series[index]}')
+    lines += ["# HELP tbc_db_slow_queries_total Statements slower than SLOW_QUERY_MS",
+              "# TYPE tbc_db_slow_queries_total counter",
+              f"tbc_db_slow_queries_total {snapshot['slow_queries']}"]
+
+    lines += ["# HELP tbc_timer_seconds Page renders, bcrypt calls and other timed sections",
+              "# TYPE tbc_timer_seconds histogram"]
+    for name, series in sorted(snapshot["timers"].items()):
+        _histogram(lines, "tbc_timer_seconds", f'name="{_escape(name)}"', series)
+
+    try:
+        pool = get_pool_stats()
+    except Exception as e:
+        logger.warning(f"Pool stats unavailable for metrics export: {str(e)}")
+        pool = {}
+    for key in ("open", "in_use", "idle", "size"):
+        if key in pool:
+            lines += [f"# TYPE tbc_db_pool_{key} gauge", f"tbc_db_pool_{key} {pool[key]}"]
+    for key in ("hits", "misses", "waits", "timeouts"):
+        if key in pool:
+            lines += [f"# TYPE tbc_db_pool_{key}_total counter", f"tbc_db_pool_{key}_total {pool[key]}"]
+    return "\n".join(lines) + "\n"
+
+def _metrics_server(host, port):
+    # http.server pulls in ssl and email; only pay for them when serving
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), MetricsHandler)
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=None, host=None):
+    """Serve ``/metrics`` on a daemon thread; a no-op when the port is 0 or already serving"""
+    global _server
+    port = Config.METRICS_PORT if port is None else port
+    host = Config.METRICS_HOST if host is None else host
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = _metrics_server(host, port)
+            except OSError as e:
+                logger.error(f"Could not start metrics endpoint on port {port}: {str(e)}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Serving Prometheus metrics on {host}:{port}/metrics")
+        return _server
+
+def _configure_slow_query_log():
+    if Config.SLOW_QUERY_LOG and not slow_query_logger.handlers:
+        handler = logging.FileHandler(Config.SLOW_QUERY_LOG, encoding="utf-8")
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+        slow_query_logger.addHandler(handler)
+
+def install_instrumentation():
+    """Start observing queries and open the slow-query log file, if configured"""
+    _configure_slow_query_log()
+    set_query_observer(_observe_query)
@@ -0,0 +1,61 @@
+"""Incrementally maintained dashboard counters.
+
+Registrations and sessions are counted by triggers on ``users`` and
+``sessions``; logins are recorded in the write path by ``record_login``.
+Every counter lives in ``metric_rollups`` keyed by (metric, granularity,
+bucket), so reading the dashboard touches a handful of primary-key rows no
+matter how large the underlying tables grow. Buckets are UTC, matching
+SQLite's ``CURRENT_TIMESTAMP``. Both storage backends keep the same
+counters (see ``MetricsRepository``).
+"""
+from datetime import datetime, timedelta
+from database.repositories import get_storage
+from .reporting import reporting_metrics, reporting_status
+
+def _day(moment):
+    return moment.strftime("%Y-%m-%d")
+
+def _hour(moment):
+    return moment.strftime("%Y-%m-%d %H:00")
+
+def record_login(user_id: int):
+    """Count a successful login and mark the user active for today"""
+    now = datetime.utcnow()
+    get_storage().metrics.record_login(user_id, _day(now), _hour(now))
+
+def get_counter(metric: str, granularity: str = "all", bucket: str = "") -> int:
+    return reporting_metrics().get(metric, granularity, bucket)
+
+def get_daily_series(metrics, days: int, today=None) -> dict:
+    """Per-day values for the last ``days`` days, oldest first, zero-filled"""
+    today = today or datetime.utcnow()
+    buckets = [_day(today - timedelta(days=offset)) for offset in range(days - 1, -1, -1)]
+    series = {metric: dict.fromkeys(buckets, 0) for metric in metrics}
+    for row in reporting_metrics().daily(series, buckets[0], buckets[-1]):
+        series[row["metric"]][row["bucket"]] = row["value"]
+    return {metric: list(values.values()) for metric, values in series.items()}
+
+def percent_change(current, previous):
+    if not previous:
+        return None
+    return (current - previous) / previous * 100
+
+def dashboard_summary() -> dict:
+    """Values and trends for the dashboard cards from two weeks of daily rollups.
+
+    ``as_of`` is when the data was current: the snapshot time in reporting
+    snapshot mode, now otherwise.
+    """
+    as_of = reporting_status()["refreshed_at"]
+    series = get_daily_series(["active_users", "new_users", "sessions"], days=14)
+    active, new_users, sessions = series["active_users"], series["new_users"], series["sessions"]
+    return {
+        "active_users": active[-1],
+        "active_users_change": percent_change(active[-1], active[-8]),
+        "new_users": new_users[-1],
+        "new_users_change": percent_change(new_users[-1], new_users[-2]),
+        "sessions": sum(sessions[-7:]),
+        "sessions_change": percent_change(sum(sessions[-7:]), sum(sessions[:7])),
+        "total_users": get_counter("users_total"),
+        "as_of": as_of,
+    }
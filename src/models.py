@@ -1,31 +1,459 @@
-from database.db_operations import get_db_connection
-import bcrypt
+from database.repositories import USER_PROJECTIONS, DuplicateKeyError, get_storage
+from .passwords import hash_password, needs_rehash, verify_password
+from . import metrics
+from .permissions import get_registry
+from .ratelimit import get_login_throttle
+from .activity import get_activity_tracker
+import logging
+import threading
+import time
+import types
+from collections import OrderedDict
 from datetime import datetime
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def _parse_timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+def _projection_fields(projection):
+    try:
+        return USER_PROJECTIONS[projection]
+    except KeyError:
+        raise ValueError(f"Unknown user projection {projection!r}") from None
+
+def _covers(fields, projection) -> bool:
+    return all(field in fields for field in _projection_fields(projection))
+
+# Shared by every user without overrides, which is nearly all of them
+_NO_OVERRIDES = types.MappingProxyType({})
+
+def _overrides(value):
+    return types.MappingProxyType(dict(value)) if value else _NO_OVERRIDES
+
+# Normalises driver values: SQLite returns 0/1 and timestamp strings
+_FIELD_TYPES = {
+    "is_active": bool,
+    "created_at": _parse_timestamp,
+    "last_login": _parse_timestamp,
+    "permission_overrides": _overrides,
+}
+_set_field = object.__setattr__
+
+def _fill(user, fields):
+    """Set ``fields`` on a new record through its slot descriptors"""
+    for name, value in fields.items():
+        if name in _FIELD_TYPES:
+            value = _FIELD_TYPES[name](value)
+        try:
+            setter = _SLOT_SETTERS[name]
+        except KeyError:
+            raise TypeError(f"User has no field {name!r}") from None
+        setter(user, value)
+
+class _IdentityMap(threading.local):
+    """Users already loaded by the current script run, keyed by id.
+
+    Streamlit executes each rerun on its own script thread, so a thread-local
+    map scoped by ``User.begin_request`` gives every render its own view.
+    """
+
+    def __init__(self):
+        self.users = {}
+
+class _UserCache:
+    """Cross-session LRU cache of user rows with a time-to-live.
+
+    Rows are stored as plain dicts, each holding the union of the projections
+    loaded for that user since it was last written, and a fresh ``User``
+    record is built from them for every request.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, user_id):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._rows.get(user_id)
+            if entry is None:
+                return None
+            row, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._rows[user_id]
+                return None
+            self._rows.move_to_end(user_id)
+            return row
+
+    def put(self, user_id, row):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._rows[user_id] = (row, time.monotonic() + self.ttl)
+            self._rows.move_to_end(user_id)
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._rows.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+_identity_map = _IdentityMap()
+_user_cache = _UserCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL_SECONDS)
+_write_listeners = []
+
+def on_user_write(callback):
+    """Register ``callback(user_id)`` to run after any write to ``users``.
+
+    ``user_id`` is None for writes that are not about a single existing user,
+    such as creating or bulk-importing users.
+    """
+    _write_listeners.append(callback)
+    return callback
+
+def notify_user_write(user_id=None):
+    for callback in _write_listeners:
+        try:
+            callback(user_id)
+        except Exception as e:
+            logger.error(f"User write listener failed: {str(e)}")
 
 class User:
-    def __init__(self, id, username, email, role, is_active=True):
-        self.id = id
-        self.username = username
-        self.email = email
-        self.role = role
-        self.is_active = is_active
+    """Immutable user record holding the fields of one ``USER_PROJECTIONS`` entry.
+
+    Each screen loads only what it shows: ``sidebar`` for the signed-in
+    user's header and permission checks, ``row`` for lists and search
+    results, ``profile`` for a single user's page. Fields outside the loaded
+    projection are left unset, so reading one raises AttributeError instead
+    of returning a misleading None. Updates go to storage and evict the
+    cached row; the next lookup returns a fresh record.
+    """
+
+    __slots__ = ("id", "username", "email", "role", "is_active", "created_at",
+                 "last_login", "permission_overrides", "_permission_mask")
+
+    def __init__(self, **fields):
+        _fill(self, fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"User records are immutable; cannot set {name!r}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"User records are immutable; cannot delete {name!r}")
+
+    def __repr__(self):
+        return f"User(id={self.id!r}, username={getattr(self, 'username', None)!r})"
+
+    def __reduce__(self):
+        # Pickle restores slots through __setattr__, which records refuse, and
+        # st.cache_data pickles cached search results; rebuild from the fields
+        fields = {name: getattr(self, name) for name in self.__slots__
+                  if not name.startswith("_") and hasattr(self, name)}
+        if "permission_overrides" in fields:
+            fields["permission_overrides"] = dict(fields["permission_overrides"])
+        return User._from_row, (fields,)
+
+    def covers(self, projection) -> bool:
+        """Whether every field of ``projection`` is loaded"""
+        return all(hasattr(self, field) for field in _projection_fields(projection))
+
+    @classmethod
+    def _from_row(cls, row):
+        # Skips the keyword-argument round trip; this runs for every listed row
+        user = cls.__new__(cls)
+        _fill(user, row)
+        return user
+
+    @staticmethod
+    def _remember(row) -> "User":
+        """Cache a freshly loaded row, widened by what was cached, and map its record"""
+        cached = _user_cache.get(row["id"])
+        if cached is not None:
+            row = {**cached, **row}
+        _user_cache.put(row["id"], row)
+        user = User._from_row(row)
+        _identity_map.users[row["id"]] = user
+        return user
+
+    @staticmethod
+    def begin_request():
+        """Start a fresh identity map; call once at the top of every rerun"""
+        _identity_map.users = {}
+
+    @staticmethod
+    def evict(user_id: int):
+        """Drop a user from the identity map and the cross-session cache"""
+        _identity_map.users.pop(user_id, None)
+        _user_cache.evict(user_id)
+
+    @staticmethod
+    def _after_write(user_id):
+        if user_id is not None:
+            User.evict(user_id)
+        notify_user_write(user_id)
+
+    @staticmethod
+    def _lookup(user_id, projection):
+        """Record from the identity map or the cross-session cache, or None"""
+        user = _identity_map.users.get(user_id)
+        if user is not None and user.covers(projection):
+            return user
+        row = _user_cache.get(user_id)
+        if row is None or not _covers(row, projection):
+            return None
+        user = User._from_row(row)
+        _identity_map.users[user_id] = user
+        return user
+
+    @staticmethod
+    def get_by_id(user_id: int, projection="profile") -> "User":
+        user = User._lookup(user_id, projection)
+        if user is not None:
+            return user
+        row = get_storage().users.get(user_id, projection)
+        return User._remember(row) if row is not None else None
+
+    @staticmethod
+    def get_many(user_ids, projection="profile") -> dict:
+        """Users by id in the order given, unknown ids left out.
+
+        Ids not already cached are loaded with a single ``IN`` query.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        found, missing = {}, []
+        for user_id in user_ids:
+            user = User._lookup(user_id, projection)
+            if user is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = user
+        if missing:
+            for row in get_storage().users.get_many(missing, projection):
+                found[row["id"]] = User._remember(row)
+        return {user_id: found[user_id] for user_id in user_ids if user_id in found}
+
+    @staticmethod
+    def get_by_username(username: str) -> "User":
+        row = get_storage().users.get_by_username(username)
+        return User._from_row(row) if row else None
+
+    @staticmethod
+    def count(role=None, is_active=None, prefix=None) -> int:
+        return get_storage().users.count(role, is_active, prefix)
+
+    @staticmethod
+    def get_page(role=None, is_active=None, prefix=None, sort_by="username",
+                 descending=False, after=None, limit=50) -> tuple:
+        """Return one page of users and the cursor for the next page.
+
+        Pagination is keyset-based: ``after`` is the ``(sort value, id)`` cursor
+        returned by the previous call, so every page costs an index seek
+        instead of an OFFSET scan. The returned cursor is None on the last page.
+        """
+        rows, next_cursor = get_storage().users.page(
+            role, is_active, prefix, sort_by, descending, after, limit
+        )
+        return [User._from_row(row) for row in rows], next_cursor
+
+    @staticmethod
+    def search(text: str, limit=50) -> tuple:
+        """Users matching every word of ``text`` as a prefix of a username, email or role word.
+
+        Served from the full-text index, so the cost does not grow with the
+        table the way a ``LIKE '%text%'`` scan would. Returns ``(users,
+        ranked)``; see ``UserRepository.search`` for when results are ranked.
+        """
+        rows, ranked = get_storage().users.search(text, limit, Config.USER_SEARCH_RANK_LIMIT)
+        return [User._from_row(row) for row in rows], ranked
 
     @staticmethod
     def create(username: str, email: str, password: str, role: str) -> tuple:
-        hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute('''
-                    INSERT INTO users (username, email, password, role)
-                    VALUES (?, ?, ?, ?)
-                ''', (username, email, hashed_password, role))
-                conn.commit()
-                return True, "User created successfully"
-            except sqlite3.IntegrityError:
-                return False, "Username or email already exists"
+        hashed_password = hash_password(password)
+        try:
+            get_storage().users.insert(username, email, hashed_password, role)
+        except DuplicateKeyError:
+            return False, "Username or email already exists"
+        User._after_write(None)
+        return True, "User created successfully"
+
+    @staticmethod
+    def authenticate(username: str, password: str, client=None) -> tuple:
+        """Check credentials; returns (success, user_id).
+
+        Raises LoginThrottled, before any password work, while the username
+        or ``client`` is locked out after repeated failures. Hashes made with
+        an outdated work factor are transparently upgraded to
+        ``Config.BCRYPT_ROUNDS`` after a successful login.
+        """
+        throttle = get_login_throttle()
+        throttle.check(username, client)
+        users = get_storage().users
+        row = users.get_credentials(username)
+        if row is None or not row["is_active"]:
+            throttle.failure(username, client, known_user=row is not None)
+            return False, None
+        if not verify_password(password, row["password"]):
+            throttle.failure(username, client)
+            return False, None
+        throttle.success(username)
+
+        if needs_rehash(row["password"]):
+            users.update(row["id"], password=hash_password(password))
+        metrics.record_login(row["id"])
+        # last_login reaches the users table with the tracker's next batch
+        get_activity_tracker().login(row["id"])
+        return True, row["id"]
+
+    def verify_password(self, password: str) -> bool:
+        hashed = get_storage().users.get_password(self.id)
+        return hashed is not None and verify_password(password, hashed)
+
+    def update_email(self, new_email: str) -> tuple:
+        try:
+            get_storage().users.update(self.id, email=new_email)
+        except DuplicateKeyError:
+            return False, "Email already exists"
+        User._after_write(self.id)
+        return True, "Email updated successfully"
+
+    def update_password(self, new_password: str) -> tuple:
+        hashed_password = hash_password(new_password)
+        get_storage().users.update(self.id, password=hashed_password)
+        User._after_write(self.id)
+        return True, "Password updated successfully"
+
+    def editable_by(self, actor: "User") -> tuple:
+        """Whether ``actor`` may change this user's role or status.
+
+        Same limits as the bulk actions: it takes EDIT_USER, the actor must
+        hold every permission of this user's role and nobody edits their own
+        account.
+        """
+        if not actor.has_permission("EDIT_USER"):
+            return False, "You don't have permission to edit users"
+        if actor.id == self.id:
+            return False, "You can't change your own role or status"
+        if not get_registry().covers(actor.permission_mask, self.role):
+            return False, f"You can't edit {self.role} accounts"
+        return True, ""
+
+    def update_role(self, new_role: str, actor: "User") -> tuple:
+        allowed, message = self.editable_by(actor)
+        if not allowed:
+            return False, message
+        if new_role not in Config.ROLES_HIERARCHY:
+            return False, f"Unknown role: {new_role}"
+        if not actor.can_grant_role(new_role):
+            return False, f"You can't grant the {new_role} role"
+        get_storage().users.update(self.id, role=new_role)
+        User._after_write(self.id)
+        return True, "Role updated successfully"
+
+    def update_active(self, is_active: bool, actor: "User") -> tuple:
+        allowed, message = self.editable_by(actor)
+        if not allowed:
+            return False, message
+        get_storage().users.update(self.id, is_active=bool(is_active))
+        User._after_write(self.id)
+        return True, "Status updated successfully"
+
+    def set_permission_override(self, permission: str, granted: bool) -> tuple:
+        """Grant or revoke one permission for this user regardless of role"""
+        get_storage().users.set_permission_override(self.id, permission, granted)
+        User._after_write(self.id)
+        return True, "Permission updated successfully"
+
+    def clear_permission_override(self, permission: str) -> tuple:
+        get_storage().users.clear_permission_override(self.id, permission)
+        User._after_write(self.id)
+        return True, "Permission override removed"
+
+    def can_grant_role(self, role: str) -> bool:
+        """Whether this user may give ``role`` to an account: they must hold all its permissions"""
+        return role in Config.ROLES_HIERARCHY and get_registry().covers(self.permission_mask, role)
+
+    def _bulk_scope(self, permission) -> dict:
+        """Limits on a bulk action by this user, checked once for the whole batch.
+
+        Accounts whose role this user could not grant are left alone, and
+        nobody changes or deletes their own account from a bulk action.
+        Returns None without ``permission``.
+        """
+        if not self.has_permission(permission):
+            return None
+        return {
+            "protected_roles": tuple(role for role in Config.ROLES_HIERARCHY
+                                     if not self.can_grant_role(role)),
+            "exclude_ids": (self.id,),
+        }
+
+    def bulk_targets(self, user_ids, permission) -> list:
+        """Ids among ``user_ids`` that a bulk action needing ``permission`` would change"""
+        scope = self._bulk_scope(permission)
+        if scope is None:
+            return []
+        return [user.id for user in User.get_many(user_ids, "sidebar").values()
+                if user.id not in scope["exclude_ids"] and user.role not in scope["protected_roles"]]
+
+    @staticmethod
+    def _after_bulk_write(user_ids):
+        for user_id in user_ids:
+            User.evict(user_id)
+        notify_user_write(None)
+
+    def bulk_update(self, user_ids, **fields) -> tuple:
+        """Set role and/or is_active on many users in one statement.
+
+        Returns (success, updated ids) or (False, message); users outside
+        this user's reach are skipped, not reported as errors.
+        """
+        scope = self._bulk_scope("EDIT_USER")
+        if scope is None:
+            return False, "You don't have permission to edit users"
+        role = fields.get("role")
+        if role is not None:
+            if role not in Config.ROLES_HIERARCHY:
+                return False, f"Unknown role: {role}"
+            if not self.can_grant_role(role):
+                return False, f"You can't grant the {role} role"
+        updated = get_storage().users.update_many(user_ids, **scope, **fields)
+        User._after_bulk_write(updated)
+        return True, updated
+
+    def bulk_delete(self, user_ids) -> tuple:
+        """Delete many users in one transaction; same contract as ``bulk_update``"""
+        scope = self._bulk_scope("DELETE_USER")
+        if scope is None:
+            return False, "You don't have permission to delete users"
+        deleted = get_storage().users.delete(user_ids, **scope)
+        User._after_bulk_write(deleted)
+        return True, deleted
+
+    @property
+    def permission_mask(self) -> int:
+        try:
+            return self._permission_mask
+        except AttributeError:
+            mask = get_registry().user_mask(self.role, self.permission_overrides)
+            _set_field(self, "_permission_mask", mask)
+            return mask
 
     def has_permission(self, permission: str) -> bool:
-        return (permission in Config.ROLES_HIERARCHY[self.role] or 
-                "ALL" in Config.ROLES_HIERARCHY[self.role])
\ No newline at end of file
+        return get_registry().check(self.permission_mask, permission)
+
+_SLOT_SETTERS = {name: getattr(User, name).__set__ for name in User.__slots__}
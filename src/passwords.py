@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from src.instrumentation import timer
+
+logger = logging.getLogger(__name__)
+
+class PasswordServiceBusy(RuntimeError):
+    """Raised when the hashing queue is full and the caller should back off"""
+
+def _to_bytes(value):
+    return value.encode() if isinstance(value, str) else value
+
+def hash_cost(hashed) -> int:
+    """Work factor encoded in a bcrypt hash such as ``$2b$12$...``"""
+    try:
+        return int(_to_bytes(hashed).split(b"$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+class _OperationStats:
+    def __init__(self, window):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.total_wait = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self, elapsed):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "ops_per_sec": self.count / elapsed if elapsed > 0 else 0.0,
+            "mean_latency": self.total_time / self.count if self.count else 0.0,
+            "mean_queue_wait": self.total_wait / self.count if self.count else 0.0,
+            "p50_latency": percentile(0.50),
+            "p95_latency": percentile(0.95),
+            "p99_latency": percentile(0.99),
+        }
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a bounded thread pool.
+
+    bcrypt releases the GIL while it works, so a thread pool keeps CPU-heavy
+    hashing off the Streamlit script threads without the cost of processes.
+    At most ``max_pending`` jobs may be queued or running; further callers
+    wait up to ``queue_timeout`` seconds for a slot and then get
+    ``PasswordServiceBusy``.
+    """
+
+    def __init__(self, workers=None, max_pending=None, rounds=None, queue_timeout=None,
+                 latency_window=1024):
+        self.workers = workers or Config.PASSWORD_WORKERS
+        self.max_pending = max_pending or Config.PASSWORD_MAX_PENDING
+        self.rounds = rounds or Config.BCRYPT_ROUNDS
+        self.queue_timeout = (Config.PASSWORD_QUEUE_TIMEOUT
+                              if queue_timeout is None else queue_timeout)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="password-hasher")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._rejected = 0
+        self._stats = {
+            "hash": _OperationStats(latency_window),
+            "verify": _OperationStats(latency_window),
+        }
+
+    def _record(self, operation, queue_wait, duration, failed):
+        with self._lock:
+            stats = self._stats[operation]
+            stats.count += 1
+            stats.total_wait += queue_wait
+            stats.total_time += duration
+            stats.latencies.append(queue_wait + duration)
+            if failed:
+                stats.errors += 1
+
+    def _submit(self, operation, func, *args, wait=False):
+        acquired = self._slots.acquire() if wait else self._slots.acquire(timeout=self.queue_timeout)
+        if not acquired:
+            with self._lock:
+                self._rejected += 1
+            raise PasswordServiceBusy("Password service is busy, please try again")
+
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args)
+                failed = False
+                return result
+            finally:
+                self._record(operation, started - submitted, time.perf_counter() - started, failed)
+
+        try:
+            future = self._executor.submit(run)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    # bcrypt is imported on first use so importing this module stays cheap
+    def _hash(self, password):
+        import bcrypt
+
+        return bcrypt.hashpw(_to_bytes(password), bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    @staticmethod
+    def _verify(password, hashed):
+        import bcrypt
+
+        try:
+            return bcrypt.checkpw(_to_bytes(password), _to_bytes(hashed))
+        except ValueError:
+            logger.warning("Stored password hash is not a valid bcrypt hash")
+            return False
+
+    # The timers run on the caller's thread, so they include queue wait and
+    # show up in the profile of the script run that asked for the hash
+    def hash(self, password: str) -> str:
+        with timer("bcrypt.hash"):
+            return self._submit("hash", self._hash, password).result()
+
+    def verify(self, password: str, hashed) -> bool:
+        with timer("bcrypt.verify"):
+            return self._submit("verify", self._verify, password, hashed).result()
+
+    def hash_many(self, passwords) -> list:
+        """Hash a batch in parallel, waiting for free slots instead of failing"""
+        with timer("bcrypt.hash_many"):
+            futures = [self._submit("hash", self._hash, password, wait=True)
+                       for password in passwords]
+            return [future.result() for future in futures]
+
+    def needs_rehash(self, hashed) -> bool:
+        """True for hashes weaker than ``rounds``; stronger ones are kept, not downgraded"""
+        return hash_cost(hashed) < self.rounds
+
+    def metrics(self) -> dict:
+        """Throughput and latency counters per operation (latencies in seconds)"""
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            metrics = {name: stats.snapshot(elapsed) for name, stats in self._stats.items()}
+            metrics["rejected"] = self._rejected
+        metrics["workers"] = self.workers
+        metrics["max_pending"] = self.max_pending
+        metrics["rounds"] = self.rounds
+        return metrics
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+def get_password_hasher() -> PasswordHasher:
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
+
+def hash_password(password: str) -> str:
+    return get_password_hasher().hash(password)
+
+def verify_password(password: str, hashed) -> bool:
+    return get_password_hasher().verify(password, hashed)
+
+def needs_rehash(hashed) -> bool:
+    return get_password_hasher().needs_rehash(hashed)
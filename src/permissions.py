@@ -0,0 +1,102 @@
+"""Role permissions compiled into integer bitmasks.
+
+Every permission name is interned to a bit position and every role in
+``Config.ROLES_HIERARCHY`` is compiled once into the OR of its bits,
+including the bits of the roles it inherits from via
+``Config.ROLE_INHERITANCE``. ``ALL`` compiles to ``-1`` (every bit set), so
+a check is a single AND. Per-user grants and revocations are folded into
+the user's mask the same way.
+"""
+import threading
+from config import Config
+
+ALL = "ALL"
+ALL_MASK = -1
+
+class PermissionRegistry:
+    def __init__(self, roles_hierarchy, role_inheritance=None):
+        self._bits = {}
+        self._lock = threading.Lock()
+        self.role_masks = {}
+        self._compile(roles_hierarchy, role_inheritance or {})
+
+    def bit(self, permission: str) -> int:
+        """Bit for ``permission``, interning names seen for the first time"""
+        bit = self._bits.get(permission)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(permission, 1 << len(self._bits))
+        return bit
+
+    def mask_for(self, permissions) -> int:
+        mask = 0
+        for permission in permissions:
+            if permission == ALL:
+                return ALL_MASK
+            mask |= self.bit(permission)
+        return mask
+
+    def _compile(self, roles_hierarchy, role_inheritance):
+        resolving = set()
+
+        def resolve(role):
+            if role in self.role_masks:
+                return self.role_masks[role]
+            if role in resolving:
+                raise ValueError(f"Role inheritance cycle involving {role!r}")
+            if role not in roles_hierarchy:
+                raise ValueError(f"Unknown role {role!r} in ROLE_INHERITANCE")
+            resolving.add(role)
+            mask = self.mask_for(roles_hierarchy[role])
+            for parent in role_inheritance.get(role, ()):
+                mask |= resolve(parent)
+            resolving.discard(role)
+            self.role_masks[role] = mask
+            return mask
+
+        for role in roles_hierarchy:
+            resolve(role)
+
+    def role_mask(self, role: str) -> int:
+        return self.role_masks.get(role, 0)
+
+    def user_mask(self, role: str, overrides=None) -> int:
+        """Role mask with per-user ``{permission: granted}`` overrides applied"""
+        mask = self.role_mask(role)
+        for permission, granted in (overrides or {}).items():
+            if granted:
+                mask |= self.mask_for([permission])
+            else:
+                # Also correct for ALL: -1 & ~bit keeps every other bit set
+                mask &= ~self.bit(permission)
+        return mask
+
+    def covers(self, mask: int, role: str) -> bool:
+        """Whether ``mask`` holds every permission of ``role``"""
+        return self.role_mask(role) & ~mask == 0
+
+    def __contains__(self, permission):
+        """Whether ``permission`` has been seen, without interning it"""
+        return permission in self._bits
+
+    def check(self, mask: int, permission: str) -> bool:
+        bit = self._bits.get(permission) or self.bit(permission)
+        return mask & bit != 0
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> PermissionRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PermissionRegistry(Config.ROLES_HIERARCHY, Config.ROLE_INHERITANCE)
+    return _registry
+
+def reload_registry() -> PermissionRegistry:
+    """Recompile after changing ``Config.ROLES_HIERARCHY`` or ``ROLE_INHERITANCE``"""
+    global _registry
+    with _registry_lock:
+        _registry = PermissionRegistry(Config.ROLES_HIERARCHY, Config.ROLE_INHERITANCE)
+    return _registry
@@ -0,0 +1,211 @@
+"""Login brute-force protection.
+
+Failed logins are counted per username and per client in sliding-window
+counters: each key keeps the failure counts of the current and previous
+fixed window, and the previous count is weighted by how much of it still
+overlaps the sliding window. That is O(1) time and memory per key. Keys
+live in an LRU-ordered dict capped at ``Config.LOGIN_LIMITER_MAX_KEYS``, so a
+flood of distinct usernames cannot grow memory without bound.
+
+Once a key reaches its limit it is locked out for
+``Config.LOGIN_LOCKOUT_SECONDS``. Locked-out attempts are rejected before the
+password is looked up or verified, so they cost no bcrypt work. The failure
+count and lockout of existing accounts are written to
+``users.failed_login_attempts``/``users.locked_until`` in batches by a
+background task, and lockouts still in force are reloaded at startup.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from config import Config
+from database.repositories import get_storage
+from .utils import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+class LoginThrottled(RuntimeError):
+    """Too many failed logins for this username or client"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many failed login attempts, retry in {math.ceil(retry_after)}s")
+        self.retry_after = retry_after
+
+class SlidingWindowLimiter:
+    """Failure counters per key with lockout and LRU eviction"""
+
+    def __init__(self, limit, window, lockout, max_keys):
+        self.limit = limit
+        self.window = window
+        self.lockout = lockout
+        self.max_keys = max_keys
+        # key -> [window_start, previous_count, current_count, locked_until]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _advance(self, entry, now):
+        window_start = now - now % self.window
+        elapsed_windows = (window_start - entry[0]) / self.window
+        if elapsed_windows >= 2:
+            entry[1], entry[2] = 0, 0
+        elif elapsed_windows >= 1:
+            entry[1], entry[2] = entry[2], 0
+        entry[0] = window_start
+
+    def _estimate(self, entry, now):
+        overlap = 1 - (now - entry[0]) / self.window
+        return entry[1] * overlap + entry[2]
+
+    def retry_after(self, key, now=None) -> float:
+        """Seconds until ``key`` may try again, 0 if it is not locked out"""
+        now = time.time() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None or entry[3] <= now:
+            return 0.0
+        return entry[3] - now
+
+    def hit(self, key, now=None) -> float:
+        """Record a failure; returns the lockout expiry if this one triggered it, else 0"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [now - now % self.window, 0, 0, 0.0]
+                if len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+                self._advance(entry, now)
+            entry[2] += 1
+            if entry[3] <= now and self._estimate(entry, now) >= self.limit:
+                entry[3] = now + self.lockout
+                return entry[3]
+        return 0.0
+
+    def failures(self, key, now=None) -> int:
+        now = time.time() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0
+        with self._lock:
+            self._advance(entry, now)
+            return math.ceil(self._estimate(entry, now))
+
+    def lock(self, key, until, failures=0):
+        """Restore a persisted lockout"""
+        with self._lock:
+            self._entries[key] = [until - until % self.window, 0, failures, until]
+            if len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+def client_address(peer, forwarded=None):
+    """Address a request is rate limited by.
+
+    ``peer`` is the socket's remote address. With ``Config.TRUSTED_PROXY_HOPS``
+    proxies in front, each appends the address it received the request from
+    to ``X-Forwarded-For`` (``forwarded``), so the client is that many entries
+    from the right; anything further left was sent by the client itself.
+    """
+    hops = Config.TRUSTED_PROXY_HOPS
+    if hops > 0 and forwarded:
+        addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+        if len(addresses) >= hops:
+            return addresses[-hops]
+    return peer
+
+def _timestamp(epoch):
+    return datetime.utcfromtimestamp(epoch).strftime(TIMESTAMP_FORMAT) if epoch else None
+
+class LoginThrottle:
+    """Per-username and per-client limiters plus batched persistence"""
+
+    def __init__(self):
+        max_keys = Config.LOGIN_LIMITER_MAX_KEYS
+        self.users = SlidingWindowLimiter(Config.LOGIN_MAX_FAILURES, Config.LOGIN_WINDOW_SECONDS,
+                                          Config.LOGIN_LOCKOUT_SECONDS, max_keys)
+        self.clients = SlidingWindowLimiter(Config.LOGIN_CLIENT_MAX_FAILURES,
+                                            Config.LOGIN_WINDOW_SECONDS,
+                                            Config.LOGIN_LOCKOUT_SECONDS, max_keys)
+        # username -> (failed_login_attempts, locked_until) awaiting a flush
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
+        self._flusher = PeriodicTask("login-throttle-flush", Config.LOGIN_FLUSH_INTERVAL,
+                                     self.flush, run_on_stop=True)
+
+    def start(self):
+        self.restore()
+        self._flusher.start()
+        return self
+
+    def check(self, username, client=None):
+        """Raise LoginThrottled if either key is locked out"""
+        retry_after = self.users.retry_after(username)
+        if client is not None:
+            retry_after = max(retry_after, self.clients.retry_after(client))
+        if retry_after:
+            raise LoginThrottled(retry_after)
+
+    def failure(self, username, client=None, known_user=True):
+        locked_until = self.users.hit(username)
+        if client is not None and self.clients.hit(client):
+            logger.warning(f"Login client locked out after repeated failures: {client}")
+        if locked_until:
+            logger.warning(f"Login locked for user {username!r} until {_timestamp(locked_until)}")
+        if known_user:
+            now = time.time()
+            retry_after = self.users.retry_after(username, now)
+            entry = (self.users.failures(username, now),
+                     _timestamp(now + retry_after) if retry_after else None)
+            with self._dirty_lock:
+                self._dirty[username] = entry
+
+    def success(self, username):
+        self.users.reset(username)
+        with self._dirty_lock:
+            self._dirty[username] = (0, None)
+
+    def flush(self):
+        """Write pending failure counts and lockouts in one transaction"""
+        with self._dirty_lock:
+            pending, self._dirty = self._dirty, {}
+        if not pending:
+            return 0
+        get_storage().users.save_login_state(
+            (username, failures, locked_until)
+            for username, (failures, locked_until) in pending.items()
+        )
+        return len(pending)
+
+    def restore(self):
+        """Reload lockouts that are still in force from the database"""
+        rows = get_storage().users.locked_users(_timestamp(time.time()))
+        for row in rows:
+            until = datetime.strptime(row["locked_until"], TIMESTAMP_FORMAT)
+            epoch = (until - datetime(1970, 1, 1)).total_seconds()
+            self.users.lock(row["username"], epoch, row["failed_login_attempts"] or 0)
+        return len(rows)
+
+    def stop(self):
+        self._flusher.stop()
+
+_throttle = None
+_throttle_lock = threading.Lock()
+
+def get_login_throttle() -> LoginThrottle:
+    global _throttle
+    if _throttle is None:
+        with _throttle_lock:
+            if _throttle is None:
+                _throttle = LoginThrottle().start()
+    return _throttle
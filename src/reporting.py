@@ -0,0 +1,55 @@
+"""Where dashboard and audit reporting queries read from.
+
+With ``Config.REPORTING_SNAPSHOT`` on (SQLite only), reports read a
+snapshot of the database refreshed every ``Config.SNAPSHOT_REFRESH_SECONDS``
+by a background task (see ``database.snapshot``), so a long report never
+holds up logins and registrations. Otherwise they read the live database.
+``reporting_status`` says which, and how stale the data may be.
+"""
+import threading
+import time
+from config import Config
+from database.repositories import get_storage
+from database.snapshot import Snapshot, SnapshotDialect
+from database.sql_repositories import SQLAuditRepository, SQLMetricsRepository
+from .utils import PeriodicTask
+
+_snapshot = None
+_snapshot_audit = None
+_snapshot_metrics = None
+_snapshot_lock = threading.Lock()
+
+def get_snapshot():
+    """The process-wide snapshot, or None when reports read the live database"""
+    global _snapshot, _snapshot_audit, _snapshot_metrics
+    if not Config.REPORTING_SNAPSHOT or Config.DB_BACKEND != "sqlite":
+        return None
+    if _snapshot is None or _snapshot.source_path != Config.DB_PATH:
+        with _snapshot_lock:
+            if _snapshot is None or _snapshot.source_path != Config.DB_PATH:
+                snapshot = Snapshot(Config.DB_PATH, Config.SNAPSHOT_PATH or None)
+                snapshot.refresh()
+                PeriodicTask("snapshot-refresh", Config.SNAPSHOT_REFRESH_SECONDS,
+                             snapshot.refresh).start()
+                dialect = SnapshotDialect(snapshot)
+                _snapshot_audit = SQLAuditRepository(dialect)
+                _snapshot_metrics = SQLMetricsRepository(dialect)
+                _snapshot = snapshot
+    return _snapshot
+
+def reporting_audit():
+    """Audit repository for the audit log page and exports"""
+    return _snapshot_audit if get_snapshot() is not None else get_storage().audit
+
+def reporting_metrics():
+    """Metrics repository for the dashboard cards"""
+    return _snapshot_metrics if get_snapshot() is not None else get_storage().metrics
+
+def reporting_status() -> dict:
+    """``mode`` is ``live`` or ``snapshot``; snapshots add ``refreshed_at`` and ``age_seconds``"""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return {"mode": "live", "refreshed_at": time.time(), "age_seconds": 0.0}
+    status = snapshot.status()
+    status["refresh_interval"] = Config.SNAPSHOT_REFRESH_SECONDS
+    return status
@@ -0,0 +1,115 @@
+"""Revocable JWT sessions persisted in the ``sessions`` table.
+
+Each login issues a JWT carrying a random ``jti`` that is stored as the
+row's ``session_token``. Verifying a token is a signature/expiry check plus
+a lookup in an in-memory set of revoked, still-unexpired ids; the database
+is only touched when sessions are issued or revoked, and by the periodic
+sweeper that deletes expired rows and refreshes the revocation set (so
+revocations made by other processes are picked up within one interval).
+"""
+import logging
+import secrets
+import threading
+from datetime import datetime
+from config import Config
+from database.repositories import get_storage
+from .auth import create_jwt_token, verify_jwt_token
+from .utils import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+class RevocationSet:
+    """Revoked session ids mapped to their expiry"""
+
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        return jti in self._revoked
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def refresh(self, revoked, now):
+        """Merge ids loaded from the database and forget the expired ones"""
+        with self._lock:
+            merged = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+            merged.update(revoked)
+            self._revoked = merged
+
+    def __len__(self):
+        return len(self._revoked)
+
+_revoked = RevocationSet()
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+def _now():
+    return datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+
+def _ensure_started():
+    global _sweeper
+    if _sweeper is None:
+        with _sweeper_lock:
+            if _sweeper is None:
+                refresh_revocations()
+                _sweeper = PeriodicTask("session-sweeper", Config.SESSION_SWEEP_INTERVAL,
+                                        sweep_expired).start()
+
+def issue_session(user_id: int) -> str:
+    """Create a JWT for ``user_id`` and record it in ``sessions``"""
+    _ensure_started()
+    token = create_jwt_token(user_id, jti=secrets.token_urlsafe(16))
+    claims = verify_jwt_token(token)
+    expires_at = datetime.utcfromtimestamp(claims["exp"]).strftime(TIMESTAMP_FORMAT)
+    get_storage().sessions.create(user_id, claims["jti"], expires_at)
+    return token
+
+def verify_session(token: str):
+    """Return the user id for a valid, unrevoked token, else None (no DB access)"""
+    _ensure_started()
+    claims = verify_jwt_token(token)
+    if not claims or "jti" not in claims:
+        return None
+    if claims["jti"] in _revoked:
+        return None
+    return claims.get("user_id")
+
+def revoke_session(token: str) -> bool:
+    claims = verify_jwt_token(token)
+    if not claims or "jti" not in claims:
+        return False
+    get_storage().sessions.deactivate(claims["jti"])
+    _revoked.add(claims["jti"], datetime.utcfromtimestamp(claims["exp"]).strftime(TIMESTAMP_FORMAT))
+    return True
+
+def revoke_user_sessions(user_ids) -> int:
+    """Revoke every live session of the given users (e.g. on deactivation)"""
+    revoked = get_storage().sessions.deactivate_for_users(user_ids, _now())
+    for jti, expires_at in revoked:
+        _revoked.add(jti, expires_at)
+    return len(revoked)
+
+def refresh_revocations():
+    """Reload the revoked-but-unexpired session ids from the database"""
+    now = _now()
+    _revoked.refresh(get_storage().sessions.revoked_unexpired(now), now)
+
+def sweep_expired(batch_size=None) -> int:
+    """Delete expired session rows in small batches, then refresh revocations"""
+    batch_size = batch_size or Config.SESSION_SWEEP_BATCH
+    now = _now()
+    deleted = 0
+    while True:
+        count = get_storage().sessions.delete_expired(now, batch_size)
+        deleted += count
+        if count < batch_size:
+            break
+    if deleted:
+        logger.info(f"Swept {deleted} expired sessions")
+    refresh_revocations()
+    return deleted
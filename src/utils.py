@@ -0,0 +1,53 @@
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    """Run ``func`` every ``interval`` seconds on a daemon thread.
+
+    ``stop`` wakes the thread immediately; with ``run_on_stop`` the function
+    runs one final time so buffered work is not lost at shutdown.
+    """
+
+    def __init__(self, name, interval, func, run_on_stop=False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_on_stop = run_on_stop
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def _run_once(self):
+        try:
+            self.func()
+        except Exception as e:
+            logger.error(f"Periodic task {self.name} failed: {str(e)}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._run_once()
+        if self.run_on_stop:
+            self._run_once()
+
+    def stop(self, timeout=5.0):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
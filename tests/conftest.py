@@ -0,0 +1,90 @@
+"""Shared fixtures: a fresh, migrated database per test on each storage backend.
+
+PostgreSQL cases start a throwaway server with pytest-postgresql, using the
+``pg_ctl`` it finds (``--postgresql-exec``, the ``postgresql_exec`` ini
+option, ``pg_config --bindir`` or PATH). ``--postgresql-external`` uses the
+already running server at ``--postgresql-host`` / ``--postgresql-port``
+instead, e.g. a CI service container. Without either the PostgreSQL cases
+are skipped and the SQLite ones still run.
+"""
+import os
+
+# Cheap hashes for the root user every new database gets; set before config is read
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from config import Config
+from database import db_operations
+from database.db_operations import ensure_database
+from database.repositories import close_storage, get_storage
+from src.models import User, _user_cache
+
+try:
+    from pytest_postgresql import factories
+    from pytest_postgresql.exceptions import ExecutableMissingException
+except ImportError:
+    factories = None
+else:
+    postgresql_local = factories.postgresql_proc()
+    postgresql_external = factories.postgresql_noproc()
+
+BACKENDS = ("sqlite", "postgres")
+
+@pytest.fixture(autouse=True)
+def fresh_user_records():
+    """Every test starts from an empty database, so no cached user may outlive one"""
+    User.begin_request()
+    _user_cache.clear()
+
+def pytest_addoption(parser):
+    parser.addoption("--postgresql-external", action="store_true",
+                     help="Run the PostgreSQL cases against the server at --postgresql-host/-port")
+
+@pytest.fixture(scope="session")
+def postgresql_server(request):
+    if factories is None:
+        pytest.skip("pytest-postgresql is not installed")
+    if request.config.getoption("postgresql_external"):
+        return request.getfixturevalue("postgresql_external")
+    try:
+        return request.getfixturevalue("postgresql_local")
+    except ExecutableMissingException as e:
+        pytest.skip(f"No PostgreSQL server to test against: {e}")
+
+if factories is not None:
+    postgresql_database = factories.postgresql("postgresql_server")
+
+@pytest.fixture
+def postgres_dsn(request, postgresql_server):
+    """DSN of an empty database, dropped after the test"""
+    conn = request.getfixturevalue("postgresql_database")
+    dsn = conn.info.dsn
+    if postgresql_server.password:
+        dsn += f" password={postgresql_server.password}"
+    return dsn
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path, monkeypatch):
+    """Point ``Config`` at a new database on each backend and migrate it"""
+    monkeypatch.setattr(Config, "DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setattr(Config, "DB_BACKEND", request.param)
+    if request.param == "postgres":
+        monkeypatch.setattr(Config, "POSTGRES_DSN", request.getfixturevalue("postgres_dsn"))
+        # Every test's database gets the same DSN, so ensure_database must not remember it
+        monkeypatch.setattr(db_operations, "_initialized", set())
+    ensure_database()
+    yield request.param
+    close_storage()
+
+@pytest.fixture
+def storage(backend):
+    return get_storage()
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """A new, migrated SQLite database for tests of SQLite-only code"""
+    monkeypatch.setattr(Config, "DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setattr(Config, "DB_BACKEND", "sqlite")
+    ensure_database()
+    yield Config.DB_PATH
+    close_storage()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import pytest
+from config import Config
+from src.api import MAX_HEADERS, ApiError, AuthAPI
+
+@pytest.fixture
+def api():
+    api = AuthAPI(workers=1, api_key="secret")
+    yield api
+    api.executor.shutdown()
+
+def _read(api, data):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await api._read_request(reader)
+    return asyncio.run(read())
+
+def _error(api, data):
+    with pytest.raises(ApiError) as excinfo:
+        _read(api, data)
+    return excinfo.value.status, excinfo.value.code
+
+def test_parses_request(api):
+    method, path, version, headers, body = _read(
+        api, b"post /v1/login?x=1 HTTP/1.1\r\nContent-Length: 2\r\nX-Api-Key:  secret \r\n\r\n{}"
+    )
+    assert (method, path, version, body) == ("POST", "/v1/login", "HTTP/1.1", b"{}")
+    assert headers == {"content-length": "2", "x-api-key": "secret"}
+
+def test_bare_newlines_and_no_body(api):
+    assert _read(api, b"GET /healthz HTTP/1.0\nHost: x\n\n")[-1] == b""
+
+def test_eof_before_request(api):
+    assert _read(api, b"") is None
+
+def test_malformed_request_line(api):
+    assert _error(api, b"garbage\r\n\r\n") == (400, "bad_request")
+
+def test_too_many_headers(api):
+    headers = b"".join(b"X-H%d: v\r\n" % i for i in range(MAX_HEADERS + 1))
+    assert _error(api, b"GET / HTTP/1.1\r\n" + headers + b"\r\n") == (431, "headers_too_large")
+
+def test_header_line_too_long(api):
+    assert _error(api, b"GET / HTTP/1.1\r\nX: " + b"a" * 70000 + b"\r\n\r\n") == \
+        (431, "headers_too_large")
+
+def test_chunked_body_needs_length(api):
+    data = b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n0\r\n\r\n"
+    assert _error(api, data) == (411, "length_required")
+
+def test_invalid_content_length(api):
+    assert _error(api, b"POST / HTTP/1.1\r\nContent-Length: ten\r\n\r\n") == (400, "bad_request")
+
+def test_body_too_large(api, monkeypatch):
+    monkeypatch.setattr(Config, "API_MAX_BODY_BYTES", 4)
+    assert _error(api, b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello") == \
+        (413, "body_too_large")
+
+def test_truncated_body(api):
+    with pytest.raises(asyncio.IncompleteReadError):
+        _read(api, b"POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nshort")
+
+@pytest.mark.parametrize("method, path, headers, body, status, code", [
+    ("POST", "/v1/nope", {}, b"", 404, "not_found"),
+    ("GET", "/v1/login", {}, b"", 405, "method_not_allowed"),
+    ("POST", "/v1/login", {"x-api-key": "wrong"}, b"{}", 401, "unauthorized"),
+    ("POST", "/v1/login", {"x-api-key": "secret"}, b"{x}", 400, "bad_request"),
+    ("POST", "/v1/login", {"x-api-key": "secret"}, b"[]", 400, "bad_request"),
+])
+def test_rejected_before_handler(api, method, path, headers, body, status, code):
+    result = asyncio.run(api._handle(method, path, headers, body, None))
+    assert result[0] == status and result[1]["error"] == code
+
+def test_healthz_needs_no_key(api):
+    assert asyncio.run(api._handle("GET", "/healthz", {}, b"", None)) == \
+        (200, {"status": "ok"}, None)
+
+def test_handler_errors_become_responses(api, sqlite_db):
+    status, payload, _ = asyncio.run(api._handle(
+        "POST", "/v1/login", {"x-api-key": "secret"}, json.dumps({"username": 1}).encode(), None
+    ))
+    assert status == 400 and payload == {"error": "bad_request",
+                                         "message": "'username' must be a string"}
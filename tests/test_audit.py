@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+import pytest
+from src import audit as audit_module
+from src.audit import AuditLogger
+
+OLD_EVENTS = [
+    (None, "OLD", "2020-01-05 10:00:00", "january"),
+    (None, "OLD", "2020-02-05 10:00:00", "february"),
+]
+
+def test_compact_to_archive_tables(storage):
+    storage.audit.insert_many(OLD_EVENTS + [(None, "NEW", "2999-01-01 00:00:00", "recent")])
+    assert audit_module.compact(older_than_days=30, batch_size=1) == 2
+    assert [row["details"] for row in storage.audit.page(limit=10)[0]] == ["recent"]
+    with storage.audit.db.connection() as conn:
+        row = conn.execute("SELECT details FROM audit_log_archive_2020_01").fetchone()
+    assert row["details"] == "january"
+
+def test_compact_to_files(storage, tmp_path):
+    storage.audit.insert_many(OLD_EVENTS)
+    assert audit_module.compact(older_than_days=30, archive_dir=tmp_path) == 2
+    lines = (tmp_path / "audit_log_2020_02.jsonl").read_text().splitlines()
+    assert [json.loads(line)["details"] for line in lines] == ["february"]
+    assert json.loads(lines[0])["timestamp"] == "2020-02-05 10:00:00"
+    assert storage.audit.oldest_before("2021-01-01 00:00:00", 10) == []
+
+def _details(storage):
+    return sorted(row["details"] for row in storage.audit.page(limit=100)[0])
+
+def test_writes_full_batches(storage):
+    writer = AuditLogger(batch_size=3, flush_interval=60, max_queue=100)
+    try:
+        for i in range(6):
+            assert writer.log(None, "ACTION", f"event {i}")
+        assert writer.flush()
+        stats = writer.stats()
+        assert stats["enqueued"] == stats["written"] == 6 and stats["queued"] == 0
+        assert stats["batches"] == 2 and stats["dropped"] == stats["failed"] == 0
+    finally:
+        writer.close()
+    assert _details(storage) == [f"event {i}" for i in range(6)]
+
+def test_writes_partial_batch_after_interval(sqlite_db):
+    writer = AuditLogger(batch_size=100, flush_interval=0.05, max_queue=100)
+    try:
+        writer.log(None, "ACTION", {"key": "value"})
+        deadline = time.monotonic() + 5
+        while writer.stats()["written"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.stats()["written"] == 1
+    finally:
+        writer.close()
+
+def _full_writer(policy, **kwargs):
+    # The writer waits for 100 events or a minute, so the queue stays full
+    writer = AuditLogger(batch_size=100, flush_interval=60, max_queue=2,
+                         overflow_policy=policy, **kwargs)
+    assert writer.log(None, "ACTION", "first") and writer.log(None, "ACTION", "second")
+    return writer
+
+def test_drop_oldest(sqlite_db):
+    writer = _full_writer("drop_oldest")
+    assert writer.log(None, "ACTION", "third")
+    assert writer.stats()["dropped"] == 1
+    writer.close()
+    assert writer.stats()["written"] == 2
+
+def test_drop_newest(sqlite_db):
+    writer = _full_writer("drop_newest")
+    assert not writer.log(None, "ACTION", "third")
+    writer.close()
+    assert writer.stats()["dropped"] == 1 and writer.stats()["written"] == 2
+
+def test_block_gives_up_after_timeout(sqlite_db):
+    writer = _full_writer("block", block_timeout=0.05)
+    started = time.monotonic()
+    assert not writer.log(None, "ACTION", "third")
+    assert time.monotonic() - started >= 0.05
+    writer.close()
+    assert writer.stats()["dropped"] == 1
+
+def test_block_waits_for_room(sqlite_db):
+    writer = _full_writer("block", block_timeout=5)
+    flusher = threading.Timer(0.05, writer.flush)
+    flusher.start()
+    try:
+        assert writer.log(None, "ACTION", "third")
+    finally:
+        flusher.join()
+        writer.close()
+    assert writer.stats()["dropped"] == 0 and writer.stats()["written"] == 3
+
+def test_closed_writer_refuses_events(sqlite_db):
+    writer = AuditLogger(batch_size=10, flush_interval=60, max_queue=10)
+    writer.log(None, "ACTION", "kept")
+    writer.close()
+    assert not writer.log(None, "ACTION", "late")
+    assert writer.stats() == {"enqueued": 1, "written": 1, "dropped": 0, "failed": 0,
+                              "batches": 1, "queued": 0}
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        AuditLogger(overflow_policy="drop_everything")
@@ -0,0 +1,68 @@
+import io
+import json
+import pytest
+from database.repositories import get_storage
+from src.bulk import ImportReport, export_users, import_users, iter_records
+from src.models import User
+
+def _jsonl(*lines):
+    return iter_records(io.StringIO("\n".join(lines)), "jsonl")
+
+def _row(name, **fields):
+    return json.dumps({"username": name, "email": f"{name}@example.com", "password": "pw", **fields})
+
+def test_import_csv(sqlite_db):
+    data = "username,email,password,role\nann,ann@example.com,pw,Viewer\nben,ben@example.com,pw,\n"
+    report = import_users(iter_records(io.StringIO(data), "csv"))
+    assert report.created == 2 and report.error_count == 0
+    assert get_storage().users.get_by_username("ann")["role"] == "Viewer"
+    assert get_storage().users.get_by_username("ben")["role"] == "User"
+
+@pytest.mark.parametrize("line, reason", [
+    ("[1, 2]", "Expected an object with username, email and password"),
+    ('"x"', "Expected an object with username, email and password"),
+    ("null", "Expected an object with username, email and password"),
+    ('{"username": 5, "email": "a@example.com", "password": "pw"}', "username must be a string"),
+    ('{"username": "a", "email": "a@example.com", "password": ["pw"]}',
+     "password must be a string"),
+    ('{"username": "a", "email": "a@example.com"}', "username, email and password are required"),
+    ("{not json", "Invalid JSON: "),
+    (_row("a", role="Wizard"), "Unknown role: Wizard"),
+])
+def test_malformed_rows_are_reported_not_raised(sqlite_db, line, reason):
+    report = import_users(_jsonl(line, _row("good")))
+    assert report.created == 1 and report.error_count == 1
+    assert report.errors[0]["line"] == 1 and report.errors[0]["reason"].startswith(reason)
+
+def test_conflicts_within_file_and_with_database(sqlite_db):
+    get_storage().users.insert("taken", "taken@example.com", "hash", "User")
+    report = import_users(_jsonl(_row("new"), _row("new"), _row("taken")), chunk_size=2)
+    assert report.created == 1 and report.conflict_count == 2
+    assert [c["reason"] for c in report.conflicts] == [
+        "Duplicate username or email within the file", "Username already exists"]
+
+def test_report_keeps_counting_past_its_limit():
+    report = ImportReport(max_rows=2)
+    for line in range(5):
+        report.add_error(line, "bad")
+        report.add_conflict(line, "name", "taken")
+    assert report.error_count == 5 and len(report.errors) == 2
+    assert report.conflict_count == 5 and len(report.conflicts) == 2
+    assert report.as_dict()["error_count"] == 5
+
+def test_import_refuses_roles_the_actor_cannot_grant(sqlite_db):
+    storage = get_storage().users
+    manager = User.get_by_id(storage.insert("mgr", "mgr@example.com", "hash", "Manager"), "sidebar")
+    report = import_users(_jsonl(_row("a", role="Admin"), _row("b", role="Root"), _row("c")),
+                          actor=manager)
+    assert report.created == 1
+    assert [e["reason"] for e in report.errors] == [
+        "You can't grant the Admin role", "You can't grant the Root role"]
+
+def test_export_streams_without_password_hashes(sqlite_db):
+    import_users(_jsonl(_row("ann"), _row("ben")))
+    out = io.StringIO()
+    assert export_users(out, "jsonl", batch_size=1) == 3
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [row["username"] for row in rows] == ["root", "ann", "ben"]
+    assert all("password" not in row for row in rows)
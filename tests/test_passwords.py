@@ -0,0 +1,24 @@
+import bcrypt
+import pytest
+from src.passwords import PasswordHasher, hash_cost
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=2, max_pending=4, rounds=5)
+    yield hasher
+    hasher.shutdown()
+
+def _hash(rounds):
+    return bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=rounds)).decode()
+
+def test_hash_and_verify(hasher):
+    hashed = hasher.hash("secret")
+    assert hash_cost(hashed) == 5
+    assert hasher.verify("secret", hashed) and not hasher.verify("wrong", hashed)
+    assert not hasher.verify("secret", "not a bcrypt hash")
+
+def test_needs_rehash_only_for_weaker_hashes(hasher):
+    assert hasher.needs_rehash(_hash(4))
+    assert not hasher.needs_rehash(_hash(5))
+    assert not hasher.needs_rehash(_hash(6))
+    assert hasher.needs_rehash("not a bcrypt hash")
@@ -0,0 +1,97 @@
+import threading
+import pytest
+from database.db_operations import ConnectionPool, get_db_connection
+from database.repositories import DuplicateKeyError, get_storage
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2, timeout=0.2)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (name TEXT UNIQUE)")
+        conn.commit()
+    yield pool
+    pool.close()
+
+def _names(pool):
+    with pool.connection() as conn:
+        return sorted(row[0] for row in conn.execute("SELECT name FROM items"))
+
+def test_nested_checkout_reuses_connection(pool):
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+    assert pool.stats()["open"] == 1
+
+def test_nested_commit_does_not_commit_caller(pool):
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO items VALUES ('outer')")
+        with pool.connection() as inner:
+            inner.execute("INSERT INTO items VALUES ('inner')")
+            inner.commit()
+        outer.rollback()
+    assert _names(pool) == []
+
+def test_nested_rollback_keeps_caller_work(pool):
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO items VALUES ('outer')")
+        with pool.connection() as inner:
+            inner.execute("INSERT INTO items VALUES ('inner')")
+            inner.rollback()
+        outer.commit()
+    assert _names(pool) == ["outer"]
+
+def test_nested_exception_undoes_only_nested_work(pool):
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO items VALUES ('outer')")
+        with pytest.raises(RuntimeError):
+            with pool.connection() as inner:
+                inner.execute("INSERT INTO items VALUES ('inner')")
+                raise RuntimeError("boom")
+        outer.commit()
+    assert _names(pool) == ["outer"]
+
+def test_nested_checkout_outside_transaction_commits(pool):
+    with pool.connection():
+        with pool.connection() as inner:
+            inner.execute("INSERT INTO items VALUES ('inner')")
+            inner.commit()
+    assert _names(pool) == ["inner"]
+
+def test_uncommitted_work_is_rolled_back_on_checkin(pool):
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO items VALUES ('dropped')")
+    assert _names(pool) == []
+
+def test_checkout_times_out_when_exhausted(pool):
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        held.wait()
+        held.clear()
+    try:
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+        assert pool.stats()["timeouts"] == 1
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+def test_repository_conflict_keeps_caller_transaction(sqlite_db):
+    users = get_storage().users
+    users.insert("taken", "taken@example.com", "hash", "User")
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO users (username, email, password, role) "
+                     "VALUES ('outer', 'outer@example.com', 'hash', 'User')")
+        with pytest.raises(DuplicateKeyError):
+            users.insert("taken", "other@example.com", "hash", "User")
+        conn.commit()
+    assert users.get_by_username("outer") is not None
@@ -0,0 +1,95 @@
+import time
+import pytest
+from config import Config
+from src.ratelimit import LoginThrottle, LoginThrottled, SlidingWindowLimiter, client_address
+
+@pytest.fixture
+def limiter():
+    return SlidingWindowLimiter(limit=3, window=60, lockout=300, max_keys=2)
+
+def test_locks_out_at_limit(limiter):
+    assert limiter.hit("bob", now=0) == 0 and limiter.hit("bob", now=1) == 0
+    assert limiter.retry_after("bob", now=1) == 0
+    assert limiter.hit("bob", now=2) == 302
+    assert limiter.retry_after("bob", now=10) == 292
+    # Failures during the lockout do not extend it
+    assert limiter.hit("bob", now=20) == 0 and limiter.retry_after("bob", now=20) == 282
+    assert limiter.retry_after("bob", now=302) == 0
+
+def test_previous_window_is_weighted_by_overlap(limiter):
+    limiter.hit("bob", now=10)
+    limiter.hit("bob", now=20)
+    assert limiter.failures("bob", now=30) == 2
+    # Half of the previous window still overlaps the sliding window
+    assert limiter.failures("bob", now=90) == 1
+    assert limiter.failures("bob", now=200) == 0
+
+def test_old_failures_do_not_lock_out(limiter):
+    limiter.hit("bob", now=0)
+    limiter.hit("bob", now=1)
+    assert limiter.hit("bob", now=150) == 0
+
+def test_evicts_least_recently_used(limiter):
+    limiter.hit("a", now=0)
+    limiter.hit("b", now=0)
+    limiter.hit("a", now=1)
+    limiter.hit("c", now=2)
+    assert len(limiter) == 2
+    assert limiter.failures("a", now=3) == 2 and limiter.failures("b", now=3) == 0
+
+def test_lock_and_reset(limiter):
+    limiter.lock("bob", until=500, failures=3)
+    assert limiter.retry_after("bob", now=400) == 100 and limiter.failures("bob", now=400) == 3
+    limiter.reset("bob")
+    assert limiter.retry_after("bob", now=400) == 0 and len(limiter) == 0
+
+@pytest.mark.parametrize("hops, expected", [
+    (0, "10.0.0.1"), (1, "192.0.2.2"), (2, "192.0.2.1"), (3, "10.0.0.1"),
+])
+def test_client_address(monkeypatch, hops, expected):
+    monkeypatch.setattr(Config, "TRUSTED_PROXY_HOPS", hops)
+    assert client_address("10.0.0.1", "192.0.2.1, 192.0.2.2") == expected
+
+def test_client_address_without_header(monkeypatch):
+    monkeypatch.setattr(Config, "TRUSTED_PROXY_HOPS", 1)
+    assert client_address("10.0.0.1", None) == "10.0.0.1"
+    assert client_address("10.0.0.1", " , ") == "10.0.0.1"
+
+@pytest.fixture
+def throttle(storage, monkeypatch):
+    monkeypatch.setattr(Config, "LOGIN_MAX_FAILURES", 2)
+    monkeypatch.setattr(Config, "LOGIN_CLIENT_MAX_FAILURES", 3)
+    storage.users.insert("bob", "bob@example.com", "hash", "User")
+    return LoginThrottle()
+
+def _locked(storage):
+    now = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    return {row["username"]: row for row in storage.users.locked_users(now)}
+
+def test_throttle_locks_user_and_client(throttle):
+    throttle.failure("bob", "10.0.0.1")
+    throttle.check("bob", "10.0.0.1")
+    throttle.failure("bob", "10.0.0.1")
+    with pytest.raises(LoginThrottled) as excinfo:
+        throttle.check("bob")
+    assert 0 < excinfo.value.retry_after <= Config.LOGIN_LOCKOUT_SECONDS
+    throttle.check("alice", "10.0.0.1")
+    throttle.failure("alice", "10.0.0.1", known_user=False)
+    with pytest.raises(LoginThrottled):
+        throttle.check("alice", "10.0.0.1")
+    throttle.check("alice", "10.0.0.2")
+
+def test_throttle_persists_and_restores(throttle, storage):
+    throttle.failure("bob")
+    throttle.failure("bob")
+    throttle.failure("ghost", known_user=False)
+    assert throttle.flush() == 1 and throttle.flush() == 0
+    assert _locked(storage)["bob"]["failed_login_attempts"] == 2
+
+    restarted = LoginThrottle()
+    assert restarted.restore() == 1
+    with pytest.raises(LoginThrottled):
+        restarted.check("bob")
+    restarted.success("bob")
+    restarted.check("bob")
+    assert restarted.flush() == 1 and "bob" not in _locked(storage)
@@ -0,0 +1,70 @@
+import pytest
+from database.repositories import get_storage
+from src.models import User
+
+@pytest.fixture
+def users(sqlite_db):
+    """One account per role, keyed by role, loaded the way the app loads the actor"""
+    storage = get_storage().users
+    ids = {role: storage.insert(role.lower(), f"{role.lower()}@example.com", "hash", role)
+           for role in ("Admin", "Manager", "User", "Viewer")}
+    ids["Root"] = storage.get_by_username("root")["id"]
+    return {role: User.get_by_id(user_id, "sidebar") for role, user_id in ids.items()}
+
+def _extra(role):
+    storage = get_storage().users
+    name = f"extra_{role.lower()}"
+    return User.get_by_id(storage.insert(name, f"{name}@example.com", "hash", role), "sidebar")
+
+@pytest.mark.parametrize("actor, grantable", [
+    ("Root", {"Root", "Admin", "Manager", "User", "Viewer"}),
+    ("Admin", {"Admin", "Manager", "User", "Viewer"}),
+    ("Manager", {"Manager", "User", "Viewer"}),
+    ("User", {"User", "Viewer"}),
+    ("Viewer", {"Viewer"}),
+])
+def test_grantable_roles_are_subsets_of_the_actor(users, actor, grantable):
+    assert {role for role in users if users[actor].can_grant_role(role)} == grantable
+    assert not users[actor].can_grant_role("Nonexistent")
+
+def test_manager_cannot_grant_admin(users):
+    target = users["User"]
+    assert target.update_role("Admin", users["Manager"]) == (False, "You can't grant the Admin role")
+    assert User.get_by_id(target.id, "row").role == "User"
+    assert target.update_role("Manager", users["Manager"])[0]
+    assert User.get_by_id(target.id, "row").role == "Manager"
+
+def test_manager_cannot_edit_admin(users):
+    allowed, message = users["Admin"].editable_by(users["Manager"])
+    assert not allowed and message == "You can't edit Admin accounts"
+    assert not users["Admin"].update_active(False, users["Manager"])[0]
+    assert not users["Root"].editable_by(users["Admin"])[0]
+    assert users["Admin"].editable_by(users["Root"])[0]
+
+def test_no_one_edits_themselves(users):
+    assert users["Root"].editable_by(users["Root"]) == (False, "You can't change your own role or status")
+
+def test_override_extends_grantable_roles(users):
+    manager = _extra("Manager")
+    manager.set_permission_override("DELETE_USER", True)
+    manager.set_permission_override("VIEW_DEBUG", True)
+    manager = User.get_by_id(manager.id, "sidebar")
+    assert manager.can_grant_role("Admin") and not manager.can_grant_role("Root")
+
+def test_bulk_update_refuses_roles_beyond_the_actor(users):
+    targets = [users["User"].id, users["Viewer"].id]
+    assert users["Manager"].bulk_update(targets, role="Admin") == (False, "You can't grant the Admin role")
+    assert users["Manager"].bulk_update(targets, role="Root") == (False, "You can't grant the Root role")
+    assert {User.get_by_id(user_id, "row").role for user_id in targets} == {"User", "Viewer"}
+    assert users["Manager"].bulk_update(targets, role="Manager") == (True, targets)
+
+def test_bulk_update_skips_accounts_beyond_the_actor(users):
+    manager = users["Manager"]
+    targets = [users[role].id for role in ("Root", "Admin", "Manager", "User")]
+    assert manager.bulk_targets(targets, "EDIT_USER") == [users["User"].id]
+    assert manager.bulk_update(targets, is_active=False) == (True, [users["User"].id])
+    assert User.get_by_id(users["Admin"].id, "row").is_active
+
+def test_bulk_delete_needs_delete_user(users):
+    assert users["Manager"].bulk_delete([users["Viewer"].id])[0] is False
+    assert users["Admin"].bulk_delete([users["Viewer"].id, users["Root"].id]) == (True, [users["Viewer"].id])
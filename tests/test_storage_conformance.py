@@ -0,0 +1,272 @@
+"""Behaviour every storage backend must share.
+
+Each test runs against SQLite and PostgreSQL, so a backend-specific
+difference (placeholder style, boolean and timestamp types, unique-violation
+exceptions, streaming cursors) shows up as a named failure instead of a bug
+in the app.
+"""
+from datetime import datetime, timedelta
+import pytest
+from database.repositories import USER_PROJECTIONS, DuplicateKeyError
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _ts(delta_seconds=0):
+    return (datetime.utcnow() + timedelta(seconds=delta_seconds)).strftime(TIMESTAMP_FORMAT)
+
+def _user(storage, name, role="User"):
+    return storage.users.insert(name, f"{name}@example.com", "hash", role)
+
+def test_insert_and_lookup(storage):
+    users = storage.users
+    user_id = _user(storage, "alice", "Manager")
+    row = users.get(user_id)
+    assert row["username"] == "alice" and row["role"] == "Manager"
+    assert bool(row["is_active"]) and row["permission_overrides"] == {}
+    assert users.get_by_username("alice")["id"] == user_id
+    assert users.get_credentials("alice")["password"] == "hash"
+    assert users.get_password(user_id) == "hash"
+    assert users.get(-1) is None and users.get_by_username("nobody") is None
+
+def test_projections_and_get_many(storage):
+    users = storage.users
+    first, second = _user(storage, "proj1", "Admin"), _user(storage, "proj2")
+    users.set_permission_override(second, "VIEW_LOGS", True)
+    for name, fields in USER_PROJECTIONS.items():
+        row = users.get(first, name)
+        assert set(row) == set(fields) and "password" not in row, name
+    rows = {row["id"]: row for row in users.get_many([second, -1, first, second], "sidebar")}
+    assert set(rows) == {first, second}
+    assert rows[second]["permission_overrides"] == {"VIEW_LOGS": True}
+    assert set(rows[first]) == set(USER_PROJECTIONS["sidebar"])
+    assert users.get_many([]) == []
+    with pytest.raises(ValueError):
+        users.get(first, "everything")
+
+def test_duplicates(storage):
+    users = storage.users
+    _user(storage, "dup")
+    with pytest.raises(DuplicateKeyError):
+        users.insert("dup", "other@example.com", "hash", "User")
+    other = _user(storage, "dup2")
+    with pytest.raises(DuplicateKeyError):
+        users.update(other, email="dup@example.com")
+
+def test_update(storage):
+    users = storage.users
+    user_id = _user(storage, "bob")
+    users.update(user_id, role="Admin", is_active=False, email="bob2@example.com")
+    row = users.get(user_id)
+    assert row["role"] == "Admin" and not row["is_active"]
+    assert row["email"] == "bob2@example.com"
+    with pytest.raises(ValueError):
+        users.update(user_id, username="nope")
+
+def test_permission_overrides(storage):
+    users = storage.users
+    user_id = _user(storage, "carol")
+    users.set_permission_override(user_id, "VIEW_LOGS", True)
+    users.set_permission_override(user_id, "EDIT_PROFILE", False)
+    users.set_permission_override(user_id, "VIEW_LOGS", False)
+    assert users.get(user_id)["permission_overrides"] == {"VIEW_LOGS": False, "EDIT_PROFILE": False}
+    users.clear_permission_override(user_id, "VIEW_LOGS")
+    assert users.get(user_id)["permission_overrides"] == {"EDIT_PROFILE": False}
+
+def test_bulk_insert_and_keys(storage):
+    users = storage.users
+    rows = [(f"bulk{i}", f"bulk{i}@example.com", "hash", "Viewer") for i in range(5)]
+    assert users.insert_many(rows) == 5
+    taken_u, taken_e = users.existing_keys([rows[0][0], "free"], [rows[1][1]])
+    assert taken_u == {rows[0][0], rows[1][0]} and rows[1][1] in taken_e
+    with pytest.raises(DuplicateKeyError):
+        users.insert_many([("new", "new@example.com", "h", "User"), rows[2]])
+    assert users.get_by_username("new") is None, "insert_many was not atomic"
+
+def test_count_and_pages(storage):
+    users = storage.users
+    for i in range(7):
+        _user(storage, f"page{i}", "Viewer" if i % 2 else "User")
+    _user(storage, "other")
+    assert users.count(prefix="page") == 7
+    assert users.count(role="Viewer", prefix="page") == 3
+    for descending in (False, True):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = users.page(prefix="page", descending=descending, after=cursor, limit=3)
+            seen.extend(row["username"] for row in rows)
+            if cursor is None:
+                break
+        assert seen == sorted(seen, reverse=descending) and len(set(seen)) == 7
+    rows, _ = users.page(prefix="page", sort_by="created_at", limit=10)
+    assert len(rows) == 7
+    with pytest.raises(ValueError):
+        users.page(sort_by="password")
+
+def test_search(storage):
+    users = storage.users
+    exact = _user(storage, "zephyr", "Manager")
+    _user(storage, "zephyrine")
+    other = _user(storage, "quartz")
+    users.update(other, email="zephyr.mail@example.com")
+
+    rows, ranked = users.search("zeph")
+    assert ranked and {row["id"] for row in rows} >= {exact, other}
+    # Every word must match: a username word and a role word
+    rows, _ = users.search("zephyr manager")
+    assert [row["id"] for row in rows] == [exact]
+    rows, _ = users.search("quartz")
+    assert [row["id"] for row in rows] == [other]
+    users.delete([other])
+    assert users.search("quartz")[0] == []
+    assert users.search("  !! ") == ([], True)
+    rows, ranked = users.search("zeph", limit=1, rank_limit=1)
+    assert not ranked and len(rows) == 1
+
+def test_login_state(storage):
+    users = storage.users
+    _user(storage, "locked")
+    until = _ts(600)
+    users.save_login_state([("locked", 5, until), ("ghost", 1, None)])
+    locked = {row["username"]: row for row in users.locked_users(_ts())}
+    assert locked["locked"]["locked_until"] == until
+    assert locked["locked"]["failed_login_attempts"] == 5
+    users.save_login_state([("locked", 0, None)])
+    assert "locked" not in {row["username"] for row in users.locked_users(_ts())}
+
+def test_activity(storage):
+    users = storage.users
+    user_id = _user(storage, "active")
+    login, seen = _ts(-60), _ts()
+    users.save_activity([(user_id, login, login)])
+    users.save_activity([(user_id, None, seen), (-1, None, seen)])
+    assert str(users.get(user_id)["last_login"])[:19] == login
+
+def test_iter_all(storage):
+    user_ids = [_user(storage, f"iter{i}") for i in range(5)]
+    ids = [row["id"] for row in storage.users.iter_all(("id", "username"), batch_size=2)]
+    assert ids == sorted(ids) and set(user_ids) <= set(ids)
+
+def test_sessions(storage):
+    sessions = storage.sessions
+    user_id = _user(storage, "sess")
+    sessions.create(user_id, "live", _ts(3600))
+    sessions.create(user_id, "expired", _ts(-3600))
+    sessions.create(user_id, "other", _ts(3600))
+    with pytest.raises(DuplicateKeyError):
+        sessions.create(user_id, "live", _ts(3600))
+    sessions.deactivate("other")
+    revoked = dict(sessions.revoked_unexpired(_ts()))
+    assert "other" in revoked and "live" not in revoked and isinstance(revoked["other"], str)
+    revoked = dict(sessions.deactivate_for_users([user_id], _ts()))
+    assert set(revoked) == {"live"}
+    deleted = 0
+    while True:
+        count = sessions.delete_expired(_ts(), 1)
+        deleted += count
+        if count < 1:
+            break
+    assert deleted == 1
+    assert "expired" not in dict(sessions.revoked_unexpired(_ts(-7200)))
+
+def test_audit(storage):
+    audit = storage.audit
+    user_id = _user(storage, "auditor")
+    events = [(user_id, "ACTION", _ts(-i), f"event {i}") for i in range(5)]
+    assert audit.insert_many(events) == 5
+    seen, cursor = [], None
+    while True:
+        rows, cursor = audit.page(action="ACTION", before=cursor, limit=2)
+        seen.extend(rows)
+        if cursor is None:
+            break
+    assert [row["details"] for row in seen] == [f"event {i}" for i in range(5)]
+    assert seen[0]["username"] == "auditor"
+    assert isinstance(seen[0]["timestamp"], str)
+    rows, _ = audit.page(user_id=user_id, start=_ts(-2), limit=10)
+    assert {row["details"] for row in rows} <= {"event 0", "event 1", "event 2"}
+    assert "ACTION" in audit.distinct_actions()
+
+def test_delete(storage):
+    users = storage.users
+    user_id = _user(storage, "gone")
+    users.set_permission_override(user_id, "VIEW_LOGS", True)
+    root = _user(storage, "gone_root", "Root")
+    assert users.delete([user_id, root], protected_roles=["Root"]) == [user_id]
+    assert users.get(user_id) is None and users.get(root) is not None
+    assert users.delete([root], exclude_ids=[root]) == []
+
+def test_update_many(storage):
+    users = storage.users
+    ids = [_user(storage, f"many{i}") for i in range(4)]
+    root = _user(storage, "many_root", "Root")
+    updated = users.update_many(ids + [root], protected_roles=["Root"], exclude_ids=[ids[0]],
+                                role="Viewer", is_active=False)
+    assert sorted(updated) == sorted(ids[1:])
+    assert users.get(ids[1])["role"] == "Viewer" and not users.get(ids[1])["is_active"]
+    assert users.get(ids[0])["role"] == "User" and users.get(root)["role"] == "Root"
+    with pytest.raises(ValueError):
+        users.update_many(ids, email="x@example.com")
+
+def test_prefix_filter_ignores_case(storage):
+    users = storage.users
+    alice = _user(storage, "Alice")
+    users.update(alice, email="Alice.Smith@Example.com")
+    bob = _user(storage, "bob")
+    assert users.count(prefix="a") == 1 and users.count(prefix="ALI") == 1
+    assert users.count(prefix="alice.s") == 1 and users.count(prefix="B") == 1
+    rows, _ = users.page(prefix="AL", limit=10)
+    assert [row["id"] for row in rows] == [alice]
+    rows, _ = users.page(prefix="b", limit=10)
+    assert [row["id"] for row in rows] == [bob]
+
+def test_metric_triggers(storage):
+    metrics = storage.metrics
+    day = datetime.utcnow().strftime("%Y-%m-%d")
+    total, new = metrics.get("users_total"), metrics.get("new_users", "day", day)
+    ids = [_user(storage, f"metric{i}") for i in range(2)]
+    assert storage.users.insert_many([("metric2", "metric2@example.com", "hash", "User"),
+                                      ("metric3", "metric3@example.com", "hash", "User")]) == 2
+    assert metrics.get("users_total") == total + 4
+    assert metrics.get("new_users", "day", day) == new + 4
+    storage.users.delete(ids)
+    assert metrics.get("users_total") == total + 2
+    storage.sessions.create(storage.users.get_by_username("metric3")["id"], "metric-session",
+                            _ts(3600))
+    assert metrics.get("sessions", "day", day) >= 1
+
+def test_record_login(storage):
+    metrics = storage.metrics
+    user_id = _user(storage, "login")
+    hour = datetime.utcnow().strftime("%Y-%m-%d %H:00")
+    for _ in range(2):
+        metrics.record_login(user_id, "2030-01-02", hour)
+    metrics.record_login(user_id, "2030-01-03", hour)
+    assert metrics.get("logins", "day", "2030-01-02") == 2
+    assert metrics.get("logins", "hour", hour) == 3
+    assert metrics.get("active_users", "day", "2030-01-02") == 1
+    rows = metrics.daily(["logins", "active_users"], "2030-01-01", "2030-01-02")
+    assert sorted((row["metric"], row["bucket"], row["value"]) for row in rows) == [
+        ("active_users", "2030-01-02", 1), ("logins", "2030-01-02", 2)]
+    assert metrics.get("logins", "day", "1999-01-01") == 0
+
+def test_audit_archive(storage):
+    audit = storage.audit
+    user_id = _user(storage, "archived")
+    audit.insert_many([
+        (user_id, "OLD", "2020-01-05 10:00:00", "january"),
+        (user_id, "OLD", "2020-02-05 10:00:00", "february"),
+        (user_id, "OLD", "2020-02-06 10:00:00", "dropped"),
+        (user_id, "NEW", _ts(), "recent"),
+    ])
+    rows = audit.oldest_before("2021-01-01 00:00:00", 10)
+    assert [row["details"] for row in rows] == ["january", "february", "dropped"]
+    assert rows[0]["timestamp"] == "2020-01-05 10:00:00" and "username" not in rows[0]
+    audit.delete([rows[2]["id"]])
+    audit.move_to_archive(rows[:2])
+    assert audit.oldest_before("2021-01-01 00:00:00", 10) == []
+    with audit.db.connection() as conn:
+        archived = conn.execute("SELECT id, details FROM audit_log_archive_2020_02").fetchall()
+    assert [(row["id"], row["details"]) for row in archived] == [(rows[1]["id"], "february")]
+    # Re-archiving an id already moved is a no-op, not a conflict
+    audit.move_to_archive(rows[1:2])
+    assert [row["details"] for row in audit.page(limit=10)[0]] == ["recent"]
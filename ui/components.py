@@ -0,0 +1,95 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from config import Config
+from src.instrumentation import begin_profile, record_timer
+from src.models import User
+from src.ratelimit import client_address
+from src.sessions import verify_session
+
+_render = threading.local()
+
+def record_timing(name, seconds):
+    """Keep the latest execution time of a script run or fragment in session state"""
+    st.session_state.setdefault("render_timings", {})[name] = seconds
+    record_timer(f"render.{name}", seconds)
+
+@contextmanager
+def full_render():
+    """Mark the current thread as executing a complete script run"""
+    _render.active = True
+    begin_profile()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _render.active = False
+        record_timing("script", time.perf_counter() - started)
+
+def client_key():
+    """Identity of the browser client, for rate limiting.
+
+    The remote address of the session's websocket, or the client address
+    reported by ``Config.TRUSTED_PROXY_HOPS`` trusted proxies (see
+    ``client_address``). Falls back to the Streamlit session id only when no
+    connection is available, as under AppTest.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    request = None
+    if runtime.exists():
+        request = getattr(runtime.get_instance().get_client(ctx.session_id), "request", None)
+    if request is None or not request.remote_ip:
+        return f"session:{ctx.session_id}"
+    return client_address(request.remote_ip, request.headers.get("X-Forwarded-For"))
+
+def session_ended():
+    """Whether the signed-in session is no longer valid.
+
+    True once the token is revoked (logout elsewhere, deactivation) or has
+    expired, or when the user was deleted or deactivated. The token check
+    is in memory and the user comes from the identity map the sidebar uses,
+    so this is cheap enough for every rerun.
+    """
+    if 'user_id' not in st.session_state:
+        return False
+    token = st.session_state.get('session_token')
+    if token is None or verify_session(token) != st.session_state.user_id:
+        return True
+    user = User.get_by_id(st.session_state.user_id, "sidebar")
+    return user is None or not user.is_active
+
+def fragment(name, run_every=None):
+    """Render the decorated function as an independently rerunning fragment.
+
+    Widget interactions inside a fragment rerun only that function instead
+    of the whole script (page config, CSS, sidebar and the other sections).
+    A fragment rerun does not pass through ``main``, so it starts its own
+    identity map and checks the session itself. Falls back to a plain call
+    when ``Config.USE_FRAGMENTS`` is off or the installed Streamlit has no
+    fragment support.
+    """
+    def decorator(func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            if not getattr(_render, "active", False):
+                # A fragment rerun skips main's session check; a full rerun signs out
+                User.begin_request()
+                begin_profile()
+                if session_ended():
+                    st.rerun()
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_timing(name, time.perf_counter() - started)
+
+        if Config.USE_FRAGMENTS and hasattr(st, "fragment"):
+            return st.fragment(timed, run_every=run_every)
+        return timed
+    return decorator